@@ -233,6 +233,13 @@ class Atomic(object):
 
         return SELECT.select(self, selstr, **kwargs)
 
+    def selectMany(self, selstrs, **kwargs):
+        """Returns atoms matching each of *selstrs*, a list or a dictionary of
+        selection strings, evaluating parts shared by them only once.  See
+        :meth:`~.Select.selectMany` for details."""
+
+        return SELECT.selectMany(self, selstrs, **kwargs)
+
     def getTitle(self):
         """Returns title of the instance."""
         try:
@@ -2,7 +2,7 @@
 """This module defines :class:`HierView` class that builds a hierarchical
 views of atom groups."""
 
-from numpy import unique, zeros, arange, concatenate
+from numpy import unique, zeros, ones, empty, arange, append, diff, repeat
 from prody.utilities.misctools import count
 
 from .atomgroup import AtomGroup
@@ -15,6 +15,52 @@ from .segment import Segment
 __all__ = ['HierView']
 
 
+def findChanges(n_items, arrays, termini=None):
+    """Returns indices of items at which values of any of *arrays* change,
+    and of items that follow *termini*, starting with the first item."""
+
+    changes = zeros(n_items, bool)
+    changes[:1] = True
+    for array in arrays:
+        changes[1:] |= array[1:] != array[:-1]
+    if termini is not None:
+        changes[1:] |= termini[:-1]
+    return changes.nonzero()[0]
+
+
+def getGroupIndices(n_items, *arrays):
+    """Returns indices of groups of items with the same values in *arrays*,
+    numbered in the order of their first appearance, and indices of items
+    that appear first in each group.  Values are compared for runs of items
+    only, so arrays with long runs of same values are grouped quickly."""
+
+    starts = findChanges(n_items, arrays)
+    codes = zeros(len(starts), int)
+    for array in arrays:
+        values, inverse = unique(array[starts], return_inverse=True)
+        codes = codes * len(values) + inverse.reshape(-1)
+        codes = unique(codes, return_inverse=True)[1].reshape(-1)
+    firsts = unique(codes, return_index=True)[1]
+    order = firsts.argsort()
+    ranks = empty(len(order), int)
+    ranks[order] = arange(len(order))
+    return (repeat(ranks[codes], diff(append(starts, n_items))),
+            starts[firsts[order]])
+
+
+def splitIndices(groups, indices):
+    """Returns groups found in *groups* and arrays of *indices* in each of
+    them, preserving the order of *indices*."""
+
+    order = groups.argsort(kind='mergesort')
+    groups = groups[order]
+    indices = indices[order]
+    starts = findChanges(len(groups), [groups])
+    bounds = append(starts, len(groups)).tolist()
+    return groups[starts], [indices[start:stop] for start, stop
+                            in zip(bounds[:-1], bounds[1:])]
+
+
 class HierView(object):
 
     """Hierarchical views can be generated for :class:`.AtomGroup`,
@@ -181,31 +227,21 @@ class HierView(object):
         indices = atoms._getIndices()
         self._selstr = atoms.getSelstr()
 
-        self._dict = ag.getHierView()._dict
+        # view of the atom group is updated once and sliced for atoms
+        hv = ag.getHierView()
+        self._dict = hv._dict
 
-        self._segments = _segments = [None] * ag.numSegments()
-        self._residues = _residues = [None] * ag.numResidues()
-        self._chains = _chains = [None] * ag.numChains()
+        self._segments = _segments = [None] * hv.numSegments()
+        self._residues = _residues = [None] * hv.numResidues()
+        self._chains = _chains = [None] * hv.numChains()
 
         for hvidx, _list in [(atoms._getSegindices(), _segments),
                              (atoms._getChindices(), _chains),
                              (atoms._getResindices(), _residues),]:
             if not _list: continue
-            pidx = hvidx[0]
-            pi = 0
-            for i, idx in enumerate(hvidx):
-                if pidx == idx: continue
-                subset = _list[pidx]
-                if subset is None:
-                    _list[pidx] = indices[pi:i]
-                else:
-                    _list[pidx] = concatenate((subset, indices[pi:i]))
-                pidx, pi = idx, i
-            subset = _list[pidx]
-            if subset is None:
-                _list[pidx] = indices[pi:]
-            else:
-                _list[pidx] = concatenate((subset, indices[pi:]))
+            groups, subsets = splitIndices(hvidx, indices)
+            for index, subset in zip(groups.tolist(), subsets):
+                _list[index] = subset
 
     def _update(self, **kwargs):
         """Build hierarchical view for :class:`.AtomGroup` instances."""
@@ -219,14 +255,7 @@ class HierView(object):
         self._segments = _segments = []
         self._chains = _chains = []
 
-        nones = None
-        getnones = lambda: [None] * n_atoms if nones is None else nones
-        termini = ag.getFlags('pdbter')
-        if termini is None:
-            termini = getnones()
-
         # identify segments
-        segindex = -1
         segindices = zeros(n_atoms, int)
 
         sgnms = ag._getSegnames()
@@ -242,79 +271,33 @@ class HierView(object):
                 else:
                     _segments = None
             else:
-                ps = None       # previous segment name
-                for i, s in enumerate(sgnms):
-                    if s == ps or s in _dict:
-                        continue
-                    ps = s
-                    idx = _indices[i:][sgnms[i:] == s]
-                    segindex += 1
-                    segindices[idx] = segindex
+                segindices, firsts = getGroupIndices(n_atoms, sgnms)
+                for segindex, s in enumerate(sgnms[firsts].tolist()):
                     _dict[s or None] = segindex
-                    _segments.append(idx)
+                _segments.extend(splitIndices(segindices, _indices)[1])
 
         ag._data['segindex'] = segindices
 
         # identify chains
-        chindex = -1
         chindices = zeros(n_atoms, int)
 
         chids = ag._getChids()
         if chids is None:
             _chains = None
+        elif _segments is None and len(unique(chids)) == 1:
+            _dict[(None, chids[0] or None)] = 0
+            _chains.append(_indices)
+        elif _segments is None:
+            chindices, firsts = getGroupIndices(n_atoms, chids)
+            for chindex, c in enumerate(chids[firsts].tolist()):
+                _dict[(None, c)] = chindex
+            _chains.extend(splitIndices(chindices, _indices)[1])
         else:
-            if _segments is None:
-                if len(unique(chids)) == 1:
-                    _dict[(None, chids[0] or None)] = 0
-                    _chains.append(_indices)
-                else:
-                    pc = None
-                    for i, c in enumerate(chids):
-                        if c == pc or (None, c) in _dict:
-                            continue
-                        pc = c
-                        idx = _indices[i:][chids[i:] == c]
-                        chindex += 1
-                        chindices[idx] = chindex
-                        _dict[(None, c)] = chindex
-                        _chains.append(idx)
-            else:
-                pc = chids[0]
-                ps = sgnms[0]
-                _i = 0
-                for i, c in enumerate(chids):
-                    s = sgnms[i]
-                    if c == pc and s == ps:
-                        continue
-                    s_c = (ps, pc or None)
-                    cid = _dict.get(s_c)
-                    idx = _indices[_i:i]
-                    if cid is None:
-                        #segment = _dict[ps]
-                        chindex += 1
-                        chindices[idx] = chindex
-                        _dict[s_c] = chindex
-                        _chains.append(idx)
-                    else:
-                        chain = _chains[cid]
-                        chindices[idx] = cid
-                        _chains[cid] = concatenate((chain, idx))
-                    pc = c
-                    ps = s
-                    _i = i
-                s_c = (ps or None, pc or None)
-                cid = _dict.get(s_c)
-                idx = _indices[_i:]
-                if cid is None:
-                    #segment = _dict[ps]
-                    chindex += 1
-                    chindices[idx] = chindex
-                    _dict[s_c] = chindex
-                    _chains.append(idx)
-                else:
-                    chain = _chains[cid]
-                    chindices[idx] = cid
-                    _chains[cid] = concatenate((chain, idx))
+            chindices, firsts = getGroupIndices(n_atoms, sgnms, chids)
+            for chindex, (s, c) in enumerate(zip(sgnms[firsts].tolist(),
+                                                 chids[firsts].tolist())):
+                _dict[(s or None, c or None)] = chindex
+            _chains.extend(splitIndices(chindices, _indices)[1])
 
         ag._data['chindex'] = chindices
 
@@ -322,72 +305,67 @@ class HierView(object):
             return
 
         # identify residues
-        resindex = -1
-        resindices = zeros(n_atoms, int)
-
         rnums = ag._getResnums()
         if rnums is None:
             raise ValueError('resnums are not set')
         if _segments is None:
-            sgnms = nones = getnones()
+            sgnms = None
         if _chains is None:
-            chids = nones = getnones()
+            chids = None
         icods = ag._getIcodes()
-        if icods is None:
-            icods = nones = getnones()
-        pr = rnums[0]
-        pi = icods[0] or None
-        pc = chids[0]
-        ps = sgnms[0]
-        _j = 0
-        _append = _residues.append
+        termini = ag.getFlags('pdbter')
+
+        # residues are runs of atoms with the same segment, chain, residue
+        # number, and insertion code, which end at terminal atoms, and runs
+        # that repeat a residue are merged into it, unless it is terminated
+        arrays = [array for array in (sgnms, chids, rnums, icods)
+                  if array is not None]
+        starts = findChanges(n_atoms, arrays, termini)
+        lengths = diff(append(starts, n_atoms))
+        n_runs = len(starts)
+        codes = getGroupIndices(n_runs, *[array[starts]
+                                          for array in arrays])[0]
+
+        order = codes.argsort(kind='mergesort')
+        grouped = codes[order]
+        firstrun = ones(n_runs, bool)
+        firstrun[1:] = grouped[1:] != grouped[:-1]
+        aftertrm = zeros(n_runs, bool)
+        if termini is not None:
+            aftertrm[1:] = termini[starts[order] + lengths[order] - 1][:-1]
+        aftertrm[firstrun] = False
+        # once a run follows a terminated one, later runs are not merged
+        splits = aftertrm.cumsum()
+        group = firstrun.cumsum() - 1
+        splits -= (splits - aftertrm)[firstrun][group]
+        merged = zeros(n_runs, bool)
+        merged[order] = ~firstrun & (splits == 0)
+
+        runindices = (~merged).cumsum() - 1
+        which = merged[order]
+        runindices[order[which]] = runindices[order[firstrun]][group[which]]
+        resindices = repeat(runindices, lengths)
+
+        newruns = order[~which]
+        keyruns = starts[order[firstrun]]
+        nones = [None] * len(keyruns)
+        keys = list(zip(nones if sgnms is None else sgnms[keyruns].tolist(),
+                        nones if chids is None else chids[keyruns].tolist(),
+                        rnums[keyruns].tolist(),
+                        nones if icods is None else
+                        [i or None for i in icods[keyruns].tolist()]))
         _get = _dict.get
-        _set = _dict.__setitem__
-        for j, r in enumerate(rnums):
-            i = icods[j] or None
-            c = chids[j]
-            s = sgnms[j]
-            if r != pr or i != pi or c != pc or s != ps or (j and termini[j-1]):
-                s_c_r_i = (ps, pc, pr, pi)
-                rid = _get(s_c_r_i)
-                idx = _indices[_j:j]
-                if (rid is None or isinstance(rid, list) or
-                    termini[_residues[rid][-1]]):
-                    resindex += 1
-                    resindices[idx] = resindex
-                    _append(idx)
-                    if rid is None:
-                        _set(s_c_r_i, resindex)
-                    elif isinstance(rid, list):
-                        rid.append(resindex)
-                    else:
-                        _set(s_c_r_i, [rid, resindex])
-                else:
-                    residue = _residues[rid]
-                    resindices[idx] = rid
-                    _residues[rid] = concatenate((residue, idx))
-                ps = s
-                pc = c
-                pr = r
-                pi = i
-                _j = j
-        s_c_r_i = (ps, pc, pr, pi)
-        rid = _get(s_c_r_i)
-        idx = _indices[_j:]
-        if rid is None or isinstance(rid, list) or termini[_residues[rid][-1]]:
-            resindex += 1
-            resindices[idx] = resindex
-            _append(idx)
+        for g, resindex in zip(group[~which].tolist(),
+                               runindices[newruns].tolist()):
+            s_c_r_i = keys[g]
+            rid = _get(s_c_r_i)
             if rid is None:
-                _set(s_c_r_i, resindex)
+                _dict[s_c_r_i] = resindex
             elif isinstance(rid, list):
                 rid.append(resindex)
             else:
-                _set(s_c_r_i, [rid, resindex])
-        else:
-            residue = _residues[rid]
-            resindices[idx] = rid
-            _residues[rid] = concatenate((residue, idx))
+                _dict[s_c_r_i] = [rid, resindex]
+        _residues.extend(splitIndices(resindices, _indices)[1])
 
         ag._data['resindex'] = resindices
 
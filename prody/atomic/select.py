@@ -409,6 +409,33 @@ them if you wish as follows:
    delSelectionMacro('alanine')
 
 
+Compiled selections
+-------------------------------------------------------------------------------
+
+Selection strings are parsed into evaluation plans, and plans of recently
+used strings are cached, so repeated selections skip parsing.  A selection
+can also be compiled once using :func:`compileSelection` and evaluated for
+many structures:
+
+.. ipython:: python
+
+   calpha = compileSelection('protein and name CA')
+   calpha.select(p)
+   p.select(calpha)
+
+Many selections can be made together using :meth:`.Atomic.selectMany`, which
+evaluates parts that are shared by selection strings only once:
+
+.. ipython:: python
+
+   p.selectMany(['protein and name CA', 'protein and name CB'])
+
+Coordinate based selections can be evaluated for all coordinate sets of atoms,
+or for all frames of a trajectory, using :meth:`.Select.getBitArray`, which
+evaluates parts of the selection that do not depend on coordinates once and
+returns a bit-packed array with a row for each frame.
+
+
 Keyword arguments
 -------------------------------------------------------------------------------
 
@@ -441,12 +468,13 @@ all alphanumeric characters."""
 
 import sys
 from re import compile as re_compile
-from collections import Iterable
+from collections import Iterable, OrderedDict
 
 import numpy as np
 from numpy import array, ndarray, ones, zeros, arange
 from numpy import invert, unique, concatenate, all, any
 from numpy import logical_and, logical_or, floor, ceil, where
+from numpy import packbits, uint8
 
 try:
     from . import pyparsing as pp
@@ -491,13 +519,17 @@ def debug(sel, loc, *args):
 
 __all__ = ['Select', 'SelectionError', 'SelectionWarning',
            'defSelectionMacro', 'delSelectionMacro', 'getSelectionMacro',
-           'isSelectionMacro']
+           'isSelectionMacro', 'CompiledSelection', 'compileSelection']
 
 ATOMGROUP = None
 
 MACROS = SETTINGS.get('selection_macros', {})
 MACROS_REGEX = None
 
+# evaluation plans of recently used selection strings, in order of use
+SELECTION_CACHE = OrderedDict()
+SELECTION_CACHE_SIZE = 256
+
 
 def isSelectionMacro(word):
     """Returns **True** if *word* is a user defined selection macro."""
@@ -536,6 +568,7 @@ def defSelectionMacro(name, selstr):
         LOGGER.info("Macro {0} is defined as {1}."
                     .format(repr(name), repr(selstr)))
         MACROS[name] = selstr
+        SELECTION_CACHE.clear()
         SETTINGS['selection_macros'] = MACROS
         SETTINGS.save()
 
@@ -553,6 +586,7 @@ def delSelectionMacro(name):
         LOGGER.warn("Macro {0} is not found.".format(repr(name)))
     else:
         if MACROS_REGEX is not None: MACROS_REGEX.pop(name, None)
+        SELECTION_CACHE.clear()
         LOGGER.info("Macro {0} is deleted.".format(repr(name)))
         SETTINGS['selection_macros'] = MACROS
         SETTINGS.save()
@@ -803,6 +837,258 @@ PP_NRANGE.setParseAction(rangeParseAction)
 
 UNARY = set(['not', 'bonded', 'exbonded', 'within', 'exwithin', 'same'])
 
+PARSERS = {}
+
+
+class Deferred(object):
+
+    """A parse action recorded in the evaluation plan of a selection string.
+    *action* is the name of a :class:`Select` method that is called with
+    *tokens*, after deferred actions among them are evaluated.  Actions
+    that do not depend on coordinates are marked static, and are evaluated
+    once for all frames by :meth:`Select.getBitArray`.  Actions with equal
+    keys are evaluated once for all selections by
+    :meth:`Select.getBoolArrays`."""
+
+    __slots__ = ['action', 'loc', 'tokens', 'dynamic', 'key']
+
+    def __init__(self, action, loc, tokens):
+
+        self.action = action
+        self.loc = loc
+        self.tokens = tokens
+        self.dynamic = isDynamic(tokens)
+        self.key = (action,) + freezeTokens(tokens)
+
+
+def freezeTokens(tokens):
+    """Returns a hashable key for nested *tokens*, in which deferred actions
+    are replaced with their keys."""
+
+    key = []
+    for token in tokens:
+        if isinstance(token, Deferred):
+            token = token.key
+        elif isinstance(token, list):
+            token = freezeTokens(token)
+        key.append(token)
+    return tuple(key)
+
+
+def getWordsKey(tokens):
+    """Returns a key for *tokens*, if they are all words, e.g. ``['name',
+    'CA']``, otherwise **None**."""
+
+    for token in tokens:
+        if not isinstance(token, str):
+            return None
+    return tuple(tokens)
+
+
+def isDynamic(tokens):
+    """Returns **True** if nested *tokens* contain a coordinate or distance
+    based keyword, or a deferred action that depends on coordinates."""
+
+    for token in tokens:
+        if isinstance(token, Deferred):
+            if token.dynamic:
+                return True
+        elif isinstance(token, list):
+            if isDynamic(token):
+                return True
+        elif isinstance(token, str) and token in XYZDIST:
+            return True
+    return False
+
+
+def deferAction(action):
+    """Returns a parse action that records a call to :class:`Select` method
+    *action*, instead of evaluating it while parsing."""
+
+    def defer(sel, loc, tokens):
+        return Deferred(action, loc, tokens.asList())
+    return defer
+
+
+def getParser(selstr):
+    """Returns an efficient parser that can handle *selstr* and its key."""
+
+    alnum = selstr
+    alpha = selstr
+    for ch in selstr:
+        if not ch.isalnum(): alnum = alnum.replace(ch, ' ')
+        if not ch.isalpha(): alpha = alpha.replace(ch, ' ')
+    items = set(alnum.split())
+    chars = set(selstr)
+
+
+    funcs = 4 if items.intersection(FUNCNAMES) else 0
+    opers = 2 if chars.intersection(OPERATORS) else 0
+    logic = 1 if 'or' in items or '(' in chars else 0
+
+    schars = 8 if '`' in chars and RE_SCHARS.search(selstr) else 0
+    regexp = 16 if '"' in chars and RE_REGEXP.search(selstr) else 0
+    nrange = 32 if ((':' in chars or ' to ' in alpha) and
+                    RE_NRANGE.search(selstr)) else 0
+
+    key = (logic + opers + funcs, logic + funcs + schars + regexp + nrange)
+
+    if key == (0, 0):
+        return noParser, key
+
+    try:
+        return PARSERS[key][0].parseString, key
+    except KeyError:
+        pass
+
+
+    word = ~AND + ~OR
+
+    oplist = []
+    if funcs:
+        oplist.append((FUNCNAMES_OPLIST, 1, pp.opAssoc.RIGHT,
+                       deferAction('_func')))
+        # following causes 20% slow down
+        #word += FUNCNAMES_EXPR
+
+    if funcs or opers:
+        oplist.extend([
+            (pp.oneOf('+ -'), 1, pp.opAssoc.RIGHT, deferAction('_sign')),
+            (pp.oneOf('** ^'), 2, pp.opAssoc.LEFT, deferAction('_pow')),
+            (pp.oneOf('* / %'), 2, pp.opAssoc.LEFT, deferAction('_binop')),
+            (pp.oneOf('+ -'), 2, pp.opAssoc.LEFT, deferAction('_binop')),
+            (pp.oneOf('< > <= >= == = !='), 2, pp.opAssoc.LEFT,
+             deferAction('_comp'))])
+
+    oplist.extend([
+      (pp.Optional(AND), 2, pp.opAssoc.LEFT, deferAction('_and')),
+      (OR, 2, pp.opAssoc.LEFT, deferAction('_or'))])
+
+    word += WORD
+
+    expr = word
+    if schars: expr = PP_SCHARS | expr
+    if regexp: expr = PP_REGEXP | expr
+    if nrange: expr = PP_NRANGE | expr
+
+    parser = pp.operatorPrecedence(expr, oplist)
+    parser.setParseAction(deferAction('_default'))
+    parser.leaveWhitespace()
+    parser.enablePackrat()
+    PARSERS[key] = parser, expr, oplist
+    return parser.parseString, key
+
+
+def noParser(selstr, parseAll=True):
+
+    debug(selstr, 0, ['_noParser'])
+    return [Deferred('_default', 0, selstr.split())]
+
+
+def compileSelstr(selstr):
+    """Returns *selstr* with macros replaced and its evaluation plan.  Plans
+    of the most recently used :data:`SELECTION_CACHE_SIZE` selection strings
+    are cached, and the cache is cleared when macros are changed."""
+
+    try:
+        sel, plan = SELECTION_CACHE.pop(selstr)
+    except KeyError:
+        sel = replaceMacros(selstr)
+        parser, key = getParser(sel)
+        try:
+            tokens = parser(sel, parseAll=True)
+        except pp.ParseException as err:
+            PARSERS.pop(key, None)
+            which = sel.rfind(' ', 0, err.column)
+            if which > -1:
+                if sel[which + 1] == '(':
+                    msg = ('an arithmetic, comparison, or logical operator '
+                           'must precede the opening parenthesis')
+                elif sel[which - 1] == ')':
+                    msg = ('an arithmetic, comparison, or logical operator '
+                           'must follow the closing parenthesis')
+                else:
+                    msg = 'parsing failed here'
+            else:
+                msg = 'parsing failed here'
+
+            raise SelectionError(sel, err.column, msg + '\n' + str(err))
+        plan = tokens[0]
+        if DEBUG: print('compileSelstr', plan)
+        while len(SELECTION_CACHE) >= SELECTION_CACHE_SIZE:
+            SELECTION_CACHE.popitem(last=False)
+    SELECTION_CACHE[selstr] = sel, plan
+    return sel, plan
+
+
+def iterTrajectory(traj):
+    """Yield coordinates of frames of *traj* starting from the first one,
+    and restore position of *traj* in the end."""
+
+    nfi = traj.nextIndex()
+    traj.reset()
+    try:
+        for i in range(traj.numFrames()):
+            coords = traj.nextCoordset()
+            if coords is None:
+                break
+            yield coords
+    finally:
+        traj.goto(nfi)
+
+
+class CompiledSelection(str):
+
+    """A selection string that is parsed once into an evaluation plan, see
+    :func:`compileSelection`.  Instances are strings, so they are accepted
+    wherever a selection string is, e.g. by :meth:`.Atomic.select`, and
+    they can evaluate the selection directly for any :class:`.Atomic`
+    instance.  Macros are expanded when the selection is compiled."""
+
+    def __new__(cls, selstr):
+
+        if not isinstance(selstr, str):
+            raise TypeError('selstr must be a string')
+        self = str.__new__(cls, selstr)
+        self._sel, self._plan = compileSelstr(selstr.strip())
+        self._select = Select()
+        return self
+
+    def __reduce__(self):
+
+        return self.__class__, (str(self),)
+
+    def select(self, atoms, **kwargs):
+        """Returns a :class:`.Selection` of *atoms* matching the selection,
+        see :meth:`.Select.select`."""
+
+        return self._select.select(atoms, self, **kwargs)
+
+    def getIndices(self, atoms, **kwargs):
+        """Returns indices of *atoms* matching the selection, see
+        :meth:`.Select.getIndices`."""
+
+        return self._select.getIndices(atoms, self, **kwargs)
+
+    def getBoolArray(self, atoms, **kwargs):
+        """Returns a boolean array with **True** values for *atoms* matching
+        the selection, see :meth:`.Select.getBoolArray`."""
+
+        return self._select.getBoolArray(atoms, self, **kwargs)
+
+    def getBitArray(self, atoms, frames=None, **kwargs):
+        """Returns a bit-packed boolean array for *atoms* matching the
+        selection in each frame, see :meth:`.Select.getBitArray`."""
+
+        return self._select.getBitArray(atoms, self, frames, **kwargs)
+
+
+def compileSelection(selstr):
+    """Returns a :class:`CompiledSelection` for *selstr*, which skips parsing
+    when the same selection is made repeatedly, e.g. for many structures."""
+
+    return CompiledSelection(selstr)
+
 
 class Select(object):
 
@@ -820,14 +1106,17 @@ class Select(object):
 
         self._coords = None
         self._kwargs  = None
+        # coordinates, KDTree, and static results used for multiple frames
+        self._frame = None
+        self._kdtree = None
+        self._static = None
+        # results shared between multiple selections
+        self._shared = None
         # set True when selection string alone cannot reproduce the selection
         self._ss2idx = False
         self._data = dict()
         self._replace = False
 
-        self._parsers = {}
-
-
         self._evalmap = {'resnum': self._resnum, 'resid': self._resnum,
             'serial': self._serial, 'index': self._index,
             'x': self._generic, 'y': self._generic, 'z': self._generic,
@@ -918,7 +1207,7 @@ class Select(object):
                     selstr = '({0}) and ({1})'.format(selstr,
                                                       atoms.getSelstr())
 
-            return Selection(ag, indices, selstr, atoms.getACSIndex(),
+            return Selection(ag, indices, str(selstr), atoms.getACSIndex(),
                              unique=True)
         else:
             return AtomMap(ag, indices, atoms.getACSIndex(), dummies=dummies,
@@ -980,6 +1269,7 @@ class Select(object):
 
         self._evalAtoms(atoms)
 
+        compiled = selstr
         selstr = selstr.strip()
         if (len(selstr.split()) == 1 and selstr.isalnum() and
             selstr not in MACROS):
@@ -995,30 +1285,12 @@ class Select(object):
                 raise SelectionError(selstr, 0, 'is not a valid selection or '
                                      'user data label')
 
-        selstr = replaceMacros(selstr)
-        try:
-            parser = self._getParser(selstr)
-            tokens = parser(selstr, parseAll=True)
-        except pp.ParseException as err:
-            self._parsers.pop(self._parser, None)
-            pass
-            which = selstr.rfind(' ', 0, err.column)
-            if which > -1:
-                if selstr[which + 1] == '(':
-                    msg = ('an arithmetic, comparison, or logical operator '
-                           'must precede the opening parenthesis')
-                elif selstr[which - 1] == ')':
-                    msg = ('an arithmetic, comparison, or logical operator '
-                           'must follow the closing parenthesis')
-                else:
-                    msg = 'parsing failed here'
-            else:
-                msg = 'parsing failed here'
-
-            raise SelectionError(selstr, err.column, msg + '\n' + str(err))
+        if isinstance(compiled, CompiledSelection):
+            selstr, plan = compiled._sel, compiled._plan
         else:
-            if DEBUG: print('_evalSelstr', tokens)
-            torf = tokens[0]
+            selstr, plan = compileSelstr(selstr)
+        torf = self._evalPlan(selstr, plan)
+        if DEBUG: print('_evalSelstr', torf)
 
         if not isinstance(torf, ndarray):
             if DEBUG: print(torf)
@@ -1032,78 +1304,187 @@ class Select(object):
             print('_select', torf)
         return torf
 
-    def _getParser(self, selstr):
-        """Returns an efficient parser that can handle *selstr*."""
+    def selectMany(self, atoms, selstrs, **kwargs):
+        """Returns selections of *atoms* matching *selstrs*, a list or a
+        dictionary of selection strings, in a list or a dictionary with the
+        same keys.  Selections that match no atoms are **None**.  Parts of
+        selection strings that are shared, such as flags, field comparisons,
+        and atoms within a distance of others, are evaluated only once, e.g.
+        ``'protein'`` and ``'chain A'`` for the following::
 
-        alnum = selstr
-        alpha = selstr
-        for ch in selstr:
-            if not ch.isalnum(): alnum = alnum.replace(ch, ' ')
-            if not ch.isalpha(): alpha = alpha.replace(ch, ' ')
-        items = set(alnum.split())
-        chars = set(selstr)
+          selstrs = dict([(name, 'protein and chain A and within 4 of '
+                           'resname ' + name) for name in ligands])
 
+        See :meth:`select` for other arguments."""
 
-        funcs = 4 if items.intersection(FUNCNAMES) else 0
-        opers = 2 if chars.intersection(OPERATORS) else 0
-        logic = 1 if 'or' in items or '(' in chars else 0
+        return self._evalMany(self.select, atoms, selstrs, kwargs)
 
-        schars = 8 if '`' in chars and RE_SCHARS.search(selstr) else 0
-        regexp = 16 if '"' in chars and RE_REGEXP.search(selstr) else 0
-        nrange = 32 if ((':' in chars or ' to ' in alpha) and
-                        RE_NRANGE.search(selstr)) else 0
+    def getBoolArrays(self, atoms, selstrs, **kwargs):
+        """Returns boolean arrays for *atoms* matching *selstrs*, a list or a
+        dictionary of selection strings, in a list or a dictionary with the
+        same keys, see :meth:`selectMany`."""
 
-        self._parser = key = (logic + opers + funcs,
-                              logic + funcs + schars + regexp + nrange)
+        return self._evalMany(self.getBoolArray, atoms, selstrs, kwargs)
 
-        if key == (0, 0):
-            return self._noParser
+    def _evalMany(self, evaluate, atoms, selstrs, kwargs):
 
+        if isinstance(selstrs, str):
+            raise TypeError('selstrs must be a list or a dictionary of '
+                            'selection strings')
+        self._shared = {}
         try:
-            return self._parsers[key][0].parseString
-        except KeyError:
-            pass
+            if isinstance(selstrs, dict):
+                return dict([(key, evaluate(atoms, selstr, **kwargs))
+                             for key, selstr in selstrs.items()])
+            else:
+                return [evaluate(atoms, selstr, **kwargs)
+                        for selstr in selstrs]
+        finally:
+            self._shared = None
 
+    def getBitArray(self, atoms, selstr, frames=None, **kwargs):
+        """Returns a bit-packed boolean array with shape ``(n_frames,
+        n_bytes)``, whose rows have bits set for *atoms* matching *selstr*
+        in each frame.  Rows can be unpacked using :func:`numpy.unpackbits`
+        as follows::
 
-        word = ~AND + ~OR
+          torfs = unpackbits(bits, axis=1)[:, :atoms.numAtoms()]
 
-        oplist = []
-        if funcs:
-            oplist.append((FUNCNAMES_OPLIST, 1, pp.opAssoc.RIGHT, self._func))
-            # following causes 20% slow down
-            #word += FUNCNAMES_EXPR
+        Parts of *selstr* that do not depend on coordinates, e.g. atoms
+        other than water in ``'water and within 4 of not water'``, are
+        evaluated once for all frames.
 
-        if funcs or opers:
-            oplist.extend([
-                (pp.oneOf('+ -'), 1, pp.opAssoc.RIGHT, self._sign),
-                (pp.oneOf('** ^'), 2, pp.opAssoc.LEFT, self._pow),
-                (pp.oneOf('* / %'), 2, pp.opAssoc.LEFT, self._binop),
-                (pp.oneOf('+ -'), 2, pp.opAssoc.LEFT, self._binop),
-                (pp.oneOf('< > <= >= == = !='), 2, pp.opAssoc.LEFT,
-                 self._comp)])
+        :arg atoms: atoms to be evaluated
+        :type atoms: :class:`.Atomic`
 
-        oplist.extend([
-          (pp.Optional(AND), 2, pp.opAssoc.LEFT, self._and),
-          (OR, 2, pp.opAssoc.LEFT, self._or)])
+        :arg selstr: selection string
+        :type selstr: str
 
-        word += WORD
+        :arg frames: indices of coordinate sets of *atoms*, by default all
+            coordinate sets, an array of coordinate sets with shape
+            ``(n_frames, n_atoms, 3)``, an :class:`.Ensemble`, or a
+            trajectory, e.g. :class:`.DCDFile`, whose frames are evaluated
+            starting from the first one and whose position is restored in
+            the end
+        :type frames: list, :class:`numpy.ndarray`, :class:`.Ensemble`,
+            :class:`.TrajBase`"""
 
-        expr = word
-        if schars: expr = PP_SCHARS | expr
-        if regexp: expr = PP_REGEXP | expr
-        if nrange: expr = PP_NRANGE | expr
+        if not isinstance(atoms, Atomic):
+            raise TypeError('atoms must be an Atomic instance, not {0}'
+                            .format(type(atoms)))
+
+        n_atoms = atoms.numAtoms()
+        if frames is None:
+            frames = range(atoms.numCoordsets())
+        try:
+            n_frames = frames.numFrames()
+        except AttributeError:
+            if hasattr(frames, 'getCoordsets'):
+                frames = frames.getCoordsets()
+            if isinstance(frames, ndarray) and frames.ndim == 3:
+                coordsets = frames
+            else:
+                coordsets = (atoms._getCoordsets(index) for index in frames)
+            n_frames = len(frames)
+        else:
+            coordsets = iterTrajectory(frames)
+
+        if not isinstance(selstr, CompiledSelection):
+            selstr = CompiledSelection(selstr)
+        bits = zeros((n_frames, (n_atoms + 7) // 8), uint8)
+        self._static = {}
+        try:
+            for i, coords in enumerate(coordsets):
+                if coords.shape != (n_atoms, 3):
+                    try:
+                        coords = coords[atoms._getIndices()]
+                    except (AttributeError, IndexError):
+                        coords = None
+                    if coords is None or coords.shape != (n_atoms, 3):
+                        raise ValueError('frames must have coordinates '
+                                         'for {0} atoms'.format(n_atoms))
+                self._frame = coords
+                self._kdtree = None
+                bits[i] = packbits(self.getBoolArray(atoms, selstr, **kwargs))
+        finally:
+            self._frame = self._kdtree = self._static = None
+        return bits
+
+    def _evalPlan(self, sel, step):
+        """Evaluate a :class:`Deferred` parse action of the evaluation plan
+        of selection string *sel*."""
+
+        return self._share(step.key, step.dynamic, self._evalStep, sel, step)
+
+    def _evalStep(self, sel, step):
+
+        return getattr(self, step.action)(sel, step.loc,
+                                          self._evalTokens(sel, step.tokens))
+
+    def _share(self, key, dynamic, evaluate, *args):
+        """Returns the result of calling *evaluate* with *args*.  Results are
+        evaluated once for all selections made by :meth:`getBoolArrays`, and
+        when they are not *dynamic*, once for all frames evaluated by
+        :meth:`getBitArray`."""
+
+        memo = self._shared
+        if memo is None:
+            memo = self._static
+            if memo is None or dynamic or key is None:
+                return evaluate(*args)
+        elif key is None:
+            return evaluate(*args)
+        try:
+            result, ss2idx, replace = memo[key]
+        except KeyError:
+            ss2idx, replace = self._ss2idx, self._replace
+            self._ss2idx = self._replace = False
+            result = evaluate(*args)
+            memo[key] = result, self._ss2idx, self._replace
+        # flags set when result was evaluated apply to current selection
+        self._ss2idx = self._ss2idx or ss2idx
+        self._replace = self._replace or replace
+        # a copy is returned, since arrays are modified by other actions
+        if isinstance(result, ndarray):
+            result = result.copy()
+        return result
+
+    def _evalTorf(self, evaluate, sel, loc, tokens):
+
+        torf, err = evaluate(sel, loc, tokens)
+        if err: raise err
+        return torf
 
-        parser = pp.operatorPrecedence(expr, oplist)
-        parser.setParseAction(self._default)
-        parser.leaveWhitespace()
-        parser.enablePackrat()
-        self._parsers[key] = parser, expr, oplist
-        return parser.parseString
+    def _evalSubset(self, sel, loc, tokens, subset=None):
+        """Evaluate *tokens* for *subset* of atoms, or for all atoms once, if
+        they are shared between selections or frames."""
+
+        if self._shared is None and self._static is None:
+            return self._eval(sel, loc, tokens, subset=subset)
+        key = getWordsKey(tokens)
+        if key is None:
+            return self._eval(sel, loc, tokens, subset=subset)
+        try:
+            torf = self._share(key, isDynamic(tokens), self._evalTorf,
+                               self._eval, sel, loc, tokens)
+        except SelectionError as err:
+            return None, err
+        if subset is not None and isinstance(torf, ndarray):
+            torf = torf[subset]
+        return torf, False
 
-    def _noParser(self, selstr, parseAll=True):
+    def _evalTokens(self, sel, tokens):
+        """Returns a copy of nested *tokens* with deferred parse actions
+        evaluated, in the order parser would have called them."""
 
-        debug(selstr, 0, ['_noParser'])
-        return [self._default(selstr, 0, selstr.split())]
+        evaluated = []
+        for token in tokens:
+            if isinstance(token, Deferred):
+                token = self._evalPlan(sel, token)
+            elif isinstance(token, list):
+                token = self._evalTokens(sel, token)
+            evaluated.append(token)
+        return evaluated
 
     def _getZeros(self, subset=None):
         """Returns a bool array with zero elements."""
@@ -1492,7 +1873,7 @@ class Select(object):
             if torf is None:
                 tokens = evals.pop(0)
                 first = str(tokens[0])
-                torf, err = self._eval(sel, loc, tokens, subset=subset)
+                torf, err = self._evalSubset(sel, loc, tokens, subset)
                 if err: return None, err
                 try:
                     dtype = torf.dtype
@@ -1511,7 +1892,7 @@ class Select(object):
                 if len(ss) == 0: return torf, False
                 tokens = evals.pop(0)
                 first = str(tokens[0])
-                arr, err = self._eval(sel, loc, tokens, subset=ss)
+                arr, err = self._evalSubset(sel, loc, tokens, ss)
                 if err: return None, err
 
                 try:
@@ -1546,21 +1927,32 @@ class Select(object):
         if not which:
             return None, SelectionError(sel, loc, '{0} must be followed by '
                 .format(repr(' '.join(what))), what)
-        if len(which) == 1:
-            which, err = self._eval(sel, loc, which)
-        else:
-            which, err = self._and2(sel, loc, which)
-        if err: raise err
+        key = getWordsKey(which)
+        if key is not None:
+            key = tuple(what) + key
+        return self._share(key, isDynamic(what) or isDynamic(which),
+                           self._evalUnary, sel, loc, what, which), False
+
+    def _evalUnary(self, sel, loc, what, which):
+
+        # atoms that are not selected based on coordinates are evaluated
+        # once for all frames
+        which = self._share(getWordsKey(which), isDynamic(which),
+                            self._evalTorf,
+                            self._eval if len(which) == 1 else self._and2,
+                            sel, loc, which)
 
         tokens = [what, which]
         if what[0] == 'not':
-            return self._not(sel, loc, tokens)
+            torf, err = self._not(sel, loc, tokens)
         elif what[0] == 'same':
-            return self._sameas(sel, loc, tokens)
+            torf, err = self._sameas(sel, loc, tokens)
         elif what[-1] == 'to':
-            return self._bondedto(sel, loc, tokens)
+            torf, err = self._bondedto(sel, loc, tokens)
         else:
-            return self._within(sel, loc, tokens)
+            torf, err = self._within(sel, loc, tokens)
+        if err: raise err
+        return torf
 
     def _not(self, sel, loc, tokens):
         """Negate selection."""
@@ -1631,42 +2023,29 @@ class Select(object):
             else:
                 return None, SelectionError(sel, loc, 'not understood')
 
-        if other or len(which) < 20:
-            kdtree = self._atoms._getKDTree()
-            get_indices = kdtree.getIndices
-            search = kdtree.search
-            get_count = kdtree.getCount
-            torf = zeros(self._ag.numAtoms(), bool)
-            for index in which:
-                search(within, coords[index])
-                if get_count():
-                    torf[get_indices()] = True
-            if self._indices is not None:
-                torf = torf[self._indices]
+        if other or (self._frame is None and
+                     len(which) < self._n_atoms - len(which)):
+            # atoms within distance of all reference points are flagged in
+            # a single search of the atom group KDTree, which is not cached
+            # for frames, so it is built only for other coordinates
+            torf = self._getWithin(within, coords[which])
+            if torf is None:
+                return None, SelectionError(sel, loc, 'coordinates are '
+                                            'not set')
             if exclude:
                 torf[which] = False
 
         else:
-            n_atoms = self._ag.numAtoms()
-            torf = ones(n_atoms, bool)
-            torf[which] = False
-            check = torf.nonzero()[0]
-            torf = zeros(n_atoms, bool)
-
-            cxyz = coords[check]
-            kdtree = KDTree(coords[which])
-            search = kdtree.search
-            get_count = kdtree.getCount
-            select = []
-            append = select.append
-            for i, xyz in enumerate(cxyz):
-                search(within, xyz)
-                if get_count():
-                    append(i)
-
-            torf[check[select]] = True
-            if not exclude:
+            # other atoms are searched in a KDTree of reference points, when
+            # they are fewer or when coordinates of a frame are evaluated
+            torf = zeros(self._n_atoms, bool)
+            if len(which):
                 torf[which] = True
+                check = (~torf).nonzero()[0]
+                torf[which] = not exclude
+                kdtree = KDTree(coords[which])
+                torf[check] = kdtree.getWithin(within, coords[check],
+                                               'centers')
 
         return torf, False
 
@@ -2414,5 +2793,26 @@ class Select(object):
         """Returns coordinates of atoms."""
 
         if self._coords is None:
-            self._coords = self._atoms._getCoords()
+            if self._frame is None:
+                self._coords = self._atoms._getCoords()
+            else:
+                self._coords = self._frame
         return self._coords
+
+    def _getWithin(self, within, coords):
+        """Returns a boolean array with **True** values for atoms that are
+        within distance *within* of any of *coords*, or **None** when
+        coordinates of atoms are not set."""
+
+        if self._frame is None:
+            kdtree = self._atoms._getKDTree()
+            if kdtree is None:
+                return None
+            torf = kdtree.getWithin(within, coords)
+            if self._indices is not None:
+                torf = torf[self._indices]
+        else:
+            if self._kdtree is None:
+                self._kdtree = KDTree(self._frame)
+            torf = self._kdtree.getWithin(within, coords)
+        return torf
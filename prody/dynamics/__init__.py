@@ -121,6 +121,11 @@ using the following functions:
   * :func:`.loadModel`, :func:`.saveModel` - load/save dynamics models
   * :func:`.loadVector`, :func:`.saveVector` - load/save modes or vectors
 
+Results of short-hand functions can be cached on disk for reuse:
+
+  * :func:`.pathENMCache` - set folder and size of the ENM cache
+  * :func:`.clearENMCache` - remove cached models
+
 
 Short-hand functions
 ====================
@@ -129,6 +134,7 @@ Following allow for performing some dynamics calculations in one function call:
 
   * :func:`.calcANM` - perform ANM calculations
   * :func:`.calcGNM` - perform GNM calculations
+  * :func:`.calcEDA` - perform EDA of a trajectory out of core
   * :func:`.calcSM` - perform GNM calculations
 
 Plotting functions
@@ -208,6 +214,10 @@ from . import functions
 from .functions import *
 __all__.extend(functions.__all__)
 
+from . import enmcache
+from .enmcache import *
+__all__.extend(enmcache.__all__)
+
 from . import perturb
 from .perturb import *
 __all__.extend(perturb.__all__)
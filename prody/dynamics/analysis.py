@@ -296,108 +296,99 @@ def calcSqFlucts(modes):
     return sq_flucts
 
 
-def calcCrossCorr(modes, n_cpu=1, norm=True):
+def calcCrossCorr(modes, n_cpu=1, norm=True, **kwargs):
     """Returns cross-correlations matrix.  For a 3-d model, cross-correlations
     matrix is an NxN matrix, where N is the number of atoms.  Each element of
     this matrix is the trace of the submatrix corresponding to a pair of atoms.
     Covariance matrix may be calculated using all modes or a subset of modes
     of an NMA instance.  For large systems, calculation of cross-correlations
-    matrix may be time consuming.  Optionally, multiple processors may be
-    employed to perform calculations by passing ``n_cpu=2`` or more."""
+    matrix may be time consuming.  Optionally, multiple threads may be
+    employed to perform calculations by passing ``n_cpu=2`` or more.
+
+    The matrix is calculated for blocks of rows that use at most *memory*
+    megabytes, default is 256.  For matrices that do not fit in memory, an
+    NxN array, e.g. a :class:`numpy.memmap`, may be passed as *out* to write
+    the rows into, and it is returned."""
+
+    return _calcCrossCorrBlocks(modes, n_cpu, norm, **kwargs)
+
+
+def _calcCrossCorrBlocks(modes, n_cpu=1, norm=True, dist=False, **kwargs):
+    """Calculate cross-correlations, or distance fluctuations when *dist* is
+    **True**, for blocks of rows that are computed in *n_cpu* threads sharing
+    the mode array."""
 
     if not isinstance(n_cpu, int):
         raise TypeError('n_cpu must be an integer')
     elif n_cpu < 1:
         raise ValueError('n_cpu must be equal to or greater than 1')
 
-    if not isinstance(modes, (Mode, NMA, ModeSet)):
-        if isinstance(modes, list):
-            try:
-                is3d = modes[0].is3d()
-            except:
-                raise TypeError('modes must be a list of Mode or Vector instances, '
-                            'not {0}'.format(type(modes)))
-        else:
-            raise TypeError('modes must be a Mode, NMA, or ModeSet instance, '
-                            'not {0}'.format(type(modes)))
-    else:
-        is3d = modes.is3d()
-    if is3d:
-        model = modes
-        if isinstance(modes, (Mode, ModeSet)):
-            model = modes._model
-            if isinstance(modes, (Mode)):
-                indices = [modes.getIndex()]
-                n_modes = 1
-            else:
-                indices = modes.getIndices()
-                n_modes = len(modes)
-        else:
-            n_modes = len(modes)
-            indices = np.arange(n_modes)
-        array = model._getArray()
-        n_atoms = model._n_atoms
-        variances = model._vars
-        if n_cpu == 1:
-            s = (n_modes, n_atoms, 3)
-            arvar = (array[:, indices]*variances[indices]).T.reshape(s)
-            array = array[:, indices].T.reshape(s)
-            covariance = np.tensordot(array.transpose(2, 0, 1),
-                                      arvar.transpose(0, 2, 1),
-                                      axes=([0, 1], [1, 0]))
-        else:
-            import multiprocessing
-            n_cpu = min(multiprocessing.cpu_count(), n_cpu)
-            queue = multiprocessing.Queue()
-            size = n_modes / n_cpu
-            for i in range(n_cpu):
-                if n_cpu - i == 1:
-                    indices = modes.indices[i*size:]
-                else:
-                    indices = modes.indices[i*size:(i+1)*size]
-                process = multiprocessing.Process(
-                    target=_crossCorrelations,
-                    args=(queue, n_atoms, array, variances, indices))
-                process.start()
-            while queue.qsize() < n_cpu:
-                time.sleep(0.05)
-            covariance = queue.get()
-            while queue.qsize() > 0:
-                covariance += queue.get()
-    else:
-        covariance = calcCovariance(modes)
+    V, W, is3d, n_atoms = _getModeProperties(modes)
+    variances = np.diag(W)
+    dim = 3 if is3d else 1
+    # components of modes for each dimension, shape (dim, n_atoms, n_modes)
+    V = V.reshape((n_atoms, dim, -1)).transpose(1, 0, 2).copy()
+    diag = np.dot((V ** 2).sum(0), variances)
     if norm:
-        diag = np.power(covariance.diagonal(), 0.5)
-        D = np.outer(diag, diag)
-        covariance = div0(covariance, D)
-    return covariance
-
-
-def _crossCorrelations(queue, n_atoms, array, variances, indices):
-    """Calculate covariance-matrix for a subset of modes."""
+        scale = div0(1., np.power(diag, 0.5))
+        diag = diag * scale ** 2
+
+    out = kwargs.get('out')
+    if out is None:
+        out = np.empty((n_atoms, n_atoms))
+    elif out.shape != (n_atoms, n_atoms):
+        raise ValueError('out must be an array with shape ({0}, {0})'
+                         .format(n_atoms))
+
+    if n_cpu > 1:
+        import multiprocessing
+        n_cpu = min(multiprocessing.cpu_count(), n_cpu)
+    memory = kwargs.get('memory', 256) * 1024 * 1024
+    n_rows = max(1, int(memory // (3 * 8 * n_atoms * n_cpu)))
+
+    def calcBlock(start):
+        rows = slice(start, min(start + n_rows, n_atoms))
+        block = np.dot(V[0, rows] * variances, V[0].T)
+        for k in range(1, dim):
+            block += np.dot(V[k, rows] * variances, V[k].T)
+        if norm:
+            block *= scale[rows, None]
+            block *= scale
+        if dist:
+            block *= -2.
+            block += diag[rows, None]
+            block += diag
+        out[rows] = block
+
+    starts = range(0, n_atoms, n_rows)
+    if n_cpu == 1:
+        for start in starts:
+            calcBlock(start)
+    else:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(n_cpu)
+        try:
+            pool.map(calcBlock, starts)
+        finally:
+            pool.close()
+            pool.join()
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
 
-    n_modes = len(indices)
-    arvar = (array[:, indices] * variances[indices]).T.reshape((n_modes,
-                                                                n_atoms, 3))
-    array = array[:, indices].T.reshape((n_modes, n_atoms, 3))
-    covariance = np.tensordot(array.transpose(2, 0, 1),
-                              arvar.transpose(0, 2, 1),
-                              axes=([0, 1], [1, 0]))
-    queue.put(covariance)
 
-def calcDistFlucts(modes, n_cpu=1, norm=True):
+def calcDistFlucts(modes, n_cpu=1, norm=True, **kwargs):
     """Returns the matrix of distance fluctuations (i.e. an NxN matrix
     where N is the number of residues, of MSFs in the inter-residue distances)
     computed from the cross-correlation matrix (see Eq. 12.E.1 in [IB18]_). 
-    The arguments are the same as in :meth:`.calcCrossCorr`.
+    The arguments are the same as in :meth:`.calcCrossCorr`, and the matrix
+    is also calculated for blocks of rows without building the
+    cross-correlation matrix.
 
     .. [IB18] Dill K, Jernigan RL, Bahar I. Protein Actions: Principles and
        Modeling. *Garland Science* **2017**. """
 
-    cc = calcCrossCorr(modes, n_cpu=n_cpu, norm=norm)
-    cc_diag = np.diag(cc).reshape(-1,1)
-    distFluct = cc_diag.T + cc_diag -2.*cc
-    return distFluct
+    return _calcCrossCorrBlocks(modes, n_cpu, norm, dist=True, **kwargs)
 
 def calcTempFactors(modes, atoms):
     """Returns temperature (β) factors calculated using *modes* from a
@@ -12,7 +12,9 @@ from prody.utilities import checkCoords
 from prody.kdtree import KDTree
 
 from .nma import NMA
-from .gnm import GNMBase, solveEig, checkENMParameters
+from .gnm import GNMBase, solveEig, checkENMParameters, getContacts, \
+    isLinearOperator, getIncidence, assembleKirchhoffOperator, \
+    calcGammas, assembleKirchhoff
 
 __all__ = ['ANM', 'calcANM']
 
@@ -25,6 +27,7 @@ class ANMBase(NMA):
         self._cutoff = None
         self._gamma = None
         self._hessian = None
+        self._coords = None
 
     def _reset(self):
 
@@ -32,6 +35,7 @@ class ANMBase(NMA):
         self._cutoff = None
         self._gamma = None
         self._hessian = None
+        self._coords = None
         self._is3d = True
     
     def _clear(self):
@@ -43,6 +47,8 @@ class ANMBase(NMA):
 
         if self._hessian is None:
             return None
+        if isLinearOperator(self._hessian):
+            return self._hessian
         return self._hessian.copy()
 
     def _getHessian(self):
@@ -87,15 +93,27 @@ class ANMBase(NMA):
             Scipy is not found, :class:`ImportError` is raised.
         :type sparse: bool
 
-        :arg kdtree: elect to use KDTree for building Hessian matrix,
-            default is **False** since KDTree method is slower
+        :arg kdtree: elect to use KDTree for finding contacts, default is
+            **False** for dense and **True** for sparse matrices and operators
         :type kdtree: bool
 
+        :arg operator: elect to store a matrix-free linear operator that
+            multiplies vectors with the Hessian using coordinates and the
+            contact list, instead of the matrix, default is **False**.  Modes
+            are then calculated using an iterative solver.
+        :type operator: bool
+
         Instances of :class:`Gamma` classes and custom functions are
-        accepted as *gamma* argument.
+        accepted as *gamma* argument.  :class:`Gamma` instances evaluate
+        force constants of all contacts at once, custom functions are
+        called once per contact.
 
+        Contacts are collected into a pair list first, and the Hessian is
+        assembled from all pairs at once.
         When Scipy is available, user can select to use sparse matrices for
-        efficient usage of memory at the cost of computation speed."""
+        efficient usage of memory.  Sparse matrices are written directly from
+        the contact list into CSR format, so memory scales with the number of
+        contacts rather than the number of atoms squared."""
 
         try:
             coords = (coords._getCoords() if hasattr(coords, '_getCoords') else
@@ -123,73 +141,28 @@ class ANMBase(NMA):
             except ImportError:
                 raise ImportError('failed to import scipy.sparse, which  is '
                                   'required for sparse matrix calculations')
-            kirchhoff = scipy_sparse.lil_matrix((n_atoms, n_atoms))
-            hessian = scipy_sparse.lil_matrix((dof, dof))
-        else:
-            kirchhoff = np.zeros((n_atoms, n_atoms), 'd')
-            hessian = np.zeros((dof, dof), float)
 
-        if kwargs.get('kdtree', False):
+        operator = kwargs.get('operator', False)
+        kdtree = kwargs.get('kdtree', sparse or operator)
+        if kdtree:
             LOGGER.info('Using KDTree for building the Hessian.')
-            kdtree = KDTree(coords)
-            kdtree.search(cutoff)
-            for i, j in kdtree.getIndices():
-                i2j = coords[j] - coords[i]
-                dist2 = np.dot(i2j, i2j)
-                g = gamma(dist2, i, j)
-                super_element = np.outer(i2j, i2j) * (- g / dist2)
-                res_i3 = i*3
-                res_i33 = res_i3+3
-                res_j3 = j*3
-                res_j33 = res_j3+3
-                hessian[res_i3:res_i33, res_j3:res_j33] = super_element
-                hessian[res_j3:res_j33, res_i3:res_i33] = super_element
-                hessian[res_i3:res_i33, res_i3:res_i33] = \
-                    hessian[res_i3:res_i33, res_i3:res_i33] - super_element
-                hessian[res_j3:res_j33, res_j3:res_j33] = \
-                    hessian[res_j3:res_j33, res_j3:res_j33] - super_element
-                kirchhoff[i, j] = -g
-                kirchhoff[j, i] = -g
-                kirchhoff[i, i] = kirchhoff[i, i] + g
-                kirchhoff[j, j] = kirchhoff[j, j] + g
+        i, j, dist2 = getContacts(coords, cutoff, kdtree)
+        gammas = calcGammas(g, dist2, i, j)
+        if operator:
+            hessian = assembleHessianOperator(coords, i, j, dist2, gammas)
+            kirchhoff = assembleKirchhoffOperator(i, j, gammas, n_atoms)
         else:
-            cutoff2 = cutoff * cutoff
-            for i in range(n_atoms):
-                res_i3 = i*3
-                res_i33 = res_i3+3
-                i_p1 = i+1
-                i2j_all = coords[i_p1:, :] - coords[i]
-                for j, dist2 in enumerate((i2j_all ** 2).sum(1)):
-                    if dist2 > cutoff2:
-                        continue
-                    i2j = i2j_all[j]
-                    j += i_p1
-                    g = gamma(dist2, i, j)
-                    res_j3 = j*3
-                    res_j33 = res_j3+3
-                    super_element = np.outer(i2j, i2j) * (- g / dist2)
-                    hessian[res_i3:res_i33, res_j3:res_j33] = super_element
-                    hessian[res_j3:res_j33, res_i3:res_i33] = super_element
-                    hessian[res_i3:res_i33, res_i3:res_i33] = \
-                        hessian[res_i3:res_i33, res_i3:res_i33] - super_element
-                    hessian[res_j3:res_j33, res_j3:res_j33] = \
-                        hessian[res_j3:res_j33, res_j3:res_j33] - super_element
-                    kirchhoff[i, j] = -g
-                    kirchhoff[j, i] = -g
-                    kirchhoff[i, i] = kirchhoff[i, i] + g
-                    kirchhoff[j, j] = kirchhoff[j, j] + g
-
-        if sparse:
-            kirchhoff = kirchhoff.tocsr()
-            hessian = hessian.tocsr()
+            hessian, kirchhoff = assembleHessian(coords, i, j, dist2, gammas,
+                                                 sparse=sparse)
 
         LOGGER.report('Hessian was built in %.2fs.', label='_anm_hessian')
         self._kirchhoff = kirchhoff
         self._hessian = hessian
+        self._coords = coords.copy()
         self._n_atoms = n_atoms
         self._dof = dof
 
-    def calcModes(self, n_modes=20, zeros=False, turbo=True):
+    def calcModes(self, n_modes=20, zeros=False, turbo=True, **kwargs):
         """Calculate normal modes.  This method uses :func:`scipy.linalg.eigh`
         function to diagonalize the Hessian matrix. When Scipy is not found,
         :func:`numpy.linalg.eigh` is used.
@@ -203,6 +176,12 @@ class ANMBase(NMA):
 
         :arg turbo: Use a memory intensive, but faster way to calculate modes.
         :type turbo: bool, default is **True**
+
+        :arg solver: ``'lanczos'`` or ``'lobpcg'`` selects an iterative
+            solver for large sparse Hessians, which removes the six
+            rigid-body modes analytically, see :func:`.solveEigIterative`
+            for further options
+        :type solver: str
         """
 
         if self._hessian is None:
@@ -215,8 +194,10 @@ class ANMBase(NMA):
         assert isinstance(turbo, bool), 'turbo must be a boolean'
         self._clear()
         LOGGER.timeit('_anm_calc_modes')
+        if self._coords is not None:
+            kwargs.setdefault('coords', self._coords)
         values, vectors, vars = solveEig(self._hessian, n_modes=n_modes, zeros=zeros, 
-                                         turbo=turbo, is3d=True)
+                                         turbo=turbo, is3d=True, **kwargs)
         self._eigvals = values
         self._array = vectors
         self._vars = vars
@@ -254,11 +235,14 @@ class ANM(ANMBase, GNMBase):
 
 
 def calcANM(pdb, selstr='calpha', cutoff=15., gamma=1., n_modes=20,
-            zeros=False, title=None):
+            zeros=False, title=None, cache=False):
     """Returns an :class:`ANM` instance and atoms used for the calculations.
     By default only alpha carbons are considered, but selection string helps
     selecting a subset of it.  *pdb* can be a PDB code, :class:`.Atomic` 
-    instance, or a Hessian matrix (:class:`~numpy.ndarray`)."""
+    instance, or a Hessian matrix (:class:`~numpy.ndarray`).
+
+    If *cache* is **True** or a folder path, the model is loaded from or
+    saved to the ENM cache, see :func:`.pathENMCache`."""
 
     if isinstance(pdb, np.ndarray):
         H = pdb
@@ -286,9 +270,138 @@ def calcANM(pdb, selstr='calpha', cutoff=15., gamma=1., n_modes=20,
             raise TypeError('pdb must be an atomic class, not {0}'
                             .format(type(pdb)))
         
-        anm = ANM(title)
         sel = ag.select(selstr)
+        folder = key = None
+        if cache:
+            from .enmcache import getCacheEntry, loadCachedModel, \
+                saveCachedModel
+            folder, key = getCacheEntry(cache, sel, 'anm', cutoff, gamma,
+                                        n_modes, zeros)
+            anm = loadCachedModel(key, folder, title)
+            if anm is not None:
+                return anm, sel
+
+        anm = ANM(title)
         anm.buildHessian(sel, cutoff, gamma)
         anm.calcModes(n_modes, zeros)
+        if key is not None:
+            saveCachedModel(key, anm, folder)
     
         return anm, sel
+
+
+def assembleHessian(coords, i, j, dist2, gammas, sparse=False):
+    """Returns Hessian and Kirchhoff matrices assembled at once from contact
+    pairs.  Super-elements of all pairs are computed in a single batched
+    operation and scattered into the matrices in one pass.
+
+    :arg coords: node coordinates with shape ``(n_atoms, 3)``
+    :type coords: :class:`numpy.ndarray`
+
+    :arg i: first node indices of contact pairs
+    :type i: :class:`numpy.ndarray`
+
+    :arg j: second node indices of contact pairs, each pair must be listed
+        once
+    :type j: :class:`numpy.ndarray`
+
+    :arg dist2: squared distances between paired nodes
+    :type dist2: :class:`numpy.ndarray`
+
+    :arg gammas: spring constants of contact pairs
+    :type gammas: :class:`numpy.ndarray`
+
+    :arg sparse: return :class:`scipy.sparse.csr_matrix` instances instead
+        of dense arrays, default is **False**.  Sparse matrices are built
+        directly from the pairs, using memory proportional to the number of
+        contacts.
+    :type sparse: bool"""
+
+    n_atoms = coords.shape[0]
+    dof = n_atoms * 3
+    nodes = np.arange(n_atoms)
+
+    i2j = coords[j] - coords[i]
+    super_elements = i2j[:, :, np.newaxis] * i2j[:, np.newaxis, :]
+    super_elements *= (- gammas / dist2)[:, np.newaxis, np.newaxis]
+
+    # diagonal super-elements balance off-diagonal ones in each row
+    both = np.concatenate([i, j])
+    flat = super_elements.reshape(-1, 9)
+    diagonal = np.empty((n_atoms, 9))
+    for k in range(9):
+        diagonal[:, k] = -np.bincount(both, np.tile(flat[:, k], 2),
+                                      minlength=n_atoms)
+
+    if sparse:
+        from scipy import sparse as scipy_sparse
+
+        # super-elements are ordered by block row and column through the
+        # Kirchhoff sparsity pattern, and handed to a block sparse matrix
+        # so that only one index is stored per super-element
+        rows = np.concatenate([i, j, nodes])
+        cols = np.concatenate([j, i, nodes])
+        pattern = scipy_sparse.coo_matrix(
+            (np.arange(len(rows), dtype=float), (rows, cols)),
+            shape=(n_atoms, n_atoms)).tocsr()
+        order = pattern.data.astype(int)
+        blocks = np.concatenate([super_elements, super_elements,
+                                 diagonal.reshape(n_atoms, 3, 3)])[order]
+        hessian = scipy_sparse.bsr_matrix(
+            (blocks, pattern.indices, pattern.indptr),
+            shape=(dof, dof)).tocsr()
+    else:
+        hessian = np.zeros((n_atoms, 3, n_atoms, 3), float)
+        hessian[i, :, j, :] = super_elements
+        hessian[j, :, i, :] = super_elements
+        hessian[nodes, :, nodes, :] = diagonal.reshape(n_atoms, 3, 3)
+        hessian = hessian.reshape(dof, dof)
+
+    kirchhoff = assembleKirchhoff(i, j, gammas, n_atoms, sparse=sparse)
+    return hessian, kirchhoff
+
+
+def assembleHessianOperator(coords, i, j, dist2, gammas):
+    """Returns a :class:`scipy.sparse.linalg.LinearOperator` that computes
+    products of the Hessian with vectors on the fly from contact pairs, so
+    that the Hessian is never stored.  Arguments are the same as for
+    :func:`assembleHessian`.  Memory usage is a few numbers per contact, and
+    the operator has a :meth:`diagonal` method like sparse matrices."""
+
+    try:
+        from scipy.sparse.linalg import LinearOperator
+    except ImportError:
+        raise ImportError('failed to import scipy.sparse.linalg, which is '
+                          'required for linear operators')
+
+    n_atoms = coords.shape[0]
+    dof = n_atoms * 3
+    incidence = getIncidence(i, j, n_atoms)
+    transpose = incidence.T.tocsr()
+    # super-element of a pair is -gamma * u u^T for unit vector u
+    units = (coords[j] - coords[i]) / np.sqrt(dist2)[:, np.newaxis]
+    gammas = np.asarray(gammas, float)
+
+    def matmat(x):
+        x = np.asarray(x).reshape(n_atoms, -1)
+        n_vectors = x.shape[1] // 3
+        diff = incidence.dot(x).reshape(-1, 3, n_vectors)
+        projection = (units[:, :, np.newaxis] * diff).sum(1)
+        projection *= gammas[:, np.newaxis]
+        forces = units[:, :, np.newaxis] * projection[:, np.newaxis, :]
+        return transpose.dot(forces.reshape(-1, 3 * n_vectors)).reshape(
+            dof, n_vectors)
+
+    def matvec(x):
+        return np.ravel(matmat(x))
+
+    both = np.concatenate([i, j])
+    diagonal = np.empty((n_atoms, 3))
+    for k in range(3):
+        diagonal[:, k] = np.bincount(both, np.tile(gammas * units[:, k] ** 2, 2),
+                                     minlength=n_atoms)
+
+    hessian = LinearOperator((dof, dof), dtype=float, matvec=matvec,
+                             rmatvec=matvec, matmat=matmat)
+    hessian.diagonal = diagonal.ravel().copy
+    return hessian
@@ -112,7 +112,7 @@ class bbENM(ANMBase):
 
         LOGGER.report('Hessian was built in %.2fs.', label='_bbenm')
 
-    def calcModes(self, n_modes=20, zeros=False, turbo=True):
+    def calcModes(self, n_modes=20, zeros=False, turbo=True, **kwargs):
          """Calculate normal modes.  This method uses :func:`scipy.linalg.eigh`
          function to diagonalize the Hessian matrix. When Scipy is not found,
          :func:`numpy.linalg.eigh` is used.
@@ -128,7 +128,7 @@ class bbENM(ANMBase):
          :type turbo: bool, default is **True**
          """
 
-         super(bbENM, self).calcModes(n_modes, zeros, turbo)
+         super(bbENM, self).calcModes(n_modes, zeros, turbo, **kwargs)
 
     #     self._array = np.dot(self._project, self._array)
 
@@ -336,36 +336,87 @@ def pairModes(modes1, modes2, **kwargs):
 
     return outmodes1, outmodes2
 
-def _pairModes_wrapper(args):
-    modeset0, modesets, index = args
+MATCH_POOLS = {}
 
-    ret = []
-    for modeset in modesets:
-        _, reordered_modeset = pairModes(modeset0, modeset, index=index)
-        ret.append(reordered_modeset)
-    return ret
+MATCH_BATCH = 64
+
+def getMatchPool(n_worker):
+    """Returns a pool of *n_worker* processes that is kept alive for matching 
+    modes in subsequent calls."""
+
+    pool = MATCH_POOLS.get(n_worker)
+    if pool is None:
+        from multiprocessing import Pool
+        if not MATCH_POOLS:
+            import atexit
+            atexit.register(closeMatchPools)
+        pool = MATCH_POOLS[n_worker] = Pool(n_worker)
+    return pool
+
+def closeMatchPools():
+    """Terminate pools of processes used for matching modes."""
+
+    for pool in MATCH_POOLS.values():
+        pool.terminate()
+        pool.join()
+    MATCH_POOLS.clear()
+
+def _matchModeSets(args):
+    """Returns column indices of the optimal matches of reference modes to the 
+    modes of modesets from *start* to *stop*.  Normalized eigenvectors of all 
+    modesets are rows of *arrays*, which may be given as the filename and shape 
+    of a memory mapped array shared by processes."""
+
+    arrays, n_modes, start, stop, method = args
+    if isinstance(arrays, tuple):
+        filename, shape = arrays
+        arrays = np.memmap(filename, dtype=float, mode='r', shape=shape)
+
+    if method is None:
+        from scipy.optimize import linear_sum_assignment
+        method = linear_sum_assignment
+
+    overlaps = np.dot(arrays[:n_modes], arrays[start*n_modes:stop*n_modes].T)
+    overlaps = overlaps.reshape((n_modes, stop - start, n_modes))
+    del arrays
+
+    cols = []
+    for k in range(stop - start):
+        _, col_ind = method(1 - abs(overlaps[:, k, :]))
+        cols.append(col_ind)
+    return cols
 
 def matchModes(*modesets, **kwargs):
     """Returns the matches of modes among *modesets*. Note that the first 
     modeset will be treated as the reference so that only the matching 
     of each modeset to the first modeset is garanteed to be optimal.
+
+    Normalized eigenvectors of all modesets are copied into a single array 
+    and overlaps with the reference are calculated for batches of modesets.
     
     :arg index: if **True** then indices of modes will be returned instead of 
                 :class:`Mode` instances
     :type index: bool
 
     :arg turbo: if **True** then the computation will be performed in parallel. 
-                The number of threads is set to be the same as the number of 
-                CPUs. Assigning a number to specify the number of threads to be 
-                used. Note that if writing a script, ``if __name__ == '__main__'`` 
+                The number of processes is set to be the same as the number of 
+                CPUs. Assigning a number to specify the number of processes to be 
+                used. Eigenvectors are shared with processes through a memory 
+                mapped file and the pool of processes is kept for subsequent 
+                calls. Note that if writing a script, ``if __name__ == '__main__'`` 
                 is necessary to protect your code when multi-tasking. 
                 See https://docs.python.org/2/library/multiprocessing.html for details.
                 Default is **False**
     :type turbo: bool, int
+
+    :arg method: the function used to solve the assignment problem for a cost 
+                 matrix, default is :func:`~scipy.optimize.linear_sum_assignment`
+    :type method: function
     """
 
     index = kwargs.pop('index', False)
     turbo = kwargs.pop('turbo', False)
+    method = kwargs.pop('method', None)
 
     n_worker = None
     if not isinstance(turbo, bool):
@@ -384,38 +435,65 @@ def matchModes(*modesets, **kwargs):
     elif n_sets == 0:
         raise ValueError('at least one modeset should be given')
 
+    for modes in modesets:
+        if not isinstance(modes, (ModeSet, NMA)):
+            raise TypeError('modesets should be ModeSet or NMA instances')
+        if len(modes) != n_modes:
+            raise ValueError('the same number of modes should be provided')
+
+    shape = (n_sets * n_modes, modeset0.numEntries())
+    filename = None
     if turbo:
-        from multiprocessing import Pool, cpu_count
-        from math import ceil
+        from multiprocessing import cpu_count
+        from tempfile import mkstemp
+        import os
         
         if not n_worker:
             n_worker = cpu_count()
 
-        LOGGER.info('Matching {0} modes across {1} modesets with {2} threads...'
-                        .format(n_modes, n_sets, n_worker))
-
-        pool = Pool(n_worker)
-        n_sets_per_worker = ceil((n_sets - 1) / n_worker)
-        args = []
-        for i in range(n_worker):
-            start = i*n_sets_per_worker + 1
-            end = (i+1)*n_sets_per_worker + 1
-            subset = modesets[start:end]
-            args.append((modeset0, subset, index))
-        nested_ret = pool.map(_pairModes_wrapper, args)
-        for entry in nested_ret:
-            ret.extend(entry)
-
-        pool.close()
-        pool.join()
+        handle, filename = mkstemp(suffix='.dat', prefix='prody_modes_')
+        os.close(handle)
+        arrays = np.memmap(filename, dtype=float, mode='w+', shape=shape)
     else:
-        LOGGER.progress('Matching {0} modes across {1} modesets...'
-                        .format(n_modes, n_sets), n_sets, '_prody_matchModes')
-        for i, modeset in enumerate(modesets):
-            LOGGER.update(i, label='_prody_matchModes')
-            if i > 0:
-                _, reordered_modeset = pairModes(modeset0, modeset, index=index, **kwargs)
-                ret.append(reordered_modeset)
-        LOGGER.finish()
+        arrays = np.empty(shape)
+
+    try:
+        for i, modes in enumerate(modesets):
+            array = modes._getArray()
+            arrays[i*n_modes:(i+1)*n_modes] = (array / (array ** 2).sum(0) ** 0.5).T
+        
+        tasks = []
+        for start in range(1, n_sets, MATCH_BATCH):
+            stop = min(start + MATCH_BATCH, n_sets)
+            tasks.append((arrays, n_modes, start, stop, method))
+
+        if turbo:
+            LOGGER.info('Matching {0} modes across {1} modesets with {2} processes...'
+                            .format(n_modes, n_sets, n_worker))
+            arrays.flush()
+            del arrays
+            tasks = [((filename, shape),) + task[1:] for task in tasks]
+            results = getMatchPool(n_worker).map(_matchModeSets, tasks)
+        else:
+            LOGGER.progress('Matching {0} modes across {1} modesets...'
+                            .format(n_modes, n_sets), n_sets, '_prody_matchModes')
+            results = []
+            for task in tasks:
+                LOGGER.update(task[2], label='_prody_matchModes')
+                results.append(_matchModeSets(task))
+            LOGGER.finish()
+    finally:
+        if filename is not None:
+            arrays = tasks = None
+            os.remove(filename)
+
+    cols = [col_ind for result in results for col_ind in result]
+    for modes, col_ind in zip(modesets[1:], cols):
+        if index:
+            ret.append(col_ind)
+        else:
+            if isinstance(modes, ModeSet):
+                col_ind = modes._indices[col_ind]
+            ret.append(ModeSet(modes.getModel(), col_ind))
     
     return ret
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""This module defines functions for caching elastic network model results on
+disk.  Models are stored in :func:`.saveModel` format under a name derived
+from a hash of the node coordinates and model parameters, so that repeated
+calculations for the same structure are read from disk."""
+
+import os
+import hashlib
+from os.path import abspath, isdir, isfile, join
+from types import FunctionType
+
+import numpy as np
+
+from prody import LOGGER, SETTINGS
+
+from .functions import saveModel, loadModel
+from .gamma import Gamma
+
+__all__ = ['pathENMCache', 'clearENMCache', 'getENMCacheKey']
+
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+def pathENMCache(folder=None, size=None):
+    """Returns or specify the folder for caching ENM results that are
+    calculated using :func:`.calcANM`, :func:`.calcGNM`, or :func:`.calcENM`
+    with ``cache=True``.  To release the current folder, pass an invalid
+    path, e.g. ``folder=''``.
+
+    :arg size: maximum size of the cache in megabytes, least recently used
+        models are removed when it is exceeded, default is 1024
+    :type size: float"""
+
+    if folder is None:
+        folder = SETTINGS.get('enm_cache_folder')
+        if folder:
+            if isdir(folder):
+                return folder
+            else:
+                LOGGER.warn('ENM cache folder {0} is not accessible.'
+                            .format(repr(folder)))
+    else:
+        if isdir(folder):
+            folder = abspath(folder)
+            LOGGER.info('ENM cache folder is set: {0}'.format(repr(folder)))
+            SETTINGS['enm_cache_folder'] = folder
+            if size is not None:
+                SETTINGS['enm_cache_size'] = float(size)
+            SETTINGS.save()
+        else:
+            current = SETTINGS.pop('enm_cache_folder')
+            if current:
+                LOGGER.info('ENM cache folder {0} is released.'
+                            .format(repr(current)))
+                SETTINGS.pop('enm_cache_size')
+                SETTINGS.save()
+            else:
+                raise IOError('{0} is not a valid path.'.format(repr(folder)))
+
+
+def getCacheEntry(cache, coords, model, cutoff, gamma, n_modes, zeros=False):
+    """Returns cache folder and key for an ENM calculation.  *cache* argument
+    of ENM functions may be **True** for the folder set using
+    :func:`pathENMCache` or a folder path.  ``(None, None)`` is returned when
+    results cannot be cached."""
+
+    if cache is True:
+        folder = pathENMCache()
+    else:
+        folder = cache
+    if not folder or not isdir(folder):
+        LOGGER.warn('ENM cache folder is not set or does not exist, results '
+                    'will not be cached.')
+        return None, None
+    key = getENMCacheKey(coords, model, cutoff, gamma, n_modes, zeros)
+    if key is None:
+        LOGGER.warn('Results cannot be cached for gamma functions.')
+        return None, None
+    return folder, key
+
+
+def listCachedModels(folder):
+
+    return [join(folder, fn) for fn in os.listdir(folder)
+            if fn.startswith('enm_') and fn.endswith('.npz')]
+
+
+def clearENMCache(folder=None):
+    """Remove all cached models from the ENM cache *folder*, default is the
+    folder set using :func:`pathENMCache`."""
+
+    if folder is None:
+        folder = pathENMCache()
+    if not folder:
+        return
+    for filename in listCachedModels(folder):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+
+def updateHash(md5, value):
+    """Update *md5* with a representation of *value* that does not depend on
+    object identity."""
+
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            value = value.astype(str)
+        md5.update(str((value.dtype.str, value.shape)).encode())
+        md5.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value):
+            md5.update(str(key).encode())
+            updateHash(md5, value[key])
+    elif isinstance(value, (list, tuple)):
+        md5.update(str(len(value)).encode())
+        for item in value:
+            updateHash(md5, item)
+    else:
+        md5.update(repr(value).encode())
+
+
+def getENMCacheKey(coords, model, cutoff, gamma, n_modes, zeros=False):
+    """Returns a key identifying an ENM calculation, which is a hash of node
+    *coords*, *model* type, *cutoff*, *gamma*, *n_modes*, and *zeros*.
+    **None** is returned when *gamma* is a function, since its results
+    cannot be identified."""
+
+    if isinstance(gamma, FunctionType):
+        return None
+    coords = (coords._getCoords() if hasattr(coords, '_getCoords') else
+              coords)
+    md5 = hashlib.md5()
+    updateHash(md5, CACHE_VERSION)
+    updateHash(md5, np.asarray(coords, float))
+    updateHash(md5, str(model).lower())
+    updateHash(md5, float(cutoff))
+    if isinstance(gamma, Gamma):
+        updateHash(md5, gamma.__class__.__name__)
+        updateHash(md5, gamma.__dict__)
+    else:
+        updateHash(md5, float(gamma))
+    updateHash(md5, n_modes)
+    updateHash(md5, bool(zeros))
+    return md5.hexdigest()
+
+
+def loadCachedModel(key, folder, title=None):
+    """Returns model stored in cache *folder* under *key*, or **None** if it
+    is not found.  Access time of the file is updated for LRU eviction."""
+
+    if key is None:
+        return None
+    filename = join(folder, 'enm_{0}.npz'.format(key))
+    if not isfile(filename):
+        return None
+    try:
+        model = loadModel(filename)
+    except Exception as err:
+        LOGGER.warn('Cached model {0} could not be loaded ({1}).'
+                    .format(repr(filename), err))
+        return None
+    try:
+        os.utime(filename, None)
+    except OSError:
+        pass
+    if title is not None:
+        model.setTitle(title)
+    LOGGER.debug('Model was loaded from ENM cache {0}.'.format(repr(filename)))
+    return model
+
+
+def saveCachedModel(key, model, folder, size=None):
+    """Save *model* in cache *folder* under *key*, and remove least recently
+    used models when total size exceeds *size* megabytes."""
+
+    if key is None:
+        return
+    # write to a temporary file first, so that concurrent jobs never read
+    # a partially written model
+    filename = join(folder, 'enm_{0}.npz'.format(key))
+    temp = join(folder, '.enm_{0}_{1}.npz'.format(key, os.getpid()))
+    try:
+        saveModel(model, temp)
+        os.rename(temp, filename)
+    except (IOError, OSError) as err:
+        LOGGER.warn('Model could not be saved in ENM cache ({0}).'
+                    .format(err))
+        if isfile(temp):
+            os.remove(temp)
+        return
+
+    if size is None:
+        size = SETTINGS.get('enm_cache_size', DEFAULT_CACHE_SIZE)
+    evictCachedModels(folder, size)
+
+
+def evictCachedModels(folder, size):
+    """Remove least recently used models in *folder* until total size is
+    smaller than *size* megabytes."""
+
+    limit = size * 1024 * 1024
+    files = []
+    for filename in listCachedModels(folder):
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, filename))
+    total = sum(item[1] for item in files)
+    files.sort()
+    while files and total > limit:
+        _, filesize, filename = files.pop(0)
+        try:
+            os.remove(filename)
+        except OSError:
+            continue
+        total -= filesize
+        LOGGER.debug('{0} was removed from ENM cache.'.format(repr(filename)))
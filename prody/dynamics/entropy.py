@@ -17,7 +17,8 @@ from numpy import sqrt, arange, log, polyfit, array
 from .nma import NMA
 
 
-__all__ = ['calcEntropyTransfer', 'calcOverallNetEntropyTransfer']
+__all__ = ['calcEntropyTransfer', 'calcAllEntropyTransfer', 'calcNetEntropyTransfer',
+           'calcOverallNetEntropyTransfer']
 
 def calcEntropyTransfer(model, ind1, ind2, tau):
     """This function calculates the entropy transfer from residue indice 
@@ -72,87 +73,109 @@ def calcEntropyTransfer(model, ind1, ind2, tau):
     T += 0.5 * np.log(dummy1*dummy2-dummy3**2)
     return T
 
-def calcAllEntropyTransfer(model, tau):
-    """This function calculates the net entropy transfer for a whole structure 
-    with a given time constant tau based on GNM.  
+def calcAllEntropyTransfer(model, tau, **kwargs):
+    """This function calculates the entropy transfer for all residue pairs of
+    a whole structure with a given time constant tau based on GNM.  *tau* may
+    be a number or an array of time constants, in which case an array with
+    a matrix for each time constant is returned.
+
+    Entropy transfer is calculated in closed form from the covariance matrix
+    and time-delayed covariance matrices, which are built from modes for
+    blocks of rows so that at most *memory* megabytes, default is 256, are
+    used for intermediate arrays.
     """
     if not isinstance(model, NMA):
         raise TypeError('model must be a NMA instance')
     elif model.is3d():
         raise TypeError('model must be a 1-dimensional NMA instance')
 
-    linalg = importLA()
-    n_atoms = model.numAtoms()
-    n_modes = model.numModes()
-
-    entropyTransfer = np.zeros((n_atoms,n_atoms))
-    for i in range(n_atoms):
-        for j in range(n_atoms):
-            if i != j:
-                entropyTransfer[i,j]=calcEntropyTransfer(model,i,j,tau)
+    taus = np.array(tau, float, ndmin=1)
+    entropyTransfer = np.zeros((len(taus), model.numAtoms(), model.numAtoms()))
+    for rows, block in iterEntropyTransferBlocks(model, taus,
+                                                 kwargs.get('memory', 256)):
+        entropyTransfer[:, rows] = block
 
+    if np.ndim(tau) == 0:
+        return entropyTransfer[0]
     return entropyTransfer
 
-def calcNetEntropyTransfer(entropyTransfer):
-    n_atoms = entropyTransfer.shape[0]
+def iterEntropyTransferBlocks(model, taus, memory=256):
+    """Yield slices of rows and entropy transfer for those rows as an array
+    with shape ``(len(taus), n_rows, n_atoms)``.  Per-mode terms are shared by
+    all residue pairs and time constants."""
+
+    n_atoms = model.numAtoms()
+    eigvecs = model.getEigvecs()
+    weights = 1.0 / model.getEigvals()
+    tau_0 = 1
+    # time-delayed weights of modes, one column for each tau
+    delayed = weights[:, None] * np.exp(-np.outer(model.getEigvals(),
+                                                  taus) / tau_0)
+
+    a_diag = np.dot(eigvecs ** 2, weights)
+    b_diags = np.dot(eigvecs ** 2, delayed).T
+
+    # result and about six temporary arrays of the same shape per block
+    n_rows = int(memory * 1024 * 1024 // (8 * n_atoms * (len(taus) + 6)))
+    n_rows = max(1, n_rows)
+    for start in range(0, n_atoms, n_rows):
+        rows = slice(start, min(start + n_rows, n_atoms))
+        a_ij = np.dot(eigvecs[rows] * weights, eigvecs.T)
+        a_ii = a_diag[rows, None]
+        a_jj = a_diag[None, :]
+        block = np.zeros((len(taus), a_ij.shape[0], n_atoms))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            det_a = np.log(a_ii * a_jj - a_ij ** 2) - np.log(a_jj)
+            for t in range(len(taus)):
+                b_ij = np.dot(eigvecs[rows] * delayed[:, t], eigvecs.T)
+                b_jj = b_diags[t][None, :]
+                T = -np.log(a_ii * a_jj ** 2 + 2 * a_ij * b_jj * b_ij -
+                            (b_ij ** 2 + a_ij ** 2) * a_jj - b_jj ** 2 * a_ii)
+                T += np.log(a_jj ** 2 - b_jj ** 2)
+                T += det_a
+                T *= 0.5
+                block[t] = T
+        block[:, np.arange(a_ij.shape[0]), np.arange(n_atoms)[rows]] = 0
+        yield rows, block
 
-    netEntropyTransfer = np.zeros((n_atoms,n_atoms))
-    for i in range(n_atoms):
-        for j in range(n_atoms):
-            netEntropyTransfer[i,j]=entropyTransfer[i,j]-entropyTransfer[j,i]
+def calcNetEntropyTransfer(entropyTransfer):
+    """Returns net entropy transfer, i.e. the difference between entropy
+    transfer from *i* to *j* and from *j* to *i*.  *entropyTransfer* may also
+    be an array of matrices, e.g. for several time constants."""
 
-    return netEntropyTransfer
+    entropyTransfer = np.asarray(entropyTransfer)
+    return entropyTransfer - np.swapaxes(entropyTransfer, -1, -2)
 
-def calcOverallNetEntropyTransfer(model, turbo=False):
+def calcOverallNetEntropyTransfer(model, turbo=False, **kwargs):
     """This function calculates the net entropy transfer for a whole structure 
-    with a given time constant tau based on GNM.  
+    integrated over time constants from 0 to *tau_max*, default is 5.0, with
+    *tau_step*, default is 0.1, based on GNM.  
+
+    Entropy transfer is integrated for blocks of rows as it is calculated,
+    so matrices for all time constants are not stored.  *turbo* is accepted
+    for backward compatibility, the calculation is vectorized and does not
+    use multiple processes.
     """
     if not isinstance(model, NMA):
         raise TypeError('model must be a NMA instance')
     elif model.is3d():
         raise TypeError('model must be a 1-dimensional NMA instance')
 
-    linalg = importLA()
     n_atoms = model.numAtoms()
-    n_modes = model.numModes()
 
-    tau_max = 5.0 
-    tau_step = 0.1
+    tau_max = kwargs.get('tau_max', 5.0)
+    tau_step = kwargs.get('tau_step', 0.1)
     taus = np.arange(start=tau_step, stop=tau_max+1e-6, step=tau_step)
     taus = np.insert(taus,0,0.000001)
-    numTaus = len(taus)
-    netEntropyTransfer = np.zeros((numTaus,n_atoms,n_atoms))
-    if turbo:
-        try:
-            from joblib import Parallel, delayed
-            import multiprocessing as mp
-        except: 
-            LOGGER.report('joblib and multiprocessing is not imported. Running' + 
-                'with sequential execution.')
-        LOGGER.timeit('_ent_trans')
-        n_cpu = mp.cpu_count()
-        netEntropyTransfer = Parallel(n_jobs=n_cpu)(delayed(calcAllEntropyTransfer)(model,taus[i]) \
-            for i in range(numTaus))
-        netEntropyTransfer = np.asarray(netEntropyTransfer)
-    
-    else:
-        LOGGER.timeit('_ent_trans')
-        for i in range(len(taus)):
-            netEntropyTransfer[i,:,:] = calcAllEntropyTransfer(model,taus[i])
 
+    LOGGER.timeit('_ent_trans')
+    overallNetEntropyTransfer = np.zeros((n_atoms,n_atoms))
+    for rows, block in iterEntropyTransferBlocks(model, taus,
+                                                 kwargs.get('memory', 256)):
+        overallNetEntropyTransfer[rows] = np.trapz(block, taus, axis=0)
     LOGGER.report('Net Entropy Transfer calculation is completed in %.1fs.',
                   '_ent_trans')
 
-    overallNetEntropyTransfer = np.zeros((n_atoms,n_atoms))
-
-    LOGGER.timeit('_num_int')
-    for i in range(n_atoms):
-        for j in range(n_atoms):
-            if i != j:
-                overallNetEntropyTransfer[i,j] = np.trapz(netEntropyTransfer[:,i,j],taus)
-    LOGGER.report('Numerical integration is completed in %.1fs.',
-                  '_num_int')
-
     return overallNetEntropyTransfer
 
 def test():
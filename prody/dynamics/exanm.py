@@ -8,8 +8,8 @@ from prody.atomic import Atomic, AtomGroup
 from prody.utilities import importLA, checkCoords, copy
 from numpy import sqrt, zeros, array, ceil, dot
 
-from .anm import ANM
-from .gnm import checkENMParameters
+from .anm import ANM, assembleHessian
+from .gnm import checkENMParameters, calcGammas, getContacts
 from .editing import reduceModel
 
 LA = importLA()
@@ -18,6 +18,12 @@ norm = LA.norm
 
 __all__ = ['exANM']
 
+MEMBRANE_LATTICES = {}
+
+LATTICE_CACHE_SIZE = 8
+
+SCHUR_BLOCK = 256
+
 class exANM(ANM):
 
     """Class for explicit ANM (exANM) method ([FT00]_).
@@ -72,6 +78,10 @@ class exANM(ANM):
         :arg center: whether transform the structure to the origin (only x- and y-axis). 
                      Default is **True**
         :type center: bool
+
+        Lattice nodes for given parameters are generated once and cached, and
+        nodes that clash with the protein are excluded all at once using
+        :class:`.KDTree`.
         """
         
         atoms = coords
@@ -115,8 +125,6 @@ class exANM(ANM):
         use_hull = kwargs.pop('hull', True)
         centering = kwargs.pop('center', True)
         
-        V = assign_lpvs(lat)
-
         if centering:
             c0 = coords.mean(axis=0)
             c0[-1] = 0.
@@ -134,33 +142,9 @@ class exANM(ANM):
         else:
             hull = transmembrane
 
-        ## determine the bound for ijk
-        imax = (R + V[0,2] * (hu - hl)/2.)/r
-        jmax = (R + V[1,2] * (hu - hl)/2.)/r
-        kmax = (R + V[2,2] * (hu - hl)/2.)/r    
-
-        imax = int(ceil(imax))
-        jmax = int(ceil(jmax))
-        kmax = int(ceil(kmax))
-
-        membrane = []
-        atm = 0
-        for i in range(-imax, imax):
-            for j in range(-jmax, jmax):
-                for k in range(-kmax, kmax):
-                    c = array([i, j, k])
-                    xyz = 2.*r*dot(c, V)
-                    
-                    if xyz[2]>hl and xyz[2]<hu and \
-                       xyz[0]>-R and xyz[0]<R and \
-                       xyz[1]>-R and xyz[1]<R:
-                        dd = norm(xyz[:2])
-                        if dd < R and dd > Ri:
-                            if checkClash(xyz, hull, radius=exr):
-                                membrane.append(xyz)
-                                atm = atm + 1 
-
-        membrane = array(membrane)
+        membrane = buildLattice(lat, R, Ri, r, hl, hu)
+        membrane = membrane[checkClashes(membrane, hull, radius=exr)]
+        atm = len(membrane)
 
         if len(membrane) == 0:
             self._membrane = None
@@ -215,39 +199,40 @@ class exANM(ANM):
 
         LOGGER.timeit('_exanm')
 
-        total_natoms = int(coords.shape[0])
-        self._hessian = np.zeros((natoms*3, natoms*3), float)
-        total_hessian = np.zeros((total_natoms*3, total_natoms*3), float)
         cutoff, g, gamma = checkENMParameters(cutoff, gamma)
-        cutoff2 = cutoff * cutoff
-        for i in range(total_natoms):
-            res_i3 = i*3
-            res_i33 = res_i3+3
-            i_p1 = i+1
-            i2j_all = coords[i_p1:, :] - coords[i]
-            for j, dist2 in enumerate((i2j_all ** 2).sum(1)):
-                if dist2 > cutoff2:
-                    continue
-                i2j = i2j_all[j]
-                j += i_p1
-                g = gamma(dist2, i, j)
-                res_j3 = j*3
-                res_j33 = res_j3+3
-                super_element = np.outer(i2j, i2j) * (- g / dist2)
-                total_hessian[res_i3:res_i33, res_j3:res_j33] = super_element
-                total_hessian[res_j3:res_j33, res_i3:res_i33] = super_element
-                total_hessian[res_i3:res_i33, res_i3:res_i33] = total_hessian[res_i3:res_i33, res_i3:res_i33] - super_element
-                total_hessian[res_j3:res_j33, res_j3:res_j33] = total_hessian[res_j3:res_j33, res_j3:res_j33] - super_element
-
-        ss = total_hessian[:natoms*3, :natoms*3]
-        so = total_hessian[:natoms*3, natoms*3:]
-        os = total_hessian[natoms*3:,:natoms*3]
-        oo = total_hessian[natoms*3:, natoms*3:]
-        self._hessian = ss - np.dot(so, np.dot(inv(oo), os))
+        i, j, dist2 = getContacts(coords, cutoff)
+        gammas = calcGammas(g, dist2, i, j)
+
+        # membrane is condensed out of the combined Hessian using sparse
+        # factorization of its block, which is solved for blocks of columns
+        # of the coupling to the protein; the block is symmetric, so it is
+        # ordered for a symmetric factorization to limit fill-in
+        try:
+            from scipy.sparse.linalg import splu
+        except ImportError:
+            splu = None
+        total_hessian, _ = assembleHessian(coords, i, j, dist2, gammas,
+                                           sparse=splu is not None)
+
+        n = natoms * 3
+        ss = total_hessian[:n, :n]
+        so = total_hessian[:n, n:]
+        os = total_hessian[n:, :n]
+        oo = total_hessian[n:, n:]
+        if splu is None:
+            self._hessian = ss - np.dot(so, np.dot(inv(oo), os))
+        else:
+            self._hessian = ss.toarray()
+            lu = splu(oo.tocsc(), permc_spec='MMD_AT_PLUS_A',
+                      options=dict(SymmetricMode=True))
+            for start in range(0, n, SCHUR_BLOCK):
+                stop = min(start + SCHUR_BLOCK, n)
+                self._hessian[:, start:stop] -= so.dot(
+                    lu.solve(os[:, start:stop].toarray()))
         LOGGER.report('Hessian was built in %.2fs.', label='_exanm')
         self._dof = self._hessian.shape[0]
     
-    def calcModes(self, n_modes=20, zeros=False, turbo=True):
+    def calcModes(self, n_modes=20, zeros=False, turbo=True, **kwargs):
         """Calculate normal modes.  This method uses :func:`scipy.linalg.eigh`
         function to diagonalize the Hessian matrix. When Scipy is not found,
         :func:`numpy.linalg.eigh` is used.
@@ -263,7 +248,7 @@ class exANM(ANM):
         :type turbo: bool, default is **True**
         """
 
-        super(exANM, self).calcModes(n_modes, zeros, turbo)
+        super(exANM, self).calcModes(n_modes, zeros, turbo, **kwargs)
 
     def getMembrane(self):
         """Returns a copy of the membrane coordinates."""
@@ -309,9 +294,53 @@ def assign_lpvs(lat):
         lpv[2,2]=1.
     return lpv
 
-def checkClash(node, hull, radius=5.):
-    """ Check there is a clash between given coordinate and all pdb coordinates.
-    **False** for clashing and **True** for not clashing."""
+def buildLattice(lat, R, Ri, r, hl, hu):
+    """Returns coordinates of lattice nodes that fill the membrane slab
+    between *hl* and *hu* and radii *Ri* and *R* in x-y plane, see
+    :meth:`exANM.buildMembrane`.  Lattices are cached for given parameters
+    and returned as read-only arrays."""
+
+    key = (lat, R, Ri, r, hl, hu)
+    if key in MEMBRANE_LATTICES:
+        return MEMBRANE_LATTICES[key]
+
+    V = assign_lpvs(lat)
+
+    ## determine the bound for ijk
+    imax = int(ceil((R + V[0,2] * (hu - hl)/2.)/r))
+    jmax = int(ceil((R + V[1,2] * (hu - hl)/2.)/r))
+    kmax = int(ceil((R + V[2,2] * (hu - hl)/2.)/r))
+
+    # nodes are generated for one plane of i at a time, in the same order
+    # as a loop over i, j, and k
+    jk = np.indices((2 * jmax, 2 * kmax)).reshape(2, -1).T
+    jk -= [jmax, kmax]
+    c = np.empty((len(jk), 3), int)
+    c[:, 1:] = jk
+    membrane = []
+    for i in range(-imax, imax):
+        c[:, 0] = i
+        xyz = 2.*r*dot(c, V)
+        dd = norm(xyz[:, :2], axis=1)
+        which = ((xyz[:, 2] > hl) & (xyz[:, 2] < hu) &
+                 (xyz[:, 0] > -R) & (xyz[:, 0] < R) &
+                 (xyz[:, 1] > -R) & (xyz[:, 1] < R) & (dd < R) & (dd > Ri))
+        membrane.append(xyz[which])
+    membrane = np.concatenate(membrane)
+    membrane.flags.writeable = False
+
+    if len(MEMBRANE_LATTICES) >= LATTICE_CACHE_SIZE:
+        MEMBRANE_LATTICES.clear()
+    MEMBRANE_LATTICES[key] = membrane
+    return membrane
+
+def checkClashes(nodes, hull, radius=5.):
+    """ Check there is a clash between given coordinates and all pdb coordinates.
+    Returns a boolean array that is **False** for clashing and **True** for not
+    clashing nodes.  Nodes in the convex *hull* clash, and others are checked
+    against hull points at once using :class:`.KDTree`."""
+
+    from prody.kdtree import KDTree
 
     if isinstance(hull, np.ndarray):
         H = hull
@@ -320,22 +349,43 @@ def checkClash(node, hull, radius=5.):
         H = hull.points
         ishull = True
 
+    nodes = np.asarray(nodes, float).reshape((-1, 3))
+    free = np.ones(len(nodes), bool)
+
+    # only nodes in the bounding box of the protein may clash
     lb = H.min(axis=0) - radius
     ub = H.max(axis=0) + radius
-    if np.all(node > ub) or np.all(node < lb):
-        return True
-    
+    near = np.flatnonzero(np.all((nodes <= ub) & (nodes >= lb), 1))
+    if not len(near):
+        return free
+
     if ishull:
-        in_hull = all([dot(eq[:-1], node) + eq[-1] <= 0 
-                    for eq in hull.equations])
+        eqs = hull.equations
+        in_hull = np.all(dot(nodes[near], eqs[:, :-1].T) + eqs[:, -1] <= 0, 1)
+        free[near[in_hull]] = False
+        near = near[~in_hull]
+        if not len(near):
+            return free
+
+    # pairs of nodes and protein points are found in a single search over
+    # both, and distances are rechecked since KDTree is single precision
+    n_points = len(H)
+    tree = KDTree(np.concatenate([H, nodes[near]]))
+    tree.search(radius)
+    pairs = tree.getIndices()
+    if pairs is not None:
+        pairs = np.sort(pairs, axis=1)
+        pairs = pairs[(pairs[:, 0] < n_points) & (pairs[:, 1] >= n_points)]
+        dist = norm(H[pairs[:, 0]] - nodes[near[pairs[:, 1] - n_points]],
+                    axis=1)
+        free[near[pairs[dist < radius, 1] - n_points]] = False
+    return free
 
-        if in_hull:
-            return False
+def checkClash(node, hull, radius=5.):
+    """ Check there is a clash between given coordinate and all pdb coordinates.
+    **False** for clashing and **True** for not clashing."""
 
-    for coord in H:
-        if norm(node-coord)<radius:
-            return False
-    return True
+    return bool(checkClashes(node, hull, radius)[0])
 
 
 
@@ -165,6 +165,9 @@ def loadModel(filename, **kwargs):
         for attr in attr_dict.files:
             if attr in ('type', '_name', '_title'):
                 continue
+            elif attr == '_gamma' and attr_dict[attr].dtype == object:
+                # Gamma instances are pickled
+                dict_[attr] = attr_dict[attr][()]
             elif attr in ('_trace', '_cutoff', '_gamma'):
                 dict_[attr] = float(attr_dict[attr])
             elif attr in ('_dof', '_n_atoms', '_n_modes'):
@@ -430,6 +433,11 @@ def calcENM(atoms, select=None, model='anm', trim='trim', gamma=1.0,
         be either 'trim' , 'slice', or 'reduce'. If set to 'trim', the parts 
         that is not in the selection will simply be removed
     :type trim: str
+
+    :arg cache: if **True** or a folder path, the model is loaded from or
+        saved to the ENM cache, see :func:`.pathENMCache`. Sliced and reduced
+        models are not cached.
+    :type cache: bool, str
     """
     
     if not isinstance(atoms, Atomic):
@@ -443,6 +451,7 @@ def calcENM(atoms, select=None, model='anm', trim='trim', gamma=1.0,
 
     zeros = kwargs.pop('zeros', False)
     turbo = kwargs.pop('turbo', True)
+    cache = kwargs.pop('cache', False)
 
     if model is GNM:
         model = 'gnm'
@@ -466,6 +475,18 @@ def calcENM(atoms, select=None, model='anm', trim='trim', gamma=1.0,
         else:
             atoms = atoms.select(str(select))
     
+    folder = key = None
+    if cache and (select is None or trim == 'trim') and model in ('anm', 'gnm'):
+        from .enmcache import getCacheEntry, loadCachedModel, saveCachedModel
+        cutoff = kwargs.get('cutoff', 15. if model == 'anm' else 10.)
+        folder, key = getCacheEntry(cache, atoms, model, cutoff, gamma,
+                                    n_modes, zeros)
+        enm = loadCachedModel(key, folder, title)
+        if enm is not None:
+            if model == 'gnm':
+                enm.calcHinges()
+            return enm, atoms
+
     enm = None
     if model == 'anm':
         anm = ANM(title)
@@ -491,5 +512,8 @@ def calcENM(atoms, select=None, model='anm', trim='trim', gamma=1.0,
             enm.calcModes(n_modes=n_modes, zeros=zeros, turbo=turbo)
         else:
             enm.calcModes(n_modes=n_modes, zeros=zeros, turbo=turbo)
+
+    if key is not None:
+        saveCachedModel(key, enm, folder)
     
     return enm, atoms
@@ -12,7 +12,9 @@ __all__ = ['Gamma', 'GammaStructureBased', 'GammaVariableCutoff']
 class Gamma(object):
 
     """Base class for facilitating use of atom type, residue type, or residue
-    property dependent force constants (γ).
+    property dependent force constants (γ).  Derived classes implement
+    :meth:`gamma` for single node pairs and may override :meth:`gammas` with
+    a vectorized version for arrays of node pairs.
 
     Derived classes:
 
@@ -31,6 +33,18 @@ class Gamma(object):
 
         pass
 
+    def gammas(self, dist2, i, j):
+        """Returns force constants for many node pairs at once.
+
+        Arrays of squared distances and of node indices of the pairs are
+        passed to this function, and an array of force constants is
+        returned.  This implementation calls :meth:`gamma` for each pair,
+        derived classes override it with a vectorized implementation."""
+
+        gamma = self.gamma
+        return np.array([gamma(d2, i_, j_) for d2, i_, j_ in zip(dist2, i, j)],
+                        float)
+
 
 class GammaStructureBased(Gamma):
 
@@ -197,6 +211,29 @@ class GammaStructureBased(Gamma):
 
         return self._gamma
 
+    def gammas(self, dist2, i, j):
+        """Returns force constants for arrays of node pairs."""
+
+        dist2 = np.asarray(dist2)
+        sstr = self._sstr
+        ssid = self._ssid
+        rnum = self._rnum
+        sstr_i = sstr[i]
+        i_j = np.abs(rnum[j] - rnum[i])
+        same = ssid[i] == ssid[j]
+        helix = same & (dist2 <= 49) & (((i_j <= 4) & (sstr_i == 'H')) |
+                                        ((i_j <= 3) & (sstr_i == 'G')) |
+                                        ((i_j <= 5) & (sstr_i == 'I')))
+        sheet = (~same & (sstr_i == 'E') & (sstr[j] == 'E') &
+                 (dist2 <= 36))
+
+        gammas = np.empty(len(dist2))
+        gammas.fill(self._gamma)
+        gammas[helix] = self._helix
+        gammas[sheet] = self._sheet
+        gammas[dist2 <= 16] = self._connected
+        return gammas
+
 
 class GammaVariableCutoff(Gamma):
 
@@ -299,3 +336,12 @@ class GammaVariableCutoff(Gamma):
                   'effective cutoff:', str(cutoff), 'distance:',
                   str(dist2**0.5), 'gamma:', str(gamma)]))  # PY3K: OK
         return gamma
+
+    def gammas(self, dist2, i, j):
+        """Returns force constants for arrays of node pairs."""
+
+        if self._debug:
+            return super(GammaVariableCutoff, self).gammas(dist2, i, j)
+
+        cutoff = self._radii[i] + self._radii[j]
+        return np.where(np.asarray(dist2) < cutoff ** 2, self._gamma, 0.)
@@ -16,12 +16,43 @@ from prody.utilities import importLA, checkCoords, div0
 from .nma import NMA
 from .gamma import Gamma
 
-__all__ = ['GNM', 'solveEig', 'calcGNM', 'MaskedGNM']
+__all__ = ['GNM', 'solveEig', 'solveEigIterative', 'calcGNM', 'MaskedGNM',
+           'calcHitTimes']
 
 ZERO = 1e-6
 
+# number of distances evaluated at a time when contacts are found without KDTree
+CONTACT_BLOCK = 2 ** 20
+
+
+def solveEig(M, n_modes=None, zeros=False, turbo=True, is3d=False, **kwargs):
+    """Returns eigenvalues, eigenvectors, and variances of the lowest
+    *n_modes* non-zero modes of matrix *M*.
+
+    :arg solver: ``'eigh'`` (default) uses :func:`scipy.linalg.eigh` for
+        dense and :func:`scipy.sparse.linalg.eigsh` for sparse matrices.
+        ``'lanczos'`` (shift-invert Lanczos) and ``'lobpcg'`` are iterative
+        solvers for large sparse matrices, which remove rigid-body zero modes
+        analytically and compute only the requested modes, see
+        :func:`solveEigIterative` for their options.  Linear operators, see
+        :func:`assembleKirchhoffOperator`, are handled using ``'lobpcg'``
+    :type solver: str"""
+
+    solver = str(kwargs.pop('solver', 'eigh')).lower()
+    if isLinearOperator(M):
+        if n_modes is None or n_modes >= M.shape[0] // 2:
+            raise ValueError('n_modes must be small compared to the size of '
+                             'a linear operator')
+        if solver == 'eigh':
+            solver = 'lobpcg'
+    if solver != 'eigh':
+        if n_modes is None or n_modes >= M.shape[0] // 2:
+            LOGGER.warning('Iterative solvers are not suitable for computing '
+                           'most of the modes, eigh is used instead.')
+        else:
+            return solveEigIterative(M, n_modes, zeros, is3d, solver,
+                                     **kwargs)
 
-def solveEig(M, n_modes=None, zeros=False, turbo=True, is3d=False):
     linalg = importLA()
     dof = M.shape[0]
 
@@ -87,7 +118,15 @@ def solveEig(M, n_modes=None, zeros=False, turbo=True, is3d=False):
                 raise ImportError('failed to import scipy.sparse.linalg, '
                                     'which is required for sparse matrix '
                                     'decomposition')
-            w, _ = scipy_sparse_la.eigsh(M, k=dof-1, which='SA')
+            # request more eigenvalues until a non-zero one shows up, rather
+            # than requesting nearly all of them at once
+            k = min(2 * (n_modes + expct_n_zeros), dof - 1)
+            while True:
+                w = scipy_sparse_la.eigsh(M, k=k, which='SA',
+                                          return_eigenvectors=False)
+                if (w >= ZERO).any() or k == dof - 1:
+                    break
+                k = min(2 * k, dof - 1)
         n_zeros = sum(w < ZERO)
         return n_zeros
 
@@ -130,6 +169,193 @@ def solveEig(M, n_modes=None, zeros=False, turbo=True, is3d=False):
     return eigvals, eigvecs, vars
 
 
+def calcRigidBodyModes(M, is3d=False, coords=None):
+    """Returns an orthonormal basis of the zero modes of *M* that can be
+    written down analytically, i.e. uniform translation for GNM, and rigid
+    translations and, if node *coords* are given, rotations for ANM.  Only
+    vectors that are verified to be in the null space of *M* are returned,
+    so models with constraints, e.g. RTB or imANM, are handled safely."""
+
+    dof = M.shape[0]
+    if not is3d:
+        vectors = np.ones((dof, 1))
+    elif dof % 3:
+        return np.zeros((dof, 0))
+    else:
+        n_atoms = dof // 3
+        vectors = [np.tile(np.eye(3)[k], n_atoms) for k in range(3)]
+        if coords is not None and coords.shape == (n_atoms, 3):
+            centered = coords - coords.mean(0)
+            for k in range(3):
+                vectors.append(np.cross(np.eye(3)[k], centered).ravel())
+        vectors = np.array(vectors).T
+
+    # orthonormalize, dropping degenerate rotations of linear systems
+    u, w, _ = np.linalg.svd(vectors, full_matrices=False)
+    u = u[:, w > ZERO * w.max()]
+    residuals = np.sqrt((np.asarray(M.dot(u)) ** 2).sum(0))
+    return u[:, residuals < ZERO]
+
+
+def solveEigIterative(M, n_modes=20, zeros=False, is3d=False, solver='lanczos',
+                      **kwargs):
+    """Returns eigenvalues, eigenvectors, and variances of the lowest
+    *n_modes* non-zero modes of a large matrix *M* using an iterative solver.
+    Rigid-body zero modes (six for ANM, one for GNM) are removed analytically
+    (see :func:`calcRigidBodyModes`), so only the requested modes are
+    computed.  Convergence, iteration count, and time are reported using the
+    logger.
+
+    :arg M: a dense or sparse matrix, or a
+        :class:`~scipy.sparse.linalg.LinearOperator` (only with ``'lobpcg'``)
+    :type M: :class:`numpy.ndarray`, :class:`scipy.sparse.spmatrix`
+
+    :arg solver: ``'lanczos'`` for shift-invert Lanczos using a sparse LU
+        factorization, or ``'lobpcg'`` for the locally optimal block
+        preconditioned conjugate gradient method, default is ``'lanczos'``
+    :type solver: str
+
+    :arg coords: node coordinates, used for removing rotational zero modes
+    :type coords: :class:`numpy.ndarray`
+
+    :arg sigma: shift for Lanczos, default is a small negative value that
+        keeps the shifted matrix positive definite
+    :type sigma: float
+
+    :arg tol: convergence tolerance passed to the solver
+    :type tol: float
+
+    :arg maxiter: maximum number of iterations
+    :type maxiter: int
+
+    :arg info: a dictionary that is updated with *solver*, *n_iterations*,
+        *converged*, *residuals*, *n_deflated*, and *time* entries
+    :type info: dict"""
+
+    try:
+        from scipy.sparse import issparse, identity
+        from scipy.sparse import linalg as scipy_sparse_la
+    except ImportError:
+        raise ImportError('failed to import scipy.sparse.linalg, which is '
+                          'required for iterative eigensolvers')
+
+    solver = str(solver).lower()
+    if solver not in ('lanczos', 'lobpcg'):
+        raise ValueError('solver must be eigh, lanczos, or lobpcg')
+    tol = kwargs.get('tol', None)
+    maxiter = kwargs.get('maxiter', None)
+    info = kwargs.get('info', None)
+
+    start = time.time()
+    dof = M.shape[0]
+    if (isinstance(M, scipy_sparse_la.LinearOperator) and
+            solver != 'lobpcg'):
+        raise ValueError('only lobpcg solver accepts a linear operator')
+    Z = calcRigidBodyModes(M, is3d, kwargs.get('coords', None))
+    n_deflated = Z.shape[1]
+    LOGGER.debug('{0} rigid-body modes were removed analytically.'
+                 .format(n_deflated))
+
+    def project(x):
+        return x - Z.dot(Z.T.dot(x))
+
+    random = np.random.RandomState(0)
+    counter = [0]
+
+    if solver == 'lanczos':
+        sigma = kwargs.get('sigma', None)
+        if sigma is None:
+            sigma = -1e-4 * abs(M.diagonal()).mean()
+        if issparse(M):
+            shifted = (M - sigma * identity(dof, format='csc')).tocsc()
+            solve = scipy_sparse_la.splu(shifted).solve
+        else:
+            linalg = importLA()
+            factor = linalg.cho_factor(M - sigma * np.eye(dof))
+            solve = lambda x: linalg.cho_solve(factor, x)
+
+        def opinv(x):
+            counter[0] += 1
+            return project(solve(project(np.ravel(x))))
+
+        OPinv = scipy_sparse_la.LinearOperator((dof, dof), matvec=opinv,
+                                               dtype=float)
+
+        def solve_(k):
+            values, vectors = scipy_sparse_la.eigsh(
+                M, k=k, sigma=sigma, which='LM', OPinv=OPinv,
+                v0=project(random.rand(dof)), tol=tol or 0, maxiter=maxiter)
+            return values, vectors
+    else:
+        diagonal = np.asarray(M.diagonal()) if hasattr(M, 'diagonal') else None
+        if diagonal is not None:
+            diagonal = np.where(np.abs(diagonal) > ZERO, diagonal, 1.)
+            precond = scipy_sparse_la.LinearOperator(
+                (dof, dof), matvec=lambda x: np.ravel(x) / diagonal,
+                matmat=lambda x: x / diagonal[:, np.newaxis], dtype=float)
+        else:
+            precond = None
+
+        def solve_(k):
+            X = project(random.rand(dof, k))
+            values, vectors, history = scipy_sparse_la.lobpcg(
+                M, X, M=precond, Y=Z if n_deflated else None, tol=tol,
+                maxiter=maxiter or 1000, largest=False,
+                retResidualNormsHistory=True)
+            counter[0] += len(history)
+            return values, vectors
+
+    n_zeros = 0
+    k = n_modes - n_deflated if zeros else n_modes
+    k = max(k, 1)
+    while True:
+        values, vectors = solve_(min(k + n_zeros, dof - n_deflated - 1))
+        order = values.argsort()
+        values = values[order]
+        vectors = vectors[:, order]
+        found = int((values < ZERO).sum())
+        # zero modes that could not be removed analytically, e.g. due to
+        # disconnected components, are computed numerically
+        if zeros or found <= n_zeros or k + found >= dof - n_deflated - 1:
+            break
+        n_zeros = found
+
+    residuals = np.sqrt((np.asarray(M.dot(vectors) - vectors * values) ** 2)
+                        .sum(0))
+    if tol:
+        threshold = tol
+    elif solver == 'lanczos':
+        threshold = 1e-6
+    else:
+        threshold = np.sqrt(1e-15) * dof
+    converged = bool((residuals <= threshold *
+                      np.maximum(1, np.abs(values))).all())
+    elapsed = time.time() - start
+    if converged:
+        LOGGER.info('{0} converged after {1} iterations in {2:.2f}s.'
+                    .format(solver, counter[0], elapsed))
+    else:
+        LOGGER.warning('{0} did not converge after {1} iterations in '
+                       '{2:.2f}s, largest residual is {3:.2e}.'
+                       .format(solver, counter[0], elapsed, residuals.max()))
+    if info is not None:
+        info.update(solver=solver, n_iterations=counter[0],
+                    converged=converged, residuals=residuals,
+                    n_deflated=n_deflated, time=elapsed)
+
+    if zeros:
+        values = np.concatenate([np.zeros(n_deflated), values])[:n_modes]
+        vectors = np.hstack([Z, vectors])[:, :n_modes]
+        vars = div0(1, values)
+        vars[values < ZERO] = 0.
+    else:
+        which = values >= ZERO
+        values = values[which][:n_modes]
+        vectors = vectors[:, which][:, :n_modes]
+        vars = 1 / values
+    return values, vectors, vars
+
+
 class GNMBase(NMA):
 
     """Class for Gaussian Network Model analysis of proteins."""
@@ -192,6 +418,8 @@ class GNMBase(NMA):
 
         if self._kirchhoff is None:
             return None
+        if isLinearOperator(self._kirchhoff):
+            return self._kirchhoff
         return self._kirchhoff.copy()
 
     def _getKirchhoff(self):
@@ -222,6 +450,263 @@ def checkENMParameters(cutoff, gamma):
     return cutoff, gamma, gamma_func
 
 
+def calcGammas(gamma, dist2, i, j):
+    """Returns an array of spring constants for node pairs with squared
+    distances *dist2* and indices *i* and *j*.  *gamma* may be a number,
+    a :class:`Gamma` instance whose :meth:`~.Gamma.gammas` method evaluates
+    all pairs at once, or a custom function, which is called once per pair."""
+
+    if isinstance(gamma, Gamma):
+        return np.asarray(gamma.gammas(dist2, i, j), float)
+    elif isinstance(gamma, FunctionType):
+        return np.array([gamma(d2, i_, j_) for d2, i_, j_ in zip(dist2, i, j)],
+                        float)
+    gammas = np.empty(len(dist2))
+    gammas.fill(gamma)
+    return gammas
+
+
+def assembleKirchhoff(i, j, gammas, n_atoms, sparse=False):
+    """Returns Kirchhoff matrix assembled at once from contact pairs *i*, *j*
+    with spring constants *gammas*.  Each pair must be listed once.  When
+    *sparse* is **True**, a :class:`scipy.sparse.csr_matrix` is returned."""
+
+    nodes = np.arange(n_atoms)
+    degrees = np.bincount(np.concatenate([i, j]), np.tile(gammas, 2),
+                          minlength=n_atoms)
+    if sparse:
+        from scipy import sparse as scipy_sparse
+
+        kirchhoff = scipy_sparse.coo_matrix(
+            (np.concatenate([-gammas, -gammas, degrees]),
+             (np.concatenate([i, j, nodes]), np.concatenate([j, i, nodes]))),
+            shape=(n_atoms, n_atoms)).tocsr()
+    else:
+        kirchhoff = np.zeros((n_atoms, n_atoms), 'd')
+        kirchhoff[i, j] = -gammas
+        kirchhoff[j, i] = -gammas
+        kirchhoff[nodes, nodes] = degrees
+    return kirchhoff
+
+
+def isLinearOperator(M):
+    """Returns **True** if *M* is a :class:`scipy.sparse.linalg.LinearOperator`
+    rather than a stored matrix."""
+
+    try:
+        from scipy.sparse.linalg import LinearOperator
+    except ImportError:
+        return False
+    return isinstance(M, LinearOperator)
+
+
+def getIncidence(i, j, n_atoms):
+    """Returns the sparse incidence matrix of contact pairs *i*, *j*, with
+    one row per pair holding +1 and -1 for its first and second node."""
+
+    from scipy import sparse as scipy_sparse
+
+    n_pairs = len(i)
+    rows = np.tile(np.arange(n_pairs), 2)
+    data = np.concatenate([np.ones(n_pairs), -np.ones(n_pairs)])
+    return scipy_sparse.csr_matrix((data, (rows, np.concatenate([i, j]))),
+                                   shape=(n_pairs, n_atoms))
+
+
+def assembleKirchhoffOperator(i, j, gammas, n_atoms):
+    """Returns a :class:`scipy.sparse.linalg.LinearOperator` that computes
+    products of the Kirchhoff matrix of contact pairs *i*, *j* with vectors
+    on the fly, without storing the matrix.  Only the contact list is kept,
+    and the operator has a :meth:`diagonal` method like sparse matrices."""
+
+    try:
+        from scipy.sparse.linalg import LinearOperator
+    except ImportError:
+        raise ImportError('failed to import scipy.sparse.linalg, which is '
+                          'required for linear operators')
+
+    incidence = getIncidence(i, j, n_atoms)
+    transpose = incidence.T.tocsr()
+    gammas = np.asarray(gammas, float)
+    degrees = np.bincount(np.concatenate([i, j]), np.tile(gammas, 2),
+                          minlength=n_atoms)
+
+    def matmat(x):
+        x = np.asarray(x).reshape(n_atoms, -1)
+        return transpose.dot(gammas[:, np.newaxis] * incidence.dot(x))
+
+    def matvec(x):
+        return np.ravel(matmat(x))
+
+    kirchhoff = LinearOperator((n_atoms, n_atoms), dtype=float,
+                               matvec=matvec, rmatvec=matvec, matmat=matmat)
+    kirchhoff.diagonal = degrees.copy
+    return kirchhoff
+
+
+def calcHitTimes(kirchhoff, nodes=None, solver='splu', **kwargs):
+    """Returns hitting times of random walks between *nodes* of the network
+    with *kirchhoff* matrix, in the same layout as :meth:`GNM.calcHitTime`.
+    Columns of the pseudo-inverse of the Kirchhoff matrix are calculated for
+    requested nodes only, by solving sparse Laplacian systems, so memory and
+    time scale with the number of contacts times the number of nodes.
+    Commute times are the sum of returned matrix and its transpose, and
+    times between nodes of different connected components are infinite.
+
+    :arg kirchhoff: a dense or sparse Kirchhoff matrix, or a linear operator,
+        see :func:`assembleKirchhoffOperator`
+    :type kirchhoff: :class:`numpy.ndarray`, :class:`scipy.sparse.spmatrix`
+
+    :arg nodes: indices of nodes, or a boolean mask, default is all nodes
+    :type nodes: :class:`numpy.ndarray`
+
+    :arg solver: ``'splu'`` (default) factorizes the Kirchhoff matrix, with
+        one node of each connected component grounded, and ``'cg'`` solves
+        systems using Jacobi preconditioned conjugate gradient, which also
+        accepts linear operators, for which the network is assumed to be
+        connected
+    :type solver: str
+
+    :arg tol: convergence tolerance for ``'cg'``, default is 1e-10
+    :type tol: float
+
+    :arg maxiter: maximum number of iterations for ``'cg'``
+    :type maxiter: int"""
+
+    try:
+        from scipy import sparse as scipy_sparse
+        from scipy.sparse import linalg as scipy_sparse_la
+        from scipy.sparse.csgraph import connected_components
+    except ImportError:
+        raise ImportError('failed to import scipy.sparse, which is required '
+                          'for sparse hitting time calculations')
+
+    solver = str(solver).lower()
+    if solver not in ('splu', 'cg'):
+        raise ValueError('solver must be splu or cg')
+
+    n_nodes = kirchhoff.shape[0]
+    if isLinearOperator(kirchhoff):
+        if solver != 'cg':
+            raise ValueError('only cg solver accepts a linear operator')
+        K = kirchhoff
+        degrees = np.asarray(kirchhoff.diagonal(), float)
+        labels = np.zeros(n_nodes, int)
+    else:
+        K = scipy_sparse.csr_matrix(kirchhoff, dtype=float)
+        degrees = K.diagonal()
+        labels = connected_components(K, directed=False)[1]
+
+    if nodes is None:
+        nodes = np.arange(n_nodes)
+    else:
+        nodes = np.asarray(nodes)
+        if nodes.dtype == bool:
+            if nodes.shape != (n_nodes,):
+                raise ValueError('nodes mask must have an entry for each node')
+            nodes = np.flatnonzero(nodes)
+        elif nodes.ndim != 1 or not np.issubdtype(nodes.dtype, np.integer):
+            raise TypeError('nodes must be a 1-d array of indices')
+        elif len(nodes) and (nodes.min() < -n_nodes or
+                             nodes.max() >= n_nodes):
+            raise ValueError('nodes must be indices of network nodes')
+        nodes = nodes % n_nodes
+
+    # right-hand sides are unit vectors of nodes and degrees, made to sum up
+    # to zero on each connected component, solutions are centered likewise,
+    # which gives products with the pseudo-inverse of the Kirchhoff matrix
+    n_rhs = len(nodes) + 1
+    B = np.zeros((n_nodes, n_rhs))
+    B[nodes, np.arange(len(nodes))] = 1.
+    B[:, -1] = degrees
+    n_components = labels.max() + 1 if n_nodes else 0
+    members = scipy_sparse.csr_matrix(
+        (np.ones(n_nodes), (labels, np.arange(n_nodes))),
+        shape=(n_components, n_nodes))
+    sizes = np.bincount(labels, minlength=n_components)[:, np.newaxis]
+
+    def center(X):
+        return X - (members.dot(X) / sizes)[labels]
+
+    B = center(B)
+    X = np.zeros_like(B)
+    if solver == 'splu':
+        keep = np.ones(n_nodes, bool)
+        keep[np.unique(labels, return_index=True)[1]] = False
+        if keep.any():
+            grounded = K[keep][:, keep].tocsc()
+            lu = scipy_sparse_la.splu(grounded, permc_spec='MMD_AT_PLUS_A',
+                                      options=dict(SymmetricMode=True))
+            X[keep] = lu.solve(B[keep])
+    else:
+        tol = kwargs.get('tol', 1e-10)
+        maxiter = kwargs.get('maxiter', None)
+        diagonal = np.where(np.abs(degrees) > ZERO, degrees, 1.)
+        precond = scipy_sparse_la.LinearOperator(
+            (n_nodes, n_nodes), matvec=lambda x: np.ravel(x) / diagonal,
+            dtype=float)
+        n_failed = 0
+        for k in range(n_rhs):
+            X[:, k], info = scipy_sparse_la.cg(K, B[:, k], tol=tol,
+                                               maxiter=maxiter, M=precond)
+            n_failed += info != 0
+        if n_failed:
+            LOGGER.warning('cg did not converge for {0} of {1} systems.'
+                           .format(n_failed, n_rhs))
+    X = center(X)
+
+    # hitting times are scaled by the volume of the connected component of
+    # nodes, and random walks never reach nodes of other components
+    K_inv = X[nodes, :-1]
+    u = X[nodes, -1]
+    components = labels[nodes]
+    volumes = members.dot(degrees)[components]
+    H = volumes[:, np.newaxis] * (np.diag(K_inv)[:, np.newaxis] - K_inv)
+    H += u[np.newaxis, :] - u[:, np.newaxis]
+    H[components[:, np.newaxis] != components] = np.inf
+    return H
+
+
+def getContacts(coords, cutoff, kdtree=True):
+    """Returns indices of node pairs that are within *cutoff* distance of
+    each other and squared distances between them, as three arrays.  Each
+    pair is listed once with the smaller index first.  When *kdtree* is
+    **True**, pairs are found using :class:`.KDTree`, otherwise distances
+    are evaluated for blocks of rows of the upper triangle of the distance
+    matrix."""
+
+    n_atoms = coords.shape[0]
+    cutoff2 = cutoff * cutoff
+    if kdtree:
+        tree = KDTree(coords)
+        tree.search(cutoff)
+        pairs = tree.getIndices()
+        if pairs is None:
+            pairs = np.zeros((0, 2), int)
+        pairs = np.sort(pairs, axis=1)
+        rows = pairs[:, 0]
+        cols = pairs[:, 1]
+    else:
+        rows = []
+        cols = []
+        block = max(1, CONTACT_BLOCK // max(n_atoms, 1))
+        for start in range(0, n_atoms, block):
+            stop = min(start + block, n_atoms)
+            i2j = coords[start:, :] - coords[start:stop, np.newaxis, :]
+            dist2 = (i2j ** 2).sum(2)
+            i, j = np.nonzero(np.triu(dist2 <= cutoff2, 1))
+            rows.append(i + start)
+            cols.append(j + start)
+        rows = np.concatenate(rows) if rows else np.zeros(0, int)
+        cols = np.concatenate(cols) if cols else np.zeros(0, int)
+
+    i2j = coords[cols] - coords[rows]
+    dist2 = (i2j ** 2).sum(1)
+    # KDTree works in single precision, so borderline pairs are rechecked
+    which = dist2 <= cutoff2
+    return rows[which], cols[which], dist2[which]
+
+
 class GNM(GNMBase):
 
     """A class for Gaussian Network Model (GNM) analysis of proteins
@@ -282,12 +767,21 @@ class GNM(GNMBase):
             default is **True**
         :type kdtree: bool
 
+        :arg operator: elect to store a matrix-free linear operator that
+            multiplies vectors with the Kirchhoff matrix using the contact
+            list, instead of the matrix, default is **False**.  Modes are
+            then calculated using an iterative solver.
+        :type operator: bool
 
         Instances of :class:`Gamma` classes and custom functions are
-        accepted as *gamma* argument.
+        accepted as *gamma* argument.  :class:`Gamma` instances evaluate
+        force constants of all contacts at once, custom functions are
+        called once per contact.
 
         When Scipy is available, user can select to use sparse matrices for
-        efficient usage of memory at the cost of computation speed."""
+        efficient usage of memory.  Sparse matrices are written directly from
+        the contact list into CSR format, so memory scales with the number of
+        contacts rather than the number of nodes squared."""
 
         try:
             coords = (coords._getCoords() if hasattr(coords, '_getCoords') else
@@ -313,43 +807,16 @@ class GNM(GNMBase):
             except ImportError:
                 raise ImportError('failed to import scipy.sparse, which  is '
                                   'required for sparse matrix calculations')
-            kirchhoff = scipy_sparse.lil_matrix((n_atoms, n_atoms))
-        else:
-            kirchhoff = np.zeros((n_atoms, n_atoms), 'd')
-
-        if kwargs.get('kdtree', True):
-            kdtree = KDTree(coords)
-            kdtree.search(cutoff)
-            dist2 = kdtree.getDistances() ** 2
-            r = 0
-            for i, j in kdtree.getIndices():
-                g = gamma(dist2[r], i, j)
-                kirchhoff[i, j] = -g
-                kirchhoff[j, i] = -g
-                kirchhoff[i, i] = kirchhoff[i, i] + g
-                kirchhoff[j, j] = kirchhoff[j, j] + g
-                r += 1
-        else:
-            LOGGER.info('Using slower method for building the Kirchhoff.')
-            cutoff2 = cutoff * cutoff
-            mul = np.multiply
-            for i in range(n_atoms):
-                xyz_i = coords[i, :]
-                i_p1 = i+1
-                i2j = coords[i_p1:, :] - xyz_i
-                mul(i2j, i2j, i2j)
-                for j, dist2 in enumerate(i2j.sum(1)):
-                    if dist2 > cutoff2:
-                        continue
-                    j += i_p1
-                    g = gamma(dist2, i, j)
-                    kirchhoff[i, j] = -g
-                    kirchhoff[j, i] = -g
-                    kirchhoff[i, i] = kirchhoff[i, i] + g
-                    kirchhoff[j, j] = kirchhoff[j, j] + g
 
-        if sparse:
-            kirchhoff = kirchhoff.tocsr()
+        kdtree = kwargs.get('kdtree', True)
+        if not kdtree:
+            LOGGER.info('Using slower method for building the Kirchhoff.')
+        i, j, dist2 = getContacts(coords, cutoff, kdtree)
+        gammas = calcGammas(g, dist2, i, j)
+        if kwargs.get('operator', False):
+            kirchhoff = assembleKirchhoffOperator(i, j, gammas, n_atoms)
+        else:
+            kirchhoff = assembleKirchhoff(i, j, gammas, n_atoms, sparse=sparse)
 
         LOGGER.debug('Kirchhoff was built in {0:.2f}s.'
                      .format(time.time()-start))
@@ -380,15 +847,38 @@ class GNM(GNMBase):
         self._affinity = sparse.spdiags(self._diagonal, 0, len(self._diagonal), 
             len(self._diagonal)).toarray() - self._kirchhoff
 
-    def calcHitTime(self, method='Z'):
+    def calcHitTime(self, method='Z', nodes=None, **kwargs):
+        """Calculate hitting and commute times of random walks on the
+        network and return hitting times.
 
-        if self._affinity is None:
-            self._buildAffinity()
+        :arg method: ``'Z'`` uses the fundamental matrix and ``'K'`` the
+            pseudo-inverse of the Kirchhoff matrix, both are dense.
+            ``'sparse'`` solves sparse Laplacian systems for requested nodes
+            only, see :func:`.calcHitTimes`, and is used for sparse Kirchhoff
+            matrices and linear operators, or when *nodes* is given
+        :type method: str
+
+        :arg nodes: indices of nodes for which hitting and commute times are
+            calculated.  Times for a subset of nodes are returned, but not
+            stored for :meth:`getHitTime` and :meth:`getCommuteTime`.
+        :type nodes: :class:`numpy.ndarray`
+
+        Other keyword arguments, e.g. *solver*, are passed to
+        :func:`.calcHitTimes`.  Commute times are the sum of hitting times
+        matrix and its transpose."""
+
+        if self._kirchhoff is None:
+            raise ValueError('Kirchhoff matrix is not built or set')
+        if nodes is not None or not isinstance(self._kirchhoff, np.ndarray):
+            method = 'sparse'
 
         start = time.time()
         linalg = importLA()
         if method == 'Z':
 
+            if self._affinity is None:
+                self._buildAffinity()
+
             D = self._diagonal
             A = self._affinity
 
@@ -406,6 +896,9 @@ class GNM(GNMBase):
 
         elif method == 'K':
 
+            if self._affinity is None:
+                self._buildAffinity()
+
             K = self._kirchhoff
             D = self._diagonal
 
@@ -419,12 +912,20 @@ class GNM(GNMBase):
 
             H = T1 - T2 + T3_i - T3_i.T
 
-        self._hitTime = H
-        self._commuteTime = H + H.T
+        elif method == 'sparse':
 
+            H = calcHitTimes(self._kirchhoff, nodes, **kwargs)
+
+        else:
+            raise ValueError('method must be Z, K, or sparse')
 
         LOGGER.debug('Hitting and commute time are calculated in  {0:.2f}s.'
-                     .format(time.time()-start))    
+                     .format(time.time()-start))
+
+        if nodes is None:
+            self._hitTime = H
+            self._commuteTime = H + H.T
+        return H
 
     def getAffinity(self):
         """Returns a copy of the Kirchhoff matrix."""
@@ -475,7 +976,8 @@ class GNM(GNMBase):
         return self._commuteTime    
 
 
-    def calcModes(self, n_modes=20, zeros=False, turbo=True, hinges=True):
+    def calcModes(self, n_modes=20, zeros=False, turbo=True, hinges=True,
+                  **kwargs):
         """Calculate normal modes.  This method uses :func:`scipy.linalg.eigh`
         function to diagonalize the Kirchhoff matrix. When Scipy is not found,
         :func:`numpy.linalg.eigh` is used.
@@ -492,6 +994,12 @@ class GNM(GNMBase):
 
         :arg hinges: Identify hinge sites after modes are computed.
         :type hinges: bool, default is **True**
+
+        :arg solver: ``'lanczos'`` or ``'lobpcg'`` selects an iterative
+            solver for large sparse Kirchhoff matrices, which removes the
+            zero mode analytically, see :func:`.solveEigIterative` for
+            further options
+        :type solver: str
         """
 
         if self._kirchhoff is None:
@@ -505,7 +1013,7 @@ class GNM(GNMBase):
         self._clear()
         LOGGER.timeit('_gnm_calc_modes')
         values, vectors, vars = solveEig(self._kirchhoff, n_modes=n_modes, zeros=zeros, 
-                                         turbo=turbo, is3d=False)
+                                         turbo=turbo, is3d=False, **kwargs)
 
         self._eigvals = values
         self._array = vectors
@@ -639,10 +1147,13 @@ class GNM(GNMBase):
 
 
 def calcGNM(pdb, selstr='calpha', cutoff=15., gamma=1., n_modes=20,
-            zeros=False, hinges=True):
+            zeros=False, hinges=True, cache=False):
     """Returns a :class:`GNM` instance and atoms used for the calculations.
     By default only alpha carbons are considered, but selection string helps
-    selecting a subset of it.  *pdb* can be :class:`.Atomic` instance."""
+    selecting a subset of it.  *pdb* can be :class:`.Atomic` instance.
+
+    If *cache* is **True** or a folder path, the model is loaded from or
+    saved to the ENM cache, see :func:`.pathENMCache`."""
 
     if isinstance(pdb, str):
         ag = parsePDB(pdb)
@@ -656,10 +1167,23 @@ def calcGNM(pdb, selstr='calpha', cutoff=15., gamma=1., n_modes=20,
     else:
         raise TypeError('pdb must be an atom container, not {0}'
                         .format(type(pdb)))
-    gnm = GNM(title)
     sel = ag.select(selstr)
+    folder = key = None
+    if cache:
+        from .enmcache import getCacheEntry, loadCachedModel, saveCachedModel
+        folder, key = getCacheEntry(cache, sel, 'gnm', cutoff, gamma,
+                                    n_modes, zeros)
+        gnm = loadCachedModel(key, folder, title)
+        if gnm is not None:
+            if hinges:
+                gnm.calcHinges()
+            return gnm, sel
+
+    gnm = GNM(title)
     gnm.buildKirchhoff(sel, cutoff, gamma)
     gnm.calcModes(n_modes, zeros, hinges=hinges)
+    if key is not None:
+        saveCachedModel(key, gnm, folder)
     return gnm, sel
 
 class MaskedGNM(GNM):
@@ -814,6 +1338,8 @@ class MaskedGNM(GNM):
         self._maskedarray = None
         super(MaskedGNM, self).setEigens(vectors, values)
 
-    def calcModes(self, n_modes=20, zeros=False, turbo=True, hinges=True):
+    def calcModes(self, n_modes=20, zeros=False, turbo=True, hinges=True,
+                  **kwargs):
         self._maskedarray = None
-        super(MaskedGNM, self).calcModes(n_modes, zeros, turbo, hinges)
+        super(MaskedGNM, self).calcModes(n_modes, zeros, turbo, hinges,
+                                         **kwargs)
@@ -12,7 +12,7 @@ from prody.utilities import checkCoords
 __all__ = ['calcMechStiff', 'calcStiffnessRange', 'calcMechStiffStatistic', 
            'calcStiffnessRangeSel']
 
-def calcMechStiff(modes, coords, kbt=1.):
+def calcMechStiff(modes, coords, kbt=1., **kwargs):
     """Calculate stiffness matrix calculated using :class:`.ANM` instance. 
     Method described in [EB08]_. 
 
@@ -22,6 +22,15 @@ def calcMechStiff(modes, coords, kbt=1.):
     :arg n_modes: number of non-zero eigenvalues/vectors to calculate.
         If **None** is given, all modes will be calculated (3x number of atoms).
     :type n_modes: int or **None**, default is 20.
+
+    :arg cutoff: if given, stiffness is calculated only for pairs of atoms 
+        within *cutoff* distance of each other, which are found using 
+        :class:`.KDTree`, and a symmetric :class:`scipy.sparse.csr_matrix` 
+        is returned
+    :type cutoff: float
+
+    :arg n_cpu: number of threads used to calculate stiffness, default is 1
+    :type n_cpu: int
     
     Author: Mustafa Tekpinar & Karolina Mikulska-Ruminska & Cihan Kaya
     """
@@ -47,15 +56,59 @@ def calcMechStiff(modes, coords, kbt=1.):
 
     n_atoms = modes.numAtoms()
     n_modes = modes.numModes()
+    cutoff = kwargs.get('cutoff')
+    n_cpu = kwargs.get('n_cpu', 1)
+
+    if not isinstance(n_cpu, Integral):
+        raise TypeError('n_cpu must be an integer')
+    elif n_cpu < 1:
+        raise ValueError('n_cpu must be equal to or greater than 1')
+
+    # components of modes for each atom and dimension are contiguous
+    coords = np.ascontiguousarray(coords, np.double)
+    eigvecs = np.ascontiguousarray(eigvecs.reshape((n_modes, n_atoms * 3)).T)
+    eigvals = np.ascontiguousarray(eigvals, np.double)
     
     LOGGER.timeit('_sm')
 
-    sm = np.zeros((n_atoms, n_atoms), np.double)
-    from .smtools import calcSM
-    LOGGER.info('Calculating stiffness matrix.')
+    from .smtools import calcSM, calcSMPairs
+
+    if cutoff is None:
+        sm = np.zeros((n_atoms, n_atoms), np.double)
+        LOGGER.info('Calculating stiffness matrix.')
 
-    calcSM(coords, sm, eigvecs, eigvals,
-            n_atoms, n_modes, float(kbt))
+        def calcRows(start):
+            calcSM(coords, sm, eigvecs, eigvals, n_atoms, n_modes, 
+                   float(kbt), start, min(start + n_rows, n_atoms))
+
+        n_rows = max(1, n_atoms // (n_cpu * 16)) if n_cpu > 1 else n_atoms
+        mapThreads(calcRows, range(0, n_atoms, n_rows), n_cpu)
+    else:
+        try:
+            from scipy.sparse import coo_matrix
+        except ImportError:
+            raise ImportError('failed to import scipy.sparse, which  is '
+                              'required for calculating stiffness within a cutoff')
+        from .gnm import getContacts
+
+        LOGGER.info('Calculating stiffness matrix for pairs within {0} A.'
+                    .format(cutoff))
+        rows, cols, _ = getContacts(coords, float(cutoff))
+        rows = rows.astype(np.intp)
+        cols = cols.astype(np.intp)
+        values = np.zeros(len(rows), np.double)
+
+        def calcPairs(pairs):
+            calcSMPairs(coords, eigvecs, eigvals, rows[pairs], cols[pairs], 
+                        values[pairs], n_modes, float(kbt))
+
+        n_pairs = max(1, len(rows) // (n_cpu * 16)) if n_cpu > 1 else len(rows)
+        mapThreads(calcPairs, [slice(start, start + n_pairs) 
+                               for start in range(0, len(rows), n_pairs)], n_cpu)
+        sm = coo_matrix((np.concatenate([values, values]), 
+                         (np.concatenate([rows, cols]), 
+                          np.concatenate([cols, rows]))),
+                        shape=(n_atoms, n_atoms)).tocsr()
 
     LOGGER.report('Stiffness matrix calculated in %.2lfs.', label='_sm')
     
@@ -65,9 +118,29 @@ def calcMechStiff(modes, coords, kbt=1.):
     return sm
 
 
+def mapThreads(func, args, n_cpu=1):
+    """Call *func* for each item in *args* using *n_cpu* threads."""
+
+    if n_cpu == 1:
+        for arg in args:
+            func(arg)
+    else:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(n_cpu)
+        try:
+            pool.map(func, args)
+        finally:
+            pool.close()
+            pool.join()
+
+
 def calcStiffnessRange(stiffness):
-    """ Return the range of effective spring constant."""
+    """ Return the range of effective spring constant.  *stiffness* may also 
+    be a sparse matrix calculated for pairs within a cutoff distance."""
     
+    if hasattr(stiffness, 'tocsr'):
+        values = stiffness.tocsr().data
+        return np.min(values[np.nonzero(values)]), np.amax(values)
     return np.min(stiffness[np.nonzero(stiffness)]), np.amax(stiffness)
 
 def calcMechStiffStatistic(stiffness, rangeK, minAA=0, AA='all'):
@@ -76,8 +149,12 @@ def calcMechStiffStatistic(stiffness, rangeK, minAA=0, AA='all'):
     ``AA`` can be a list with a range of analysed amino acids as:
     [first_aa, last_aa, first_aa2, last_aa2],
     minAA - eliminate amino acids that are within 20aa and
-    ``rangeK`` is a list [minK, maxK]"""
+    ``rangeK`` is a list [minK, maxK].  *stiffness* may also be a sparse 
+    matrix calculated for pairs within a cutoff distance, in which case 
+    only stored values are counted."""
     
+    if hasattr(stiffness, 'tocsr'):
+        stiffness = stiffness.tocsr()
     if AA == 'all':
         sm = stiffness
     elif isinstance(AA, Integral): 
@@ -87,13 +164,13 @@ def calcMechStiffStatistic(stiffness, rangeK, minAA=0, AA='all'):
     elif not np.isscalar(AA) and len(AA) == 4:
         sm = stiffness[AA[0]:AA[1],AA[2]:AA[3]]
     if minAA > 0:
-        sm2 = sm[minAA:-1,0:-1-minAA]  # matrix without close contacts
-        sm3 = np.tril(sm2, k=-1)
-        #sort_sm2 = np.sort((np.tril(sm2, k=-1)1).flatten())
-        a = np.where(np.logical_and(sm3>rangeK[0], sm3<rangeK[1]))
-    if minAA == 0:
+        sm = sm[minAA:-1,0:-1-minAA]  # matrix without close contacts
+    if hasattr(sm, 'tocsr'):
+        from scipy.sparse import tril
+        sm2 = tril(sm, k=-1).data
+    else:
         sm2 = np.tril(sm, k=-1)
-        a = np.where(np.logical_and(sm2>rangeK[0], sm2<rangeK[1]))
+    a = np.where(np.logical_and(sm2>rangeK[0], sm2<rangeK[1]))
     return len(a[0])
     
 
@@ -109,12 +186,31 @@ def calcStiffnessRangeSel(stiffness, value, minAA=20, AA='all'):
     values of interactions between N-C terminus if protein structure
     has a shear, zipper or SD1-disconnected mechanical clamp 
     -it is common in FnIII/Ig like domains and determines the maximum 
-    unfolding force in AFM or SMD method."""
+    unfolding force in AFM or SMD method.  *stiffness* may also be a 
+    sparse matrix calculated for pairs within a cutoff distance, in which 
+    case only stored values are considered."""
     
+    if hasattr(stiffness, 'tocsr'):
+        stiffness = stiffness.tocsr()
     if AA == 'all':
         sm = stiffness
     elif isinstance(AA, Integral):
         sm = stiffness[0: AA, (-1)*AA-1:-1]
+    if hasattr(sm, 'tocsr'):
+        # stored values of rows in order, as np.where returns them for arrays
+        sm = sm.sorted_indices()
+        rows = np.repeat(np.arange(sm.shape[0]), np.diff(sm.indptr))
+        far = (sm.data != 0) & (np.abs(rows - sm.indices) >= minAA)
+        if not far.any():
+            raise ValueError('stiffness has no values for residues that are '
+                             '{0} or more apart'.format(minAA))
+        rows, cols, values = rows[far], sm.indices[far], sm.data[far]
+        if value == 'minK':
+            mK = values.min()
+        elif value == 'maxK':
+            mK = values.max()
+        first = np.flatnonzero(values == mK)[0]
+        return mK, [rows[first], cols[first]]
     minK = np.min(sm[np.nonzero(sm)]) 
     maxK = np.amax(sm)
     
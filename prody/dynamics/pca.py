@@ -17,7 +17,7 @@ from .nma import NMA
 if PY2K:
     range = xrange
 
-__all__ = ['PCA', 'EDA']
+__all__ = ['PCA', 'EDA', 'calcEDA']
 
 
 class PCA(NMA):
@@ -67,6 +67,16 @@ class PCA(NMA):
         coordinate set (see :meth:`.Frame.superpose`).  If frames are already
         aligned, use ``aligned=True`` argument to skip this step.
 
+        Trajectory frames are read in blocks, which are superposed at once
+        and added to the covariance matrix with one matrix product per block.
+        Frames can be superposed onto coordinates other than the trajectory
+        reference, e.g. average coordinates, using *reference* argument.
+        Number of frames in a block can be set using *block* argument, or it
+        is derived from *memory* budget for a block in megabytes, default is
+        256.  Passing ``dtype=numpy.float32`` reduces memory usage and doubles
+        speed of products, and compensated summation is used for
+        accumulating blocks to keep precision.
+
 
         .. note::
            If *coordsets* is a :class:`.PDBEnsemble` instance, coordinates are
@@ -97,33 +107,53 @@ class PCA(NMA):
         update_coords = bool(kwargs.get('update_coords', False))
 
         if isinstance(coordsets, TrajBase):
-            nfi = coordsets.nextIndex()
-            coordsets.reset()
             n_atoms = coordsets.numSelected()
             dof = n_atoms * 3
-            cov = np.zeros((dof, dof))
-            #mean = coordsets._getCoords().flatten()
-            n_confs = 0
             n_frames = len(coordsets)
             LOGGER.info('Covariance will be calculated using {0} frames.'
                         .format(n_frames))
+            dtype = np.dtype(kwargs.get('dtype', float))
+            block = getBlockSize(dof, n_frames, dtype.itemsize, **kwargs)
+            reference = kwargs.get('reference', None)
+            shift = getShift(coordsets, reference)
+            cov = np.zeros((dof, dof), dtype)
+            compensation = np.zeros((dof, dof), dtype) if dtype != float else None
             coordsum = np.zeros(dof)
+            n_confs = 0
             LOGGER.progress('Building covariance', n_frames, '_prody_pca')
-            align = not kwargs.get('aligned', False)
-            for frame in coordsets:
-                if align:
-                    frame.superpose()
-                coords = frame._getCoords().flatten()
-                coordsum += coords
-                cov += np.outer(coords, coords)
-                n_confs += 1
+            for coords in iterCoordsetBlocks(coordsets, block,
+                                             kwargs.get('aligned', False),
+                                             reference):
+                deviations = coords.reshape((len(coords), dof))
+                deviations -= shift
+                coordsum += deviations.sum(0)
+                deviations = deviations.astype(dtype, copy=False)
+                # products are added to blocks of rows of the covariance, so
+                # temporary arrays are not larger than the block of frames
+                for start in range(0, dof, block):
+                    rows = slice(start, start + block)
+                    product = np.dot(deviations[:, rows].T, deviations)
+                    if compensation is None:
+                        cov[rows] += product
+                    else:
+                        # Kahan summation of block products
+                        product -= compensation[rows]
+                        total = cov[rows] + product
+                        np.subtract(total - cov[rows], product,
+                                    compensation[rows])
+                        cov[rows] = total
+                n_confs += len(coords)
                 LOGGER.update(n_confs, label='_prody_pca')
             LOGGER.finish()
+            if compensation is not None:
+                compensation = None
+                cov = cov.astype(float)
             cov /= n_confs
             coordsum /= n_confs
-            mean = coordsum
-            cov -= np.outer(coordsum, coordsum)
-            coordsets.goto(nfi)
+            for start in range(0, dof, block):
+                rows = slice(start, start + block)
+                cov[rows] -= np.outer(coordsum[rows], coordsum)
+            mean = coordsum + shift
             self._cov = cov
             if update_coords:
                 coordsets.setCoords(mean.reshape((n_atoms, 3)))
@@ -176,7 +206,7 @@ class PCA(NMA):
         self._n_atoms = n_atoms
         LOGGER.report('Covariance matrix calculated in %2fs.', '_prody_pca')
 
-    def calcModes(self, n_modes=20, turbo=True):
+    def calcModes(self, n_modes=20, turbo=True, **kwargs):
         """Calculate principal (or essential) modes.  This method uses
         :func:`scipy.linalg.eigh`, or :func:`numpy.linalg.eigh`, function
         to diagonalize the covariance matrix.
@@ -188,7 +218,12 @@ class PCA(NMA):
 
         :arg turbo: when available, use a memory intensive but faster way to
             calculate modes, default is **True**
-        :type turbo: bool"""
+        :type turbo: bool
+
+        :arg randomized: use randomized range finder to calculate only the
+            requested modes, see :meth:`performSVD` for its options, default
+            is **False**
+        :type randomized: bool"""
         
         linalg = importLA()
         if self._cov is None:
@@ -198,7 +233,11 @@ class PCA(NMA):
         self._clear()
         if str(n_modes).lower() == 'all':
             n_modes = None
-        if linalg.__package__.startswith('scipy'):
+        if kwargs.pop('randomized', False) and n_modes is not None:
+            values, vectors = calcRandomizedModes(self._cov.dot, dof,
+                                                  int(n_modes), **kwargs)
+            values, vectors = values[::-1], vectors[:, ::-1]
+        elif linalg.__package__.startswith('scipy'):
             if n_modes is None:
                 eigvals = None
                 n_modes = dof
@@ -227,26 +266,63 @@ class PCA(NMA):
         LOGGER.debug('{0} modes were calculated in {1:.2f}s.'
                      .format(self._n_modes, time.time()-start))
 
-    def performSVD(self, coordsets):
+    def performSVD(self, coordsets, n_modes=None, **kwargs):
         """Calculate principal modes using singular value decomposition (SVD).
         *coordsets* argument may be a :class:`.Atomic`, :class:`.Ensemble`,
-        or :class:`numpy.ndarray` instance.  If *coordsets* is a numpy array,
-        its shape must be ``(n_csets, n_atoms, 3)``.  Note that coordinate
-        sets must be aligned prior to SVD calculations.
+        :class:`.TrajBase`, or :class:`numpy.ndarray` instance.  If
+        *coordsets* is a numpy array, its shape must be
+        ``(n_csets, n_atoms, 3)``.  Note that coordinate sets must be aligned
+        prior to SVD calculations.  Trajectory frames are superposed onto the
+        reference coordinates as in :meth:`buildCovariance`, unless
+        ``aligned=True`` is passed.
 
         This is a considerably faster way of performing PCA calculations
         compared to eigenvalue decomposition of covariance matrix, but is
         an approximate method when heterogeneous datasets are analyzed.
         Covariance method should be preferred over this one for analysis of
         ensembles with missing atomic data.  See :ref:`pca-xray-calculations`
-        example for comparison of results from SVD and covariance methods."""
+        example for comparison of results from SVD and covariance methods.
+
+        :arg n_modes: number of modes to keep, default is all modes
+        :type n_modes: int
+
+        :arg randomized: use a randomized range finder [HN11]_ to calculate
+            only *n_modes* modes, so that time and memory scale with the
+            number of modes, default is **False**, and always **True** for
+            trajectories, which are read in blocks of frames once per pass
+            (*n_iter* + 2 passes)
+        :type randomized: bool
+
+        :arg oversampling: number of additional random vectors, default is 10
+        :type oversampling: int
+
+        :arg n_iter: number of power iterations, default is 4
+        :type n_iter: int
+
+        :arg seed: seed for the random number generator
+        :type seed: int
+
+        .. [HN11] Halko N, Martinsson PG, Tropp JA. Finding structure with
+           randomness: probabilistic algorithms for constructing approximate
+           matrix decompositions. *SIAM Rev* **2011** 53(2):217-288."""
 
         linalg = importLA()
 
         start = time.time()
-        if not isinstance(coordsets, (Ensemble, Atomic, np.ndarray)):
+        if not isinstance(coordsets, (Ensemble, Atomic, TrajBase,
+                                      np.ndarray)):
             raise TypeError('coordsets must be an Ensemble, Atomic, Numpy '
                             'array instance')
+        if n_modes is not None:
+            n_modes = int(n_modes)
+        randomized = kwargs.pop('randomized', False)
+        if isinstance(coordsets, TrajBase):
+            if n_modes is None:
+                raise ValueError('n_modes must be given for trajectories')
+            self._performStreamingSVD(coordsets, n_modes, **kwargs)
+            LOGGER.debug('{0} modes were calculated in {1:.2f}s.'
+                         .format(self._n_modes, time.time()-start))
+            return
         if isinstance(coordsets, np.ndarray):
             if (coordsets.ndim != 3 or coordsets.shape[2] != 3 or
                     coordsets.dtype not in (np.float32, float)):
@@ -269,19 +345,125 @@ class PCA(NMA):
         dof = n_atoms * 3
         deviations = deviations.reshape((n_confs, dof)).T
 
-        vectors, values, self._temp = linalg.svd(deviations,
-                                                 full_matrices=False)
-        values = (values ** 2) / n_confs
+        if randomized and n_modes is not None:
+            product = lambda x: deviations.dot(deviations.T.dot(x)) / n_confs
+            values, vectors = calcRandomizedModes(product, dof, n_modes,
+                                                  **kwargs)
+            trace = (deviations ** 2).sum() / n_confs
+            self._temp = None
+        else:
+            vectors, values, self._temp = linalg.svd(deviations,
+                                                     full_matrices=False)
+            values = (values ** 2) / n_confs
+            trace = values.sum()
+        self._setModes(dof, n_atoms, values[:n_modes], vectors[:, :n_modes],
+                       trace)
+        LOGGER.debug('{0} modes were calculated in {1:.2f}s.'
+                     .format(self._n_modes, time.time()-start))
+
+    def _performStreamingSVD(self, traj, n_modes, **kwargs):
+        """Calculate principal modes of a trajectory using randomized range
+        finder, reading frames once per pass."""
+
+        n_atoms = traj.numSelected()
+        dof = n_atoms * 3
+        n_frames = len(traj)
+        if n_frames < 3:
+            raise ValueError('coordsets must have more than 3 coordinate sets')
+        block = getBlockSize(dof, n_frames, **kwargs)
+        aligned = kwargs.pop('aligned', False)
+        shift = getShift(traj)
+        trace = [0]
+
+        def product(x):
+            # covariance product is accumulated about the reference and
+            # corrected with the mean of the same pass
+            result = np.zeros_like(x)
+            coordsum = np.zeros(dof)
+            squares = 0
+            for coords in iterCoordsetBlocks(traj, block, aligned):
+                deviations = coords.reshape((len(coords), dof)) - shift
+                coordsum += deviations.sum(0)
+                squares += (deviations ** 2).sum()
+                result += deviations.T.dot(deviations.dot(x))
+            mean = coordsum / n_frames
+            trace[0] = squares / n_frames - mean.dot(mean)
+            return result / n_frames - np.outer(mean, mean.dot(x))
+
+        LOGGER.info('Principal modes will be calculated using {0} frames.'
+                    .format(n_frames))
+        values, vectors = calcRandomizedModes(product, dof, n_modes, **kwargs)
+        self._temp = None
+        self._setModes(dof, n_atoms, values, vectors, trace[0])
+
+    def _performSketch(self, traj, n_modes, n_rows, block, aligned=False,
+                       reference=None):
+        """Calculate principal modes of a trajectory from a frequent
+        directions sketch [EL13]_ with *n_rows* rows, which is updated with
+        blocks of frames in a single pass.
+
+        .. [EL13] Liberty E. Simple and deterministic matrix sketching.
+           *Proc ACM SIGKDD* **2013** 581-588."""
+
+        n_atoms = traj.numSelected()
+        dof = n_atoms * 3
+        shift = getShift(traj, reference)
+        sketch = np.zeros((2 * n_rows, dof))
+        n_filled = 0
+        n_confs = 0
+        squares = 0
+        coordsum = np.zeros(dof)
+        LOGGER.progress('Sketching frames', len(traj), '_prody_pca')
+        for coords in iterCoordsetBlocks(traj, block, aligned, reference):
+            deviations = coords.reshape((len(coords), dof))
+            deviations -= shift
+            squares += np.einsum('ij,ij', deviations, deviations)
+            coordsum += deviations.sum(0)
+            while len(deviations):
+                n_add = min(len(deviations), len(sketch) - n_filled)
+                sketch[n_filled:n_filled + n_add] = deviations[:n_add]
+                deviations = deviations[n_add:]
+                n_filled += n_add
+                if n_filled == len(sketch):
+                    shrinkSketch(sketch, n_rows)
+                    n_filled = n_rows
+            n_confs += len(coords)
+            LOGGER.update(n_confs, label='_prody_pca')
+        LOGGER.finish()
+        sketch = sketch[:n_filled]
+        # deviations are from the reference, so the covariance is corrected
+        # for the mean in the space of rows of the sketch and the mean, an
+        # orthonormal basis of which is given by coefficients of these rows
+        mean = coordsum / n_confs
+        gram = np.empty((n_filled + 1, n_filled + 1))
+        gram[:n_filled, :n_filled] = sketch.dot(sketch.T)
+        gram[-1, :n_filled] = gram[:n_filled, -1] = sketch.dot(mean)
+        gram[-1, -1] = mean.dot(mean)
+        values, vectors = np.linalg.eigh(gram)
+        which = values > 1e-12 * values.max()
+        coefs = vectors[:, which] / np.sqrt(values[which])
+        projected = gram[:n_filled].dot(coefs)
+        offset = gram[-1].dot(coefs)
+        cov = (np.dot(projected.T, projected) / n_confs -
+               np.outer(offset, offset))
+        values, vectors = np.linalg.eigh(cov)
+        order = values.argsort()[::-1][:n_modes]
+        coefs = coefs.dot(vectors[:, order])
+        vectors = sketch.T.dot(coefs[:-1])
+        vectors += np.outer(mean, coefs[-1])
+        self._setModes(dof, n_atoms, values[order], vectors,
+                       squares / n_confs - mean.dot(mean))
+
+    def _setModes(self, dof, n_atoms, values, vectors, trace):
+
         self._dof = dof
         self._n_atoms = n_atoms
         which = values > 1e-18
         self._eigvals = values[which]
         self._array = vectors[:, which]
         self._vars = self._eigvals
-        self._trace = self._vars.sum()
+        self._trace = trace
         self._n_modes = len(self._eigvals)
-        LOGGER.debug('{0} modes were calculated in {1:.2f}s.'
-                     .format(self._n_modes, time.time()-start))
 
     def addEigenpair(self, eigenvector, eigenvalue=None):
         """Add eigen *vector* and eigen *value* pair(s) to the instance.
@@ -309,3 +491,216 @@ class EDA(PCA):
        proteins. *Proteins* **1993** 17(4):412-25."""
 
     pass
+
+
+def superposeCoordsets(coordsets, reference, weights=None):
+    """Returns *coordsets* with shape ``(n_csets, n_atoms, 3)`` superposed
+    onto *reference* coordinates, all at once.  Transformations are the same
+    as those calculated by :meth:`.Frame.superpose`."""
+
+    if weights is None:
+        mob_com = coordsets.mean(1)
+        tar_com = reference.mean(0)
+        mob_org = coordsets - mob_com[:, np.newaxis]
+        tar_org = reference - tar_com
+        matrices = np.einsum('ni,knj->kij', tar_org, mob_org)
+    else:
+        weights_sum = weights.sum()
+        mob_com = (coordsets * weights).sum(1) / weights_sum
+        tar_com = (reference * weights).sum(0) / weights_sum
+        mob_org = coordsets - mob_com[:, np.newaxis]
+        tar_org = reference - tar_com
+        matrices = np.einsum('ni,knj->kij', tar_org * weights,
+                             mob_org * weights)
+
+    U, s, Vh = np.linalg.svd(matrices)
+    Id = np.zeros_like(matrices)
+    Id[:, 0, 0] = 1
+    Id[:, 1, 1] = 1
+    Id[:, 2, 2] = np.sign(np.linalg.det(matrices))
+    rotations = np.matmul(Vh.transpose(0, 2, 1),
+                          np.matmul(Id, U.transpose(0, 2, 1)))
+    coordsets = np.matmul(mob_org, rotations)
+    coordsets += tar_com
+    return coordsets
+
+
+def shrinkSketch(sketch, n_rows):
+    """Shrink frequent directions *sketch* in place to its first *n_rows*
+    rows, and set the other rows to zero.  Singular vectors are obtained
+    from the Gram matrix of rows, so that the sketch is not copied."""
+
+    values, vectors = np.linalg.eigh(sketch.dot(sketch.T))
+    values, vectors = values[::-1], vectors[:, ::-1]
+    shrunk = np.maximum(values[:n_rows] - max(values[n_rows], 0), 0)
+    scales = np.sqrt(shrunk / np.where(shrunk > 0, values[:n_rows], 1))
+    weights = (vectors[:, :n_rows] * scales).T
+    # each block of columns is calculated before rows are overwritten
+    for start in range(0, sketch.shape[1], n_rows):
+        cols = slice(start, start + n_rows)
+        sketch[:n_rows, cols] = weights.dot(sketch[:, cols])
+    sketch[n_rows:] = 0
+
+
+def getBlockSize(dof, n_frames, itemsize=8, **kwargs):
+    """Returns number of frames to be read at a time, which is *block*
+    keyword argument or derived from *memory* budget in megabytes."""
+
+    block = kwargs.get('block', None)
+    if block is None:
+        memory = kwargs.get('memory', 256)
+        block = int(memory * 1024 * 1024 // (dof * itemsize))
+    return max(1, min(int(block), n_frames))
+
+
+def getShift(traj, reference=None):
+    """Returns flattened *reference* coordinates, by default those of *traj*,
+    which are subtracted from frames to avoid cancellation in accumulated
+    sums."""
+
+    if reference is None:
+        reference = traj._getCoords()
+    if reference is None:
+        return np.zeros(traj.numSelected() * 3)
+    return np.asarray(reference, float).flatten()
+
+
+def iterCoordsetBlocks(traj, block, aligned=False, reference=None):
+    """Yield coordinate sets of selected atoms in *traj* in blocks of *block*
+    frames as arrays with shape ``(n_csets, n_atoms, 3)``.  Frames are
+    superposed onto *reference* coordinates, by default the trajectory
+    reference, unless *aligned* is **True**.  Iteration starts from the first
+    frame and position of *traj* is restored in the end."""
+
+    nfi = traj.nextIndex()
+    traj.reset()
+    if reference is None:
+        reference = traj._getCoords()
+    else:
+        reference = np.asarray(reference, float).reshape((-1, 3))
+    weights = traj._getWeights()
+    n_frames = len(traj)
+    try:
+        n_read = 0
+        while n_read < n_frames:
+            coords = []
+            for _ in range(min(block, n_frames - n_read)):
+                xyz = traj.nextCoordset()
+                if xyz is None:
+                    break
+                coords.append(xyz)
+            if not coords:
+                break
+            coords = np.array(coords, float)
+            if not aligned:
+                coords = superposeCoordsets(coords, reference, weights)
+            n_read += len(coords)
+            yield coords
+    finally:
+        traj.goto(nfi)
+
+
+def calcRandomizedModes(product, dof, n_modes, oversampling=10, n_iter=4,
+                        seed=None, **kwargs):
+    """Returns largest eigenvalues and eigenvectors of a symmetric positive
+    semi-definite matrix using a randomized range finder with power
+    iterations [HN11]_.  *product* computes products of the matrix with a
+    ``(dof, k)`` array, and is called *n_iter* + 2 times."""
+
+    random = np.random.RandomState(seed)
+    n_vectors = min(n_modes + oversampling, dof)
+    basis = random.normal(size=(dof, n_vectors))
+    for _ in range(n_iter + 1):
+        basis, _ = np.linalg.qr(product(basis))
+    projected = basis.T.dot(product(basis))
+    values, vectors = np.linalg.eigh((projected + projected.T) / 2)
+    order = values.argsort()[::-1][:n_modes]
+    return values[order], basis.dot(vectors[:, order])
+
+
+def calcEDA(traj, n_modes=20, memory=1024, **kwargs):
+    """Returns an :class:`EDA` instance for *traj*, which is calculated out
+    of core in two passes over the trajectory, so that all frames are never
+    held in memory.  The first pass calculates the average structure of
+    frames superposed onto the trajectory reference, and the second pass
+    superposes frames onto the average structure and accumulates either the
+    covariance matrix, or, when it does not fit in *memory*, a frequent
+    directions sketch [EL13]_ of frame deviations from which approximate
+    principal modes are obtained.
+
+    :arg traj: a trajectory, e.g. a multi-file :class:`.Trajectory` or
+        :class:`.DCDFile`
+    :type traj: :class:`.TrajBase`
+
+    :arg n_modes: number of modes to calculate, default is 20
+    :type n_modes: int
+
+    :arg memory: upper bound for memory usage in megabytes, default is 1024
+    :type memory: float
+
+    :arg aligned: if **True**, frames are not superposed
+    :type aligned: bool
+
+    :arg sketch: number of rows of the sketch, default is the largest that
+        fits in *memory*, sketching is used whenever it is given
+    :type sketch: int"""
+
+    if not isinstance(traj, TrajBase):
+        raise TypeError('traj must be a trajectory, not {0}'
+                        .format(type(traj)))
+    n_atoms = traj.numSelected()
+    dof = n_atoms * 3
+    n_frames = len(traj)
+    if n_frames < 3:
+        raise ValueError('traj must have more than 3 frames')
+    n_modes = min(int(n_modes), dof)
+    aligned = kwargs.get('aligned', False)
+
+    limit = memory * 1024 * 1024
+    # block of frames, and two arrays of the same size for superposition
+    block = getBlockSize(dof, n_frames, 24, memory=memory / 8.)
+    available = (limit - block * dof * 24) / 8.
+    # covariance matrix, its copy decomposed by LAPACK, eigenvectors with
+    # their reordered copy and workspace, or all eigenvectors and twice the
+    # size of the matrix for workspace when scipy is not available
+    if importLA().__package__.startswith('scipy'):
+        decomposition = dof * dof + 2 * n_modes * dof + 40 * dof
+    else:
+        decomposition = 4 * dof * dof
+    covariance = ('sketch' not in kwargs and
+                  dof * dof + decomposition <= available)
+    if not covariance:
+        n_rows = kwargs.get('sketch', None)
+        if n_rows is None:
+            # sketch has twice as many rows, its Gram matrix and workspace
+            # of decomposition take 24 squares of rows, and modes with two
+            # temporary arrays are calculated in the end
+            rest = max(available - 3 * n_modes * dof, 0)
+            n_rows = int((np.sqrt(dof * dof + 24 * rest) - dof) / 24)
+        n_rows = min(int(n_rows), dof - 1)
+        if n_rows <= n_modes:
+            raise ValueError('memory is not sufficient for calculating {0} '
+                             'modes of {1} atoms'.format(n_modes, n_atoms))
+
+    start = time.time()
+    LOGGER.info('Calculating average structure using {0} frames.'
+                .format(n_frames))
+    shift = getShift(traj)
+    coordsum = np.zeros(dof)
+    for coords in iterCoordsetBlocks(traj, block, aligned):
+        coordsum += (coords.reshape((len(coords), dof)) - shift).sum(0)
+    mean = (coordsum / n_frames + shift).reshape((n_atoms, 3))
+
+    eda = EDA(traj.getTitle())
+    if covariance:
+        LOGGER.info('Building covariance matrix.')
+        eda.buildCovariance(traj, block=block, aligned=aligned,
+                            reference=mean)
+        eda.calcModes(n_modes)
+    else:
+        LOGGER.info('Sketching frame deviations using {0} directions.'
+                    .format(n_rows))
+        eda._performSketch(traj, n_modes, n_rows, block, aligned, mean)
+    LOGGER.debug('{0} modes were calculated in {1:.2f}s.'
+                 .format(eda.numModes(), time.time()-start))
+    return eda
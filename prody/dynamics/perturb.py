@@ -18,7 +18,7 @@ from .nma import NMA
 from .modeset import ModeSet
 from .mode import VectorBase, Mode, Vector
 from .gnm import GNMBase
-from .analysis import calcCovariance
+from .analysis import calcCovariance, _getModeProperties
 
 __all__ = ['calcPerturbResponse']
 
@@ -39,6 +39,11 @@ def calcPerturbResponse(model, atoms=None, **kwargs):
     *model* and *atoms* must have the same number of atoms. *atoms* must be an
     :class:`.AtomGroup` instance. 
 
+    The PRS matrix is calculated for blocks of rows directly from modes, or
+    from the covariance matrix if it is already set for *model*, so that the
+    full covariance matrix is not built.  Size of blocks is determined by
+    *memory* budget in megabytes, default is 256.
+
     .. [CA09] Atilgan C, Atilgan AR, Perturbation-Response Scanning
        Reveals Ligand Entry-Exit Mechanisms of Ferric Binding Protein.
        *PLoS Comput Biol* **2009** 5(10):e1000544.
@@ -62,36 +67,10 @@ def calcPerturbResponse(model, atoms=None, **kwargs):
 
     n_atoms = model.numAtoms()
     LOGGER.timeit('_prody_prs_all')
-    LOGGER.info('Calculating covariance matrix')
-    LOGGER.timeit('_prody_cov')
-
-    cov = model.getCovariance()
-
-    LOGGER.clear()
-    LOGGER.report('Covariance matrix calculated in %.1fs.', '_prody_cov')
 
     LOGGER.info('Calculating perturbation response')
     LOGGER.timeit('_prody_prs_mat')
-    if not model.is3d():
-        prs_matrix = cov**2
-
-    else:
-        cov_squared = cov**2
-        n_by_3n_cov_squared = np.zeros((n_atoms, 3 * n_atoms))
-        prs_matrix = np.zeros((n_atoms, n_atoms))
-        i3 = -3
-        i3p3 = 0
-        for i in range(n_atoms):
-            i3 += 3
-            i3p3 += 3
-            n_by_3n_cov_squared[i,:] = (cov_squared[i3:i3p3,:]).sum(0)
-
-        j3 = -3
-        j3p3 = 0
-        for j in range(n_atoms):
-            j3 += 3
-            j3p3 += 3                
-            prs_matrix[:,j] = (n_by_3n_cov_squared[:,j3:j3p3]).sum(1)
+    prs_matrix = calcPRSMatrix(model, kwargs.get('memory', 256))
 
     LOGGER.clear()
     LOGGER.report('Perturbation response matrix calculated in %.1fs.',
@@ -101,19 +80,19 @@ def calcPerturbResponse(model, atoms=None, **kwargs):
     no_diag = kwargs.get('no_diag', suppress_diag)
     #filename = kwargs.get('filename', None)
 
-    norm_prs_matrix = np.zeros((n_atoms, n_atoms))
-    self_dp = np.diag(prs_matrix)  
-    self_dp = self_dp.reshape(n_atoms, 1)
-    norm_prs_matrix = prs_matrix / np.repeat(self_dp, n_atoms, axis=1)
+    self_dp = np.diag(prs_matrix).reshape(n_atoms, 1)
+    norm_prs_matrix = prs_matrix
+    norm_prs_matrix /= self_dp
 
     if no_diag:
        # suppress the diagonal (self displacement) to facilitate
        # visualizing the response profile
-       norm_prs_matrix = norm_prs_matrix - np.diag(np.diag(norm_prs_matrix))
+       np.fill_diagonal(norm_prs_matrix, 0)
     
-    W = 1 - np.eye(n_atoms)
-    effectiveness = np.average(norm_prs_matrix, weights=W, axis=1)
-    sensitivity = np.average(norm_prs_matrix, weights=W, axis=0)
+    # averages exclude the diagonal
+    diagonal = np.diag(norm_prs_matrix)
+    effectiveness = (norm_prs_matrix.sum(1) - diagonal) / (n_atoms - 1)
+    sensitivity = (norm_prs_matrix.sum(0) - diagonal) / (n_atoms - 1)
 
     #if filename:
     #    np.savetxt(filename, norm_prs_matrix, delimiter='\t', fmt='%8.6f')
@@ -137,6 +116,33 @@ def calcPerturbResponse(model, atoms=None, **kwargs):
     return norm_prs_matrix, effectiveness, sensitivity
 
 
+def calcPRSMatrix(model, memory=256):
+    """Returns the matrix of squared covariances summed over 3x3 blocks of
+    atom pairs, i.e. the unnormalized PRS matrix, which is calculated for
+    blocks of rows using at most *memory* megabytes for each block."""
+
+    n_atoms = model.numAtoms()
+    dim = 3 if model.is3d() else 1
+    cov = model._cov if isinstance(model, NMA) else None
+    if cov is None:
+        vectors, variances, _, _ = _getModeProperties(model)
+        weighted = vectors * np.diag(variances)
+
+    n_rows = max(1, int(memory * 1024 * 1024 // (dim * dim * n_atoms * 8)))
+    prs_matrix = np.empty((n_atoms, n_atoms))
+    for start in range(0, n_atoms, n_rows):
+        stop = min(start + n_rows, n_atoms)
+        if cov is None:
+            rows = np.dot(weighted[start * dim:stop * dim], vectors.T)
+        else:
+            rows = np.array(cov[start * dim:stop * dim], float)
+        np.square(rows, rows)
+        if dim == 3:
+            rows = rows.reshape((stop - start, 3, n_atoms, 3)).sum(3).sum(1)
+        prs_matrix[start:stop] = rows
+    return prs_matrix
+
+
 def calcDynamicFlexibilityIndex(prs_matrix, atoms, select):
     """
     Calculate the dynamic flexibility index for the selected residue(s).
@@ -23,6 +23,62 @@ class Increment(object):
         return self._i
 
 
+def calcBlockProjections(coords, blocks, tol=1e-8):
+    """Returns block indices of atoms, column offsets and numbers of columns
+    of blocks in the projection matrix, and local projections of atoms onto
+    rigid motions of their blocks with shape ``(n_atoms, 3, 6)``.  Blocks
+    are numbered in the order they appear in *blocks*.  Blocks with a single
+    atom have translations only, as in :meth:`RTB.calcProjection`, and
+    blocks of collinear atoms have rotations only around principal axes
+    with moments of inertia larger than *tol* times the largest one."""
+
+    from collections import defaultdict
+    i = Increment(-1)
+    d = defaultdict(i)
+    labels = np.array([d[b] for b in blocks], dtype=int)
+    n_blocks = len(d)
+    n_atoms = len(labels)
+
+    sizes = np.bincount(labels, minlength=n_blocks)
+
+    centers = np.array([np.bincount(labels, coords[:, k], n_blocks)
+                        for k in range(3)]).T / sizes[:, np.newaxis]
+    centered = coords - centers[labels]
+
+    # inverse square root of inertia tensors of blocks gives orthonormal
+    # rotations around principal axes
+    outer = (centered[:, :, np.newaxis] * centered[:, np.newaxis, :])
+    outer = outer.reshape(n_atoms, 9)
+    inertia = np.array([np.bincount(labels, outer[:, k], n_blocks)
+                        for k in range(9)]).T.reshape(n_blocks, 3, 3)
+    trace = inertia[:, [0, 1, 2], [0, 1, 2]].sum(1)
+    inertia = trace[:, np.newaxis, np.newaxis] * np.eye(3) - inertia
+    axes = np.zeros((n_blocks, 3, 3))
+    n_rotations = np.zeros(n_blocks, int)
+    rigid = sizes > 1
+    if rigid.any():
+        values, vectors = np.linalg.eigh(inertia[rigid])
+        keep = values > tol * values[:, -1:]
+        scales = np.where(keep, 1 / np.sqrt(np.where(keep, values, 1)), 0)
+        isqrt = np.einsum('bik,bk,bjk->bij', vectors, scales, vectors)
+        # rotations around the axis of collinear atoms do not move them, so
+        # such blocks rotate around the other principal axes only, which
+        # come last in ascending order of moments of inertia
+        linear = ~keep.all(1)
+        scaled = (vectors * scales[:, np.newaxis]).transpose(0, 2, 1)
+        isqrt[linear] = scaled[linear][:, ::-1]
+        axes[rigid] = isqrt
+        n_rotations[rigid] = keep.sum(1)
+    n_cols = 3 + n_rotations
+    offsets = np.concatenate([[0], np.cumsum(n_cols)])
+
+    local = np.zeros((n_atoms, 3, 6))
+    local[:, [0, 1, 2], [0, 1, 2]] = (1 / np.sqrt(sizes[labels]))[:, np.newaxis]
+    local[:, :, 3:] = np.cross(axes[labels],
+                               centered[:, np.newaxis, :]).transpose(0, 2, 1)
+    return labels, offsets, n_cols, local
+
+
 class RTB(ANMBase):
 
     """Class for Rotations and Translations of Blocks (RTB) method ([FT00]_).
@@ -60,6 +116,13 @@ class RTB(ANMBase):
 
         :arg gamma: spring constant, default is 1.0
         :type gamma: float
+
+        :arg sparse: elect to assemble the block Hessian directly from
+            contacts between blocks using a sparse projection matrix, without
+            building the atomic Hessian, default is **False**.  Memory then
+            scales with the number of contacts and blocks rather than the
+            number of atoms squared.  Scipy is required.
+        :type sparse: bool
         """
 
 
@@ -73,11 +136,90 @@ class RTB(ANMBase):
                 raise TypeError('coords must be a Numpy array or an object '
                                 'with `getCoords` method')
 
+        if kwargs.get('sparse', False):
+            self.buildBlockHessian(coords, blocks, cutoff, gamma, **kwargs)
+            return
+
         super(RTB, self).buildHessian(coords, cutoff=cutoff, gamma=gamma, **kwargs)
 
         self.calcProjection(coords, blocks, **kwargs)
 
 
+    def buildBlockHessian(self, coords, blocks, cutoff=15., gamma=1.,
+                          **kwargs):
+        """Build sparse block Hessian and projection matrices directly from
+        contacts between atoms in different blocks.  Arguments are the same
+        as for :meth:`buildHessian`."""
+
+        try:
+            from scipy import sparse as scipy_sparse
+        except ImportError:
+            raise ImportError('failed to import scipy.sparse, which  is '
+                              'required for sparse matrix calculations')
+
+        from .gnm import (checkENMParameters, calcGammas, getContacts,
+                          assembleKirchhoff)
+
+        coords = np.asarray(coords, float)
+        n_atoms = coords.shape[0]
+        if n_atoms != len(blocks):
+            raise ValueError('len(blocks) must match number of atoms')
+
+        cutoff, g, gamma = checkENMParameters(cutoff, gamma)
+        self._reset()
+        self._cutoff = cutoff
+        self._gamma = g
+
+        LOGGER.timeit('_rtb')
+        labels, offsets, n_cols, local = calcBlockProjections(coords, blocks)
+        nb6 = offsets[-1]
+
+        # each atom has six local columns, i.e. three translations and three
+        # rotations of its block, of which single atom blocks use only three
+        # and blocks of collinear atoms only five
+        atom_cols = offsets[labels][:, np.newaxis] + np.arange(6)
+        atom_mask = np.arange(6) < n_cols[labels][:, np.newaxis]
+
+        rows = np.repeat(np.arange(n_atoms * 3), atom_mask.sum(1).repeat(3))
+        cols = np.repeat(atom_cols, 3, 0)[np.repeat(atom_mask, 3, 0)]
+        values = local.reshape(-1, 6)[np.repeat(atom_mask, 3, 0)]
+        self._project = scipy_sparse.csr_matrix((values, (rows, cols)),
+                                                shape=(n_atoms * 3, nb6))
+
+        i, j, dist2 = getContacts(coords, cutoff, kwargs.get('kdtree', True))
+        gammas = calcGammas(g, dist2, i, j)
+        self._kirchhoff = assembleKirchhoff(i, j, gammas, n_atoms,
+                                            sparse=True)
+
+        # rigid motions of a block do not stretch springs within the block,
+        # so only contacts between blocks contribute to the block Hessian,
+        # which is G^T diag(gammas) G where a row of G projects the unit
+        # vector of a spring onto rigid motions of both of its blocks
+        between = labels[i] != labels[j]
+        i, j, dist2, gammas = i[between], j[between], dist2[between], \
+            gammas[between]
+        units = (coords[j] - coords[i]) / np.sqrt(dist2)[:, np.newaxis]
+        values = np.concatenate([
+            (units[:, :, np.newaxis] * local[i]).sum(1)[atom_mask[i]],
+            -(units[:, :, np.newaxis] * local[j]).sum(1)[atom_mask[j]]])
+        rows = np.concatenate([np.repeat(np.arange(len(i)),
+                                         atom_mask[i].sum(1)),
+                               np.repeat(np.arange(len(j)),
+                                         atom_mask[j].sum(1))])
+        cols = np.concatenate([atom_cols[i][atom_mask[i]],
+                               atom_cols[j][atom_mask[j]]])
+        incidence = scipy_sparse.csr_matrix((values, (rows, cols)),
+                                            shape=(len(i), nb6))
+        weighted = scipy_sparse.diags(gammas).dot(incidence)
+        self._hessian = incidence.T.dot(weighted).tocsr()
+
+        self._coords = coords.copy()
+        self._n_atoms = n_atoms
+        self._dof = nb6
+        LOGGER.report('Block Hessian and projection matrix were calculated '
+                      'in %.2fs.', label='_rtb')
+
+
     def calcProjection(self, coords, blocks, **kwargs):
         natoms = self._n_atoms
 
@@ -136,7 +278,7 @@ class RTB(ANMBase):
 
         return self._project
 
-    def calcModes(self, n_modes=20, zeros=False, turbo=True):
+    def calcModes(self, n_modes=20, zeros=False, turbo=True, **kwargs):
         """Calculate normal modes.  This method uses :func:`scipy.linalg.eigh`
         function to diagonalize the Hessian matrix. When Scipy is not found,
         :func:`numpy.linalg.eigh` is used.
@@ -153,5 +295,5 @@ class RTB(ANMBase):
         """
         if n_modes is None:
             n_modes = self._dof
-        super(RTB, self).calcModes(n_modes, zeros, turbo)
-        self._array = np.dot(self._project, self._array)
+        super(RTB, self).calcModes(n_modes, zeros, turbo, **kwargs)
+        self._array = self._project.dot(self._array)
@@ -15,7 +15,7 @@ from .modeset import ModeSet
 __all__ = ['deformAtoms', 'sampleModes', 'traverseMode']
 
 
-def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
+def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0, **kwargs):
     """Returns an ensemble of randomly sampled conformations along given
     *modes*.  If *atoms* are provided, sampling will be around its active
     coordinate set.  Otherwise, sampling is around the 0 coordinate set.
@@ -35,6 +35,12 @@ def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
         respect to the initial conformation, default is 1.0 Å
     :type rmsd: float
 
+    :arg filename: if given, conformations are written to a DCD file in
+        blocks of *block* conformations, or as many as fit in *memory*
+        megabytes (default is 256), instead of being stored in an ensemble,
+        and the filename is returned
+    :type filename: str
+
     :returns: :class:`.Ensemble`
 
     For given normal modes :math:`[u_1 u_2 ... u_m]` and their eigenvalues
@@ -118,29 +124,51 @@ def sampleModes(modes, atoms=None, n_confs=1000, rmsd=1.0):
 
     LOGGER.info('Modes are scaled by {0}.'.format(scale))
 
-    confs = []
-    append = confs.append
     scale = scale / magnitudes * variances ** 0.5
 
-    array = modes._getArray()
-    if array.ndim > 1:
-        for i in range(n_confs):
-            append((array * scale * randn[i]).sum(1).reshape((n_atoms, 3)))
-    else:
-        for i in range(n_confs):
-            append((array * scale * randn[i]).reshape((n_atoms, 3)))
+    # deformations are products of random numbers and scaled modes
+    array = modes._getArray().reshape((n_atoms * 3, -1)) * scale
+    if initial is None:
+        initial = np.zeros((n_atoms, 3))
+
+    def sample(start, stop):
+        confs = np.dot(randn[start:stop], array.T)
+        confs = confs.reshape((stop - start, n_atoms, 3))
+        confs += initial
+        return confs
+
+    filename = kwargs.pop('filename', None)
+    if filename is not None:
+        return writeConformations(filename, sample, n_confs, n_atoms,
+                                  **kwargs)
 
     ensemble = Ensemble('Conformations along {0}'.format(modes))
-    if initial is None:
-        ensemble.setCoords(np.zeros((n_atoms, 3)))
-        ensemble.addCoordset(np.array(confs))
-    else:
-        ensemble.setCoords(initial)
-        ensemble.addCoordset(np.array(confs) + initial)
+    ensemble.setCoords(initial)
+    ensemble.addCoordset(sample(0, n_confs))
     return ensemble
 
 
-def traverseMode(mode, atoms, n_steps=10, rmsd=1.5):
+def writeConformations(filename, sample, n_confs, n_atoms, **kwargs):
+    """Write *n_confs* conformations to DCD file *filename* in blocks that
+    are returned by ``sample(start, stop)``, and return the filename.  Block
+    size is *block* or as many conformations as fit in *memory* megabytes."""
+
+    from prody.trajectory import DCDFile
+    from .pca import getBlockSize
+
+    if not filename.lower().endswith('.dcd'):
+        filename += '.dcd'
+    block = getBlockSize(n_atoms * 3, n_confs, **kwargs)
+    dcd = DCDFile(filename, 'w')
+    try:
+        for start in range(0, n_confs, block):
+            dcd.write(sample(start, min(start + block, n_confs)))
+    finally:
+        dcd.close()
+    return filename
+
+
+def traverseMode(mode, atoms, n_steps=10, rmsd=1.5, **kwargs):
     """Generates a trajectory along a given *mode*, which can be used to
     animate fluctuations in an external program.
 
@@ -160,6 +188,10 @@ def traverseMode(mode, atoms, n_steps=10, rmsd=1.5):
         respect to the initial conformation, default is 1.5 Å
     :type rmsd: float
 
+    :arg filename: if given, conformations are written to a DCD file in
+        blocks, as in :func:`.sampleModes`, and the filename is returned
+    :type filename: str
+
     :returns: :class:`.Ensemble`
 
     For given normal mode :math:`u_i`, its eigenvalue
@@ -201,17 +233,20 @@ def traverseMode(mode, atoms, n_steps=10, rmsd=1.5):
     LOGGER.info('Mode is scaled by {0}.'.format(scale))
 
     array = arr * var**0.5 * scale / abs(mode)
-    confs_add = [initial + array]
-    for s in range(1, n_steps):
-        confs_add.append(confs_add[-1] + array)
-    confs_sub = [initial - array]
-    for s in range(1, n_steps):
-        confs_sub.append(confs_sub[-1] - array)
-    confs_sub.reverse()
+    steps = np.arange(-n_steps, n_steps + 1, dtype=float)
+
+    def traverse(start, stop):
+        return initial + steps[start:stop, np.newaxis, np.newaxis] * array
+
+    filename = kwargs.pop('filename', None)
+    if filename is not None:
+        return writeConformations(filename, traverse, len(steps), n_atoms,
+                                  **kwargs)
+
     ensemble = Ensemble('Conformations along {0}'.format(name))
     ensemble.setAtoms(atoms)
     ensemble.setCoords(initial)
-    ensemble.addCoordset(np.array(confs_sub + [initial] + confs_add))
+    ensemble.addCoordset(traverse(0, len(steps)))
     return ensemble
 
 
@@ -220,7 +255,8 @@ def deformAtoms(atoms, mode, rmsd=None, replace=False, scale=None):
     must be a :class:`.AtomGroup` instance.  New coordinate set will be
     appended to *atoms*. If *rmsd* is provided, *mode* will be scaled to
     generate a coordinate set with given RMSD distance to the active coordinate
-    set."""
+    set.  *scale* may be an array of factors, in which case a coordinate set is
+    appended for each of them."""
 
     if not isinstance(atoms, AtomGroup):
         raise TypeError('atoms must be an AtomGroup, not {0}'
@@ -243,14 +279,17 @@ def deformAtoms(atoms, mode, rmsd=None, replace=False, scale=None):
         # rmsd = ( ((scalar * array)**2).sum() / n_atoms )**0.5
         scalar = (atoms.numAtoms() * rmsd**2 / (array**2).sum())**0.5
         LOGGER.info('Mode is scaled by {0}.'.format(scalar))
-        if replace is False:
-            atoms.addCoordset(atoms.getCoords() + array * scalar * scale)
-        else:
-            atoms.setCoords(atoms.getCoords() + array * scalar * scale)
+        array = array * scalar
+
+    if np.ndim(scale) > 0:
+        if replace is not False:
+            raise ValueError('only one coordinate set can replace the active '
+                             'coordinate set')
+        scale = np.asarray(scale, float)[:, np.newaxis, np.newaxis]
+
+    if replace is False:
+        atoms.addCoordset(atoms.getCoords() + array * scale)
     else:
-        if replace is False:
-            atoms.addCoordset(atoms.getCoords() + array * scale)
-        else:
-            atoms.setCoords(atoms.getCoords() + array * scale)
+        atoms.setCoords(atoms.getCoords() + array * scale)
 
 
@@ -23,7 +23,7 @@ from .compare import calcSpectralOverlap, matchModes, calcOverlap
 from .analysis import calcSqFlucts, calcCrossCorr, calcFractVariance, calcCollectivity
 from .plotting import showAtomicLines, showAtomicMatrix, showDomainBar
 from .anm import ANM
-from .gnm import GNM
+from .gnm import GNM, ZERO
 
 __all__ = ['ModeEnsemble', 'sdarray', 'calcEnsembleENMs', 'showSignature1D', 'showSignatureAtomicLines', 
            'showSignatureMode', 'showSignatureDistribution', 'showSignatureCollectivity',
@@ -880,11 +880,23 @@ def calcEnsembleENMs(ensemble, model='gnm', trim='reduce', n_modes=20, **kwargs)
                 See https://docs.python.org/2/library/multiprocessing.html for details.
                 Default is **False**
     :type turbo: bool
+
+    :arg n_cpu: number of processes used to calculate ENMs of conformations. 
+                Coordinates of the ensemble are placed in shared memory and 
+                modes are returned in the order of conformations. 
+                Default is 1
+    :type n_cpu: int
     """
 
     match = kwargs.pop('match', True)
     method = kwargs.pop('method', None)
     turbo = kwargs.pop('turbo', False)
+    n_cpu = kwargs.pop('n_cpu', 1)
+
+    if not isinstance(n_cpu, Integral):
+        raise TypeError('n_cpu must be an integer')
+    elif n_cpu < 1:
+        raise ValueError('n_cpu must be equal to or greater than 1')
 
     if isinstance(ensemble, Conformation):
         conformation = ensemble
@@ -906,7 +918,7 @@ def calcEnsembleENMs(ensemble, model='gnm', trim='reduce', n_modes=20, **kwargs)
         select = atoms
         atoms = ensemble.getAtoms(selected=False)
 
-    ori_coords = atoms.getCoords()
+    ori_coords = None if atoms is None else atoms.getCoords()
         
     labels = ensemble.getLabels()
 
@@ -919,16 +931,37 @@ def calcEnsembleENMs(ensemble, model='gnm', trim='reduce', n_modes=20, **kwargs)
     LOGGER.progress('Calculating {0} {1} modes for {2} conformations...'
                     .format(str_modes, model_type, n_confs), n_confs, '_prody_calcEnsembleENMs')
 
-    for i in range(n_confs):
-        LOGGER.update(i, label='_prody_calcEnsembleENMs')
-        coords = ensemble.getCoordsets(i, selected=False)
-        nodes = coords[0, :, :]
-        if atoms is not None:
-            atoms.setCoords(nodes)
-            nodes = atoms
-        enm, _ = calcENM(nodes, select, model=model, trim=trim, 
-                            n_modes=n_modes, title=labels[i], **kwargs)
-        enms.append(enm)
+    if n_cpu > 1 and n_confs > 1:
+        from multiprocessing import Pool, RawArray
+
+        n_cpu = min(n_cpu, n_confs)
+        coordsets = ensemble.getCoordsets(selected=False)
+        shared = RawArray('d', coordsets.size)
+        np.frombuffer(shared).reshape(coordsets.shape)[:] = coordsets
+        del coordsets
+
+        options = dict(kwargs, model=model, trim=trim, n_modes=n_modes)
+        pool = Pool(n_cpu, _initEnsembleENMs, 
+                    (shared, (n_confs, -1, 3), atoms, select, options))
+        try:
+            for i, enm in enumerate(pool.imap(_calcEnsembleENM, 
+                                              enumerate(labels))):
+                LOGGER.update(i, label='_prody_calcEnsembleENMs')
+                enms.append(enm)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for i in range(n_confs):
+            LOGGER.update(i, label='_prody_calcEnsembleENMs')
+            coords = ensemble.getCoordsets(i, selected=False)
+            nodes = coords[0, :, :]
+            if atoms is not None:
+                atoms.setCoords(nodes)
+                nodes = atoms
+            enm, _ = calcENM(nodes, select, model=model, trim=trim, 
+                                n_modes=n_modes, title=labels[i], **kwargs)
+            enms.append(enm)
 
         #lbl = labels[i] if labels[i] != '' else '%d-th conformation'%(i+1)
     LOGGER.finish()
@@ -955,12 +988,37 @@ def calcEnsembleENMs(ensemble, model='gnm', trim='reduce', n_modes=20, **kwargs)
                              label=ensemble.getLabels())
     modeens.setAtoms(ensemble.getAtoms())
 
-    atoms.setCoords(ori_coords)
+    if atoms is not None:
+        atoms.setCoords(ori_coords)
     
     if match:
         modeens.match(turbo=turbo, method=method)
     return modeens
 
+_ENSEMBLE_ENMS = {}
+
+def _initEnsembleENMs(shared, shape, atoms, select, options):
+    """Initialize a worker process of :func:`calcEnsembleENMs` with shared 
+    coordinates, and its own copy of *atoms* and *select*."""
+
+    _ENSEMBLE_ENMS['coordsets'] = np.frombuffer(shared).reshape(shape)
+    _ENSEMBLE_ENMS['atoms'] = atoms
+    _ENSEMBLE_ENMS['select'] = select
+    _ENSEMBLE_ENMS['options'] = options
+
+def _calcEnsembleENM(args):
+    """Calculate ENM of a conformation in a worker process."""
+
+    i, label = args
+    nodes = _ENSEMBLE_ENMS['coordsets'][i]
+    atoms = _ENSEMBLE_ENMS['atoms']
+    if atoms is not None:
+        atoms.setCoords(nodes)
+        nodes = atoms
+    enm, _ = calcENM(nodes, _ENSEMBLE_ENMS['select'], title=label, 
+                     **_ENSEMBLE_ENMS['options'])
+    return enm
+
 def _getEnsembleENMs(ensemble, **kwargs):
     if isinstance(ensemble, (Ensemble, Conformation)):
         enms = calcEnsembleENMs(ensemble, **kwargs)
@@ -986,28 +1044,91 @@ def calcEnsembleSpectralOverlaps(ensemble, distance=False, turbo=False, **kwargs
                    distance via arccos.
     :type distance: bool
 
-    :arg turbo: if **True**, extra memory will be used to remember previous calculation 
-                results to accelerate the next calculation, so this option is particularly 
-                useful if spectral overlaps of the same ensemble are calculated repeatedly, 
-                e.g. using different number of modes. Note that for single calculation, 
-                *turbo* will compromise the speed.
+    :arg turbo: kept for backward compatibility. Overlaps are calculated in batches 
+                from eigenvectors scaled once for each member, so remembering previous 
+                calculation results is not necessary. 
                 Default is **False**
     :type turbo: bool
+
+    :arg weighted: if **True** then covariances are weighted by the trace. 
+                   Default is **False**
+    :type weighted: bool
+
+    :arg n_cpu: number of threads used to calculate blocks of the overlap matrix, 
+                which is also passed to :func:`.calcEnsembleENMs`. Default is 1
+    :type n_cpu: int
+
+    :arg memory: maximum memory in megabytes used for each block. Default is 256
+    :type memory: float
     """
 
+    weighted = kwargs.pop('weighted', False)
+    memory = kwargs.pop('memory', 256)
+    n_cpu = kwargs.get('n_cpu', 1)
     enms = _getEnsembleENMs(ensemble, **kwargs)
     
-    overlaps = np.ones((len(enms), len(enms)))
-    for i in range(enms.numModeSets()):
-        for j in range(i+1, enms.numModeSets()):
-            covlap = calcSpectralOverlap(enms[i, :], enms[j, :], turbo=turbo)
-            overlaps[i, j] = overlaps[j, i] = covlap
+    overlaps = _calcSpectralOverlapMatrix(enms.getModeSets(), weighted, 
+                                          n_cpu, memory)
 
     if distance:
         overlaps = np.arccos(overlaps)
 
     return overlaps
 
+def _calcSpectralOverlapMatrix(modesets, weighted=False, n_cpu=1, memory=256):
+    """Returns the matrix of spectral overlaps between all pairs of *modesets*, 
+    see :func:`.calcSpectralOverlap`.  Eigenvectors of each modeset are scaled 
+    once by the fourth root of variances, so that the sum of weighted squared 
+    overlaps of modes is the sum of squared products of scaled eigenvectors, 
+    which are calculated for blocks of rows of the upper triangle."""
+
+    n_sets = len(modesets)
+    traces = np.zeros(n_sets)
+    scaled = []
+    for i, modes in enumerate(modesets):
+        if weighted:
+            variances = calcFractVariance(modes)
+        else:
+            variances = modes.getVariances()
+        traces[i] = variances.sum()
+        scaled.append(modes._getArray() * variances ** 0.25)
+    n_modes = scaled[0].shape[1]
+    scaled = np.hstack(scaled)
+
+    # product and its reshaped sums for a block of rows
+    n_rows = int(memory * 1024 * 1024 // (8 * n_modes ** 2 * n_sets))
+    n_rows = max(1, n_rows)
+    overlaps = np.ones((n_sets, n_sets))
+
+    def calcBlock(start):
+        stop = min(start + n_rows, n_sets)
+        products = np.dot(scaled[:, start*n_modes:stop*n_modes].T, 
+                          scaled[:, start*n_modes:])
+        products **= 2
+        weights = products.reshape((stop - start, n_modes, 
+                                    n_sets - start, n_modes)).sum(3).sum(1)
+        totals = traces[start:stop, None] + traces[start:]
+        diff = totals - 2 * weights
+        diff[diff < ZERO] = 0
+        block = 1 - diff ** 0.5 / np.sqrt(totals)
+        overlaps[start:stop, start:] = block
+        overlaps[start:, start:stop] = block.T
+
+    starts = range(0, n_sets, n_rows)
+    if n_cpu > 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(n_cpu)
+        try:
+            pool.map(calcBlock, starts)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for start in starts:
+            calcBlock(start)
+    np.fill_diagonal(overlaps, 1.)
+    return overlaps
+
 def calcSignatureSqFlucts(mode_ensemble, **kwargs):
     """
     Get the signature square fluctuations of *mode_ensemble*. 
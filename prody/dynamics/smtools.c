@@ -4,85 +4,130 @@
 #include "math.h"
 #include "stdio.h"
 
-#define NR_END 1
-#define FREE_ARG char*
 #define square(x) x * x
 
-double **dmatrix(long nrl, long nrh, long ncl, long nch);
-void free_dmatrix(double **m, long nrl, long nrh, long ncl, long nch);
-double **zero_dmatrix(long nrl,long nrh,long ncl,long nch);
-void nrerror(char error_text[]);
-double *dvector(long nl, long nh);
+static double calcStiffness(double *XYZ, double *U, double *lambda, 
+                            double *scale, int nmodes, npy_intp i, npy_intp j)
+{
+  /* Effective spring constant between atoms i and j.  Mode components
+     are stored as U[(atom*3+dim)*nmodes+k] so that inner loop over modes
+     is contiguous. */
+  int k;
+  double r_ij, x_ij, y_ij, z_ij;
+  double *ui, *uj;
+  double d_ij_sup_k, cos_alpha_ij, sum1=0.0, sum2=0.0;
+
+  x_ij = XYZ[j*3]-XYZ[i*3];
+  y_ij = XYZ[j*3+1]-XYZ[i*3+1];
+  z_ij = XYZ[j*3+2]-XYZ[i*3+2];
+  r_ij = sqrt(x_ij*x_ij+y_ij*y_ij+z_ij*z_ij);
+  x_ij = x_ij/r_ij;
+  y_ij = y_ij/r_ij;
+  z_ij = z_ij/r_ij;
+
+  ui = U+i*3*nmodes;
+  uj = U+j*3*nmodes;
+  for(k=0; k<nmodes; k++){
+    cos_alpha_ij=(  (x_ij*(uj[k]-ui[k])) +\
+      (y_ij*(uj[nmodes+k]-ui[nmodes+k])) +\
+      (z_ij*(uj[2*nmodes+k]-ui[2*nmodes+k]))  );
+    d_ij_sup_k=scale[k]*cos_alpha_ij;
+
+    sum1+=fabs(lambda[k]*d_ij_sup_k);
+    sum2+=fabs(d_ij_sup_k);
+  }
+  return sum1/sum2;
+}
+
+static double *calcScale(double *lambda, int nmodes, double kbt)
+{
+  int k;
+  double *scale = (double *) malloc((size_t) (nmodes*sizeof(double)));
+  if (!scale)
+    return NULL;
+  for(k=0; k<nmodes; k++)
+    scale[k] = sqrt(kbt/lambda[k]);
+  return scale;
+}
 
 static PyObject *calcSM(PyObject *self, PyObject *args, PyObject *kwargs)
 {
+  /* Fill rows from start to stop of the stiffness matrix, and their 
+     symmetric counterparts.  sm must be initialized with zeros. */
   PyArrayObject *coords, *sm, *eigvecs, *eigvals;
-  int numCA, i, j, k, nmodes;
-  double *XYZ, *SM, *lambda, *U, kbt=1.;
-  double **stiff_matrix;
-  double r_ij, x_ij, y_ij, z_ij;//, norm_U;
+  int numCA, nmodes, start=0, stop=-1;
+  npy_intp i, j;
+  double *XYZ, *SM, *lambda, *U, *scale, kbt=1., k_ij;
   static char *kwlist[] = {"coords", "sm", "eigvecs", "eigvals",
           "natoms","n_modes",
-          "kbt",NULL};
+          "kbt", "start", "stop", NULL};
 
-  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOii|d", kwlist, 
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOii|dii", kwlist, 
           &coords, &sm, &eigvecs, &eigvals,
           &numCA, &nmodes,
-          &kbt))
+          &kbt, &start, &stop))
     return NULL;
 
+  if (stop < 0 || stop > numCA)
+    stop = numCA;
+
   XYZ = (double *) PyArray_DATA(coords);
   SM = (double *) PyArray_DATA(sm);
   U = (double *) PyArray_DATA(eigvecs);
   lambda = (double *) PyArray_DATA(eigvals);
 
-  stiff_matrix=zero_dmatrix(0,numCA-1,0,numCA-1);
+  scale = calcScale(lambda, nmodes, kbt);
+  if (!scale)
+    return PyErr_NoMemory();
 
-  for (i=0; i<numCA; i++){
+  Py_BEGIN_ALLOW_THREADS
+  for (i=start; i<stop; i++){
     for (j=i+1; j<numCA; j++){
-      r_ij = sqrt((XYZ[j*3]-XYZ[i*3])*(XYZ[j*3]-XYZ[i*3])+\
-        (XYZ[j*3+1]-XYZ[i*3+1])*(XYZ[j*3+1]-XYZ[i*3+1])+\
-        (XYZ[j*3+2]-XYZ[i*3+2])*(XYZ[j*3+2]-XYZ[i*3+2]));
-      x_ij = (XYZ[j*3]-XYZ[i*3])/r_ij;
-      y_ij = (XYZ[j*3+1]-XYZ[i*3+1])/r_ij;
-      z_ij = (XYZ[j*3+2]-XYZ[i*3+2])/r_ij;
-      double u_ij_sup_k[3]={0.0, 0.0, 0.0};
-      double d_ij_sup_k=0.0;
-      double sum1=0.0;
-      double sum2=0.0;
-      double cos_alpha_ij=0.0;
-
-      for(k=0; k<nmodes; k++){
-      //      u_ij_sup_k[0]=(eigvecs[k][ind_3j  ]-eigvecs[k][ind_3i  ]);
-        u_ij_sup_k[0]=(U[(k)*3*numCA+j*3]-U[(k)*3*numCA+i*3]);
-
-      //      u_ij_sup_k[1]=(eigvecs[k][ind_3j+1]-eigvecs[k][ind_3i+1]);
-        u_ij_sup_k[1]=(U[(k)*3*numCA+j*3+1]-U[(k)*3*numCA+i*3+1]);
-
-      //      u_ij_sup_k[2]=(eigvecs[k][ind_3j+2]-eigvecs[k][ind_3i+2]);
-        u_ij_sup_k[2]=(U[(k)*3*numCA+j*3+2]-U[(k)*3*numCA+i*3+2]);
-
-        cos_alpha_ij=(  (x_ij*u_ij_sup_k[0]) +\
-          (y_ij*u_ij_sup_k[1]) +\
-          (z_ij*u_ij_sup_k[2])  );
-        d_ij_sup_k=sqrt(kbt/lambda[k])*cos_alpha_ij;
-
-      
-        sum1+=fabs(lambda[k]*d_ij_sup_k);
-        sum2+=fabs(d_ij_sup_k);
-       
-      }
-      stiff_matrix[i][j]=sum1/sum2;
-      stiff_matrix[j][i]=stiff_matrix[i][j];
-     
+      k_ij = calcStiffness(XYZ, U, lambda, scale, nmodes, i, j);
+      SM[i*numCA+j] = k_ij;
+      SM[j*numCA+i] = k_ij;
     }
   }
-  for (i=0;i<numCA;i++)
-    for (j=0;j<numCA;j++)
-      SM[i*numCA+j]=stiff_matrix[i][j];
+  Py_END_ALLOW_THREADS
+
+  free(scale);
+  Py_RETURN_NONE;
+}
 
-  free_dmatrix(stiff_matrix,0,numCA-1,0,numCA-1);
+static PyObject *calcSMPairs(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+  /* Calculate effective spring constants for pairs of atoms given in 
+     rows and cols arrays, and write them into values. */
+  PyArrayObject *coords, *eigvecs, *eigvals, *rows, *cols, *values;
+  int nmodes;
+  npy_intp p, n_pairs, *I, *J;
+  double *XYZ, *lambda, *U, *K, *scale, kbt=1.;
+  static char *kwlist[] = {"coords", "eigvecs", "eigvals", "rows", "cols",
+          "values", "n_modes", "kbt", NULL};
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOOOOOi|d", kwlist, 
+          &coords, &eigvecs, &eigvals, &rows, &cols, &values,
+          &nmodes, &kbt))
+    return NULL;
+
+  XYZ = (double *) PyArray_DATA(coords);
+  U = (double *) PyArray_DATA(eigvecs);
+  lambda = (double *) PyArray_DATA(eigvals);
+  I = (npy_intp *) PyArray_DATA(rows);
+  J = (npy_intp *) PyArray_DATA(cols);
+  K = (double *) PyArray_DATA(values);
+  n_pairs = PyArray_SIZE(values);
 
+  scale = calcScale(lambda, nmodes, kbt);
+  if (!scale)
+    return PyErr_NoMemory();
+
+  Py_BEGIN_ALLOW_THREADS
+  for (p=0; p<n_pairs; p++)
+    K[p] = calcStiffness(XYZ, U, lambda, scale, nmodes, I[p], J[p]);
+  Py_END_ALLOW_THREADS
+
+  free(scale);
   Py_RETURN_NONE;
 }
 
@@ -92,6 +137,10 @@ static PyMethodDef smtools_methods[] = {
      METH_VARARGS | METH_KEYWORDS,
      "Build stiffness matrix."},
 
+    {"calcSMPairs",  (PyCFunction)calcSMPairs,
+     METH_VARARGS | METH_KEYWORDS,
+     "Calculate stiffness for pairs of atoms."},
+
     {NULL, NULL, 0, NULL}
 };
 
@@ -117,71 +166,3 @@ PyMODINIT_FUNC initsmtools(void) {
     import_array();
 }
 #endif
-
-double **dmatrix(long nrl, long nrh, long ncl, long nch)
-/* allocate a double matrix with subscript range m[nrl..nrh][ncl..nch] */
-{
-  long i, nrow=nrh-nrl+1,ncol=nch-ncl+1;
-  double **m;
-
-  /* allocate pointers to rows */
-  m=(double **) malloc((size_t)((nrow+NR_END)*sizeof(double*)));
-  if (!m) nrerror("allocation failure 1 in matrix()");
-  m += NR_END;
-  m -= nrl;
-
-  /* allocate rows and set pointers to them */
-  m[nrl]=(double *) malloc((size_t)((nrow*ncol+NR_END)*sizeof(double)));
-  if (!m[nrl]) nrerror("allocation failure 2 in matrix()");
-  m[nrl] += NR_END;
-  m[nrl] -= ncl;
-
-  for(i=nrl+1;i<=nrh;i++) m[i]=m[i-1]+ncol;
-
-  /* return pointer to array of pointers to rows */
-  return m;
-}
-
-void nrerror(char error_text[])
-/* Numerical Recipes standard error handler */
-{
-  fprintf(stderr,"Numerical Recipes run-time error...\n");
-  fprintf(stderr,"%s\n",error_text);
-  fprintf(stderr,"...now exiting to system...\n");
-  exit(1);
-}
-
-void free_dmatrix(double **m, long nrl, long nrh, long ncl, long nch)
-/* free a double matrix allocated by dmatrix() */
-{
-  free((FREE_ARG) (m[nrl]+ncl-NR_END));
-  free((FREE_ARG) (m+nrl-NR_END));
-}
-
-double **zero_dmatrix(long nrl,long nrh,long ncl,long nch)
-{
-  static double **M;
-  int i,j;
-
-  M=dmatrix(nrl,nrh,ncl,nch);
-  for(i=nrl;i<=nrh;i++)
-    for(j=ncl;j<=nch;j++)
-      M[i][j]=0.0;
-  return M;
-}
-
-void free_dvector(double *v, long nl, long nh)
-/* free a double vector allocated with dvector() */
-{
-  free((FREE_ARG) (v+nl-NR_END));
-}
-
-double *dvector(long nl, long nh)
-/* allocate a double vector with subscript range v[nl..nh] */
-{
-  double *v;
-
-  v=(double *)malloc((size_t) ((nh-nl+1+NR_END)*sizeof(double)));
-  if (!v) nrerror("allocation failure in dvector()");
-  return v-nl+NR_END;
-}
@@ -51,8 +51,9 @@ def writeVMDstiffness(stiffness, pdb, indices, k_range, filename='vmd_out', \
           
 
     :arg stiffness: mechanical stiffness profile calculated with 
-        :func:`.calcMechStiff`
-    :type stiffness: :class:`~numpy.ndarray`
+        :func:`.calcMechStiff`, which may be a sparse matrix calculated 
+        for pairs within a cutoff distance
+    :type stiffness: :class:`~numpy.ndarray`, :class:`scipy.sparse.csr_matrix`
 
     :arg pdb: a coordinate set or an object with ``getCoords`` method
     :type pdb: :class:`~numpy.ndarray`, :class:`.Atomic` 
@@ -97,6 +98,9 @@ def writeVMDstiffness(stiffness, pdb, indices, k_range, filename='vmd_out', \
         indices0 = indices[0] - resnum_list[0]
         indices1 = indices[1] - resnum_list[0]
 
+    if hasattr(stiffness, 'tocsr'):
+        stiffness = stiffness.tocsr().sorted_indices()
+
     out = openFile(addext(filename, '.tcl'), 'w')
     out_txt = openFile(addext(filename,'.txt'), 'w')
     writePDB(filename + '.pdb', pdb)
@@ -137,7 +141,12 @@ def writeVMDstiffness(stiffness, pdb, indices, k_range, filename='vmd_out', \
         nr_baza_col = [] # Resid of aa are here
         out.write("draw color "+str(colors[color_nr])+"\n")
             
-        for nr_i, i in enumerate(stiffness[r]):
+        if hasattr(stiffness, 'tocsr'):
+            row = stiffness[r]
+            pairs = zip(row.indices, row.data)
+        else:
+            pairs = enumerate(stiffness[r])
+        for nr_i, i in pairs:
             if k_range[0] < float(i) < k_range[1]:
                 baza_col.append(i)
                 nr_baza_col.append(nr_i+resnum_list[0])
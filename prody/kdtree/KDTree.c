@@ -22,6 +22,7 @@ struct KDTree
     struct Region *_query_region;
     long int _count;
     long int _neighbor_count;
+    long int _neighbor_list_size;
     float _radius;
     float _radius_sq;
     float _neighbor_radius;
@@ -293,6 +294,7 @@ struct KDTree* KDTree_init(int dim, int bucket_size)
     tree->_count=0;
     tree->_neighbor_count=0;
     tree->_neighbor_list = NULL;
+    tree->_neighbor_list_size = 0;
     tree->_bucket_size=bucket_size;
     tree->_data_point_list = NULL;
     tree->_data_point_list_size = 0;
@@ -474,6 +476,16 @@ long int KDTree_neighbor_get_count(struct KDTree* tree)
     return tree->_neighbor_count;
 }
 
+long int KDTree_get_nr_points(struct KDTree* tree)
+{
+    return tree->_data_point_list_size;
+}
+
+int KDTree_get_dim(struct KDTree* tree)
+{
+    return tree->dim;
+}
+
 static int KDTree_search(struct KDTree* tree, struct Region *region, struct Node *node, int depth);
 
 static int KDTree_test_region(struct KDTree* tree, struct Node *node, struct Region *region, int depth)
@@ -692,6 +704,71 @@ int KDTree_search_center_radius(struct KDTree* tree, float *coord, float radius)
     return KDTree_search(tree, NULL, NULL, 0);
 }
 
+static int KDTree_flag_center(struct KDTree* tree, struct Node *node, float *center, char *flags, int flag_centers)
+{
+    /* descends to nodes that may have points within radius of center without
+     * creating regions, and flags points found, or returns 1 at the first
+     * point found when centers are flagged */
+    if (Node_is_leaf(node))
+    {
+        long int i;
+
+        for (i=node->_start; i<node->_end; i++)
+        {
+            struct DataPoint data_point;
+
+            data_point=tree->_data_point_list[i];
+            if (KDTree_dist(center, data_point._coord, tree->dim)<=tree->_radius_sq)
+            {
+                if (flag_centers) return 1;
+                flags[data_point._index]=1;
+            }
+        }
+    }
+    else
+    {
+        int dim = node->_cut_dim;
+
+        if (center[dim]-tree->_radius<=node->_cut_value &&
+            KDTree_flag_center(tree, node->_left, center, flags, flag_centers))
+            return 1;
+        if (center[dim]+tree->_radius>=node->_cut_value &&
+            KDTree_flag_center(tree, node->_right, center, flags, flag_centers))
+            return 1;
+    }
+    return 0;
+}
+
+int KDTree_search_centers(struct KDTree* tree, float *coords, long int nr_centers, float radius, char *flags, int flag_centers)
+{
+    long int i;
+
+    if (tree->_radius_list)
+    {
+        free(tree->_radius_list);
+        tree->_radius_list = NULL;
+    }
+    tree->_count=0;
+
+    tree->_radius=radius;
+    /* use of r^2 to avoid sqrt use */
+    tree->_radius_sq=radius*radius;
+
+    if (tree->_root==NULL) return 1;
+
+    /* points found around any center are flagged, or centers are flagged
+     * when any point is found around them */
+    for (i=0; i<nr_centers; i++)
+    {
+        int found;
+
+        found=KDTree_flag_center(tree, tree->_root, coords+i*tree->dim, flags,
+                                 flag_centers);
+        if (flag_centers) flags[i]=found;
+    }
+    return 1;
+}
+
 void KDTree_copy_indices(struct KDTree* tree, long *indices)
 {
     long int i;
@@ -726,16 +803,23 @@ static int KDTree_test_neighbors(struct KDTree* tree, struct DataPoint* p1, stru
     {
         /* we found a neighbor pair! */
         struct Neighbor* p;
-        int n;
+        long int n;
         n = tree->_neighbor_count;
-        p = realloc(tree->_neighbor_list, (n+1)*sizeof(struct Neighbor));
-        if (p==NULL) return 0;
+        if (n==tree->_neighbor_list_size)
+        {
+            /* grow the list geometrically to avoid a copy per pair */
+            long int size = n ? 2*n : 1024;
+            p = realloc(tree->_neighbor_list, size*sizeof(struct Neighbor));
+            if (p==NULL) return 0;
+            tree->_neighbor_list = p;
+            tree->_neighbor_list_size = size;
+        }
+        p = tree->_neighbor_list;
 
         p[n].index1 = p1->_index;
         p[n].index2 = p2->_index;
         /* note sqrt */
         p[n].radius = sqrt(r);
-        tree->_neighbor_list = p;
         tree->_neighbor_count++;
     }
 
@@ -1049,10 +1133,8 @@ static int KDTree__neighbor_search(struct KDTree* tree, struct Node *node, struc
 }
 
 int
-KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius,
-                       struct Neighbor** neighbors)
+KDTree_neighbor_find(struct KDTree* tree, float neighbor_radius)
 {
-    long int i;
     int ok;
     Region_dim=tree->dim;
 
@@ -1061,6 +1143,7 @@ KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius,
         free(tree->_neighbor_list);
         tree->_neighbor_list = NULL;
     }
+    tree->_neighbor_list_size=0;
     tree->_neighbor_count=0;
     /* note the use of r^2 to avoid use of sqrt */
     tree->_neighbor_radius=neighbor_radius;
@@ -1082,7 +1165,37 @@ KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius,
         ok = KDTree__neighbor_search(tree, tree->_root, region, 0);
         Region_destroy(region);
     }
-    if (!ok) return 0;
+    return ok;
+}
+
+void KDTree_copy_neighbor_indices(struct KDTree* tree, long *indices)
+{
+    long int i;
+
+    for(i=0; i<tree->_neighbor_count; i++)
+    {
+        indices[2*i]=tree->_neighbor_list[i].index1;
+        indices[2*i+1]=tree->_neighbor_list[i].index2;
+    }
+}
+
+void KDTree_copy_neighbor_radii(struct KDTree* tree, float *radii)
+{
+    long int i;
+
+    for(i=0; i<tree->_neighbor_count; i++)
+    {
+        radii[i]=tree->_neighbor_list[i].radius;
+    }
+}
+
+int
+KDTree_neighbor_search(struct KDTree* tree, float neighbor_radius,
+                       struct Neighbor** neighbors)
+{
+    long int i;
+
+    if (!KDTree_neighbor_find(tree, neighbor_radius)) return 0;
 
     *neighbors = NULL;
     for (i = 0; i < tree->_neighbor_count; i++)
@@ -1124,6 +1237,7 @@ KDTree_neighbor_simple_search(struct KDTree* tree, float radius,
         free(tree->_neighbor_list);
         tree->_neighbor_list = NULL;
     }
+    tree->_neighbor_list_size=0;
 
     DataPoint_sort(tree->_data_point_list, tree->_data_point_list_size, 0);
 
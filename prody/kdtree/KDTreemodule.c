@@ -514,6 +514,208 @@ PyTree_neighbor_simple_search(PyTree* self, PyObject* args)
     return list;
 }
 
+static char PyTree_neighbor_find__doc__[] =
+"finds all pairs of points within radius of each other and returns the\n"
+"number of pairs, which are retrieved using neighbor_get_indices and\n"
+"neighbor_get_radii without creating a Neighbor object for each pair\n";
+
+static PyObject*
+PyTree_neighbor_find(PyTree* self, PyObject* args)
+{
+    double radius;
+    struct KDTree* tree = self->tree;
+
+    if(!PyArg_ParseTuple(args, "d:KDTree_neighbor_find", &radius))
+        return NULL;
+
+    if(radius <= 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "Radius must be positive.");
+        return NULL;
+    }
+
+    if (!KDTree_neighbor_find(tree, radius))
+    {
+        PyErr_SetString(PyExc_MemoryError,
+            "calculation failed due to lack of memory");
+        return NULL;
+    }
+
+#if PY_MAJOR_VERSION >= 3
+    return PyLong_FromLong(KDTree_neighbor_get_count(tree));
+#else
+    return PyInt_FromLong(KDTree_neighbor_get_count(tree));
+#endif
+}
+
+static char PyTree_neighbor_get_indices__doc__[] =
+"copies indices of neighbor pairs into a Numpy array with shape (n, 2)\n";
+
+static PyObject *PyTree_neighbor_get_indices(PyTree *self, PyObject* args)
+{
+    struct KDTree* tree = self->tree;
+    const int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT;
+    char datatype;
+    Py_buffer view;
+    PyObject* object;
+
+    if (!PyArg_ParseTuple(args, "O:KDTree_neighbor_get_indices", &object))
+        return NULL;
+    if (PyObject_GetBuffer(object, &view, flags) == -1)
+        return NULL;
+    datatype = view.format[0];
+    switch (datatype) {
+        case '@':
+        case '=':
+        case '<':
+        case '>':
+        case '!': datatype = view.format[1]; break;
+        default: break;
+    }
+    if (datatype != 'l') {
+        PyErr_Format(PyExc_RuntimeError,
+            "array has incorrect data format ('%c', expected 'l')", datatype);
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    else if (view.len < 2 * KDTree_neighbor_get_count(tree) * view.itemsize) {
+        PyErr_SetString(PyExc_ValueError, "array is too small");
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    /* copy the data into the Numpy data pointer */
+    KDTree_copy_neighbor_indices(tree, (long int *) view.buf);
+    PyBuffer_Release(&view);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static char PyTree_neighbor_get_radii__doc__[] =
+"copies distances between neighbor pairs into a Numpy array\n";
+
+static PyObject *PyTree_neighbor_get_radii(PyTree *self, PyObject* args)
+{
+    struct KDTree* tree = self->tree;
+    const int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT;
+    char datatype;
+    Py_buffer view;
+    PyObject* object;
+
+    if (!PyArg_ParseTuple(args, "O:KDTree_neighbor_get_radii", &object))
+        return NULL;
+    if (PyObject_GetBuffer(object, &view, flags) == -1)
+        return NULL;
+    datatype = view.format[0];
+    switch (datatype) {
+        case '@':
+        case '=':
+        case '<':
+        case '>':
+        case '!': datatype = view.format[1]; break;
+        default: break;
+    }
+    if (datatype != 'f') {
+        PyErr_Format(PyExc_RuntimeError,
+            "array has incorrect data format ('%c', expected 'f')", datatype);
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    else if (view.len < KDTree_neighbor_get_count(tree) * view.itemsize) {
+        PyErr_SetString(PyExc_ValueError, "array is too small");
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    /* copy the data into the Numpy data pointer */
+    KDTree_copy_neighbor_radii(tree, (float *) view.buf);
+    PyBuffer_Release(&view);
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static char PyTree_search_centers__doc__[] =
+"flags points within radius of any of the centers, given as a float array\n"
+"with shape (n, dim), in a boolean array with an entry for each point, or\n"
+"when the last argument is true, flags centers with any point within radius\n"
+"in a boolean array with an entry for each center\n";
+
+static PyObject *PyTree_search_centers(PyTree *self, PyObject* args)
+{
+    struct KDTree* tree = self->tree;
+    const int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT;
+    char datatype;
+    double radius;
+    int ok;
+    int flag_centers = 0;
+    Py_buffer view, flags_view;
+    PyObject *object, *flags_object;
+
+    if (!PyArg_ParseTuple(args, "OdO|i:KDTree_search_centers", &object,
+                          &radius, &flags_object, &flag_centers))
+        return NULL;
+
+    if(radius <= 0)
+    {
+        PyErr_SetString(PyExc_ValueError, "Radius must be positive.");
+        return NULL;
+    }
+
+    if (PyObject_GetBuffer(object, &view, flags) == -1)
+        return NULL;
+    datatype = view.format[0];
+    switch (datatype) {
+        case '@':
+        case '=':
+        case '<':
+        case '>':
+        case '!': datatype = view.format[1]; break;
+        default: break;
+    }
+    if (datatype != 'f') {
+        PyErr_Format(PyExc_RuntimeError,
+            "array has incorrect data format ('%c', expected 'f')", datatype);
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    else if (view.ndim != 2 || view.shape[1] != KDTree_get_dim(tree)) {
+        PyErr_SetString(PyExc_ValueError,
+            "array must have shape (n, dim)");
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+
+    if (PyObject_GetBuffer(flags_object, &flags_view, flags) == -1)
+    {
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+    if (flags_view.itemsize != 1) {
+        PyErr_SetString(PyExc_RuntimeError,
+            "flags array must have a single byte per item");
+        goto exit;
+    }
+    else if (flags_view.len < (flag_centers ? view.shape[0] :
+                               KDTree_get_nr_points(tree))) {
+        PyErr_SetString(PyExc_ValueError, "flags array is too small");
+        goto exit;
+    }
+
+    ok = KDTree_search_centers(tree, (float *) view.buf, view.shape[0],
+                               radius, (char *) flags_view.buf, flag_centers);
+    if (!ok) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    PyBuffer_Release(&flags_view);
+    PyBuffer_Release(&view);
+    Py_INCREF(Py_None);
+    return Py_None;
+
+exit:
+    PyBuffer_Release(&flags_view);
+    PyBuffer_Release(&view);
+    return NULL;
+}
+
 static char PyTree_get_indices__doc__[] =
 "returns indices of coordinates within radius as a Numpy array\n";
 
@@ -607,6 +809,10 @@ static PyMethodDef PyTree_methods[] = {
     {"neighbor_get_count", (PyCFunction)PyTree_neighbor_get_count, METH_NOARGS, NULL},
     {"neighbor_search", (PyCFunction)PyTree_neighbor_search, METH_VARARGS, NULL},
     {"neighbor_simple_search", (PyCFunction)PyTree_neighbor_simple_search, METH_VARARGS, NULL},
+    {"neighbor_find", (PyCFunction)PyTree_neighbor_find, METH_VARARGS, PyTree_neighbor_find__doc__},
+    {"neighbor_get_indices", (PyCFunction)PyTree_neighbor_get_indices, METH_VARARGS, PyTree_neighbor_get_indices__doc__},
+    {"neighbor_get_radii", (PyCFunction)PyTree_neighbor_get_radii, METH_VARARGS, PyTree_neighbor_get_radii__doc__},
+    {"search_centers", (PyCFunction)PyTree_search_centers, METH_VARARGS, PyTree_search_centers__doc__},
     {"get_indices", (PyCFunction)PyTree_get_indices, METH_VARARGS, PyTree_get_indices__doc__},
     {"get_radii", (PyCFunction)PyTree_get_radii, METH_VARARGS, PyTree_get_radii__doc__},
     {NULL}  /* Sentinel */
@@ -2,7 +2,8 @@
 """This module defines :class:`KDTree` class for dealing with atomic coordinate
 sets and handling periodic boundary conditions."""
 
-from numpy import array, ndarray, concatenate, empty
+from numpy import array, ndarray, concatenate, empty, zeros, newaxis
+from numpy import ascontiguousarray
 
 from prody import LOGGER
 
@@ -136,6 +137,7 @@ class KDTree(object):
         self._coords = None
         self._unitcell = None
         self._neighbors = None
+        self._n_points = coords.shape[0]
         if unitcell is None:
             self._kdtree = CKDTree(3, self._bucketsize)
             self._kdtree.set_data(coords)
@@ -215,7 +217,7 @@ class KDTree(object):
 
         else:
             if self._unitcell is None:
-                self._neighbors = self._kdtree.neighbor_search(radius)
+                self._neighbors = get_KDTree_neighbors(self._kdtree, radius)
             else:
                 kdtree = self._kdtree2
                 if kdtree is None:
@@ -243,6 +245,62 @@ class KDTree(object):
                 self._pdbkeys = list(_dict)
 
 
+    def getWithin(self, radius, centers, flag='points'):
+        """Returns a boolean array with **True** values for points that are
+        within *radius* of any of the *centers*, or for *centers* that have
+        any point within *radius* when *flag* is ``'centers'``.  All centers
+        are searched in a single call to the C module, when it supports it,
+        and points are flagged rather than listed for each center.
+
+        :arg radius: distance (Å)
+        :type radius: float
+
+        :arg centers: coordinates of centers with shape ``(n_centers, 3)``
+        :type centers: :class:`numpy.ndarray`
+
+        :arg flag: ``'points'`` (default) or ``'centers'``, searching centers
+            stops at the first point found, so it is preferable when there
+            are fewer centers than points
+        :type flag: str"""
+
+        if not isinstance(radius, (float, int)):
+            raise TypeError('radius must be a number')
+        if radius <= 0:
+            raise TypeError('radius must be a positive number')
+        if not isinstance(centers, ndarray):
+            raise TypeError('centers must be a Numpy array instance')
+        if centers.ndim != 2 or centers.shape[1] != 3:
+            raise ValueError('centers.shape must be (n_centers, 3)')
+        if flag not in ('points', 'centers'):
+            raise ValueError('flag must be points or centers')
+        flag_centers = flag == 'centers'
+
+        n_centers = len(centers)
+        if self._unitcell is not None:
+            # images of centers are searched, as for a single center
+            centers = (centers[:, newaxis] + self._replicate).reshape((-1, 3))
+        centers = ascontiguousarray(centers, 'f')
+        flags = zeros(len(centers) if flag_centers else self._n_points, bool)
+        try:
+            search = self._kdtree.search_centers
+        except AttributeError:
+            kdtree = self._kdtree
+            for i, center in enumerate(centers):
+                kdtree.search_center_radius(center, radius)
+                if kdtree.get_count():
+                    if flag_centers:
+                        flags[i] = True
+                    else:
+                        flags[get_KDTree_indices(kdtree)] = True
+        else:
+            search(centers, radius, flags, flag_centers)
+        self._neighbors = None
+        if self._unitcell is not None:
+            self._pbcdict = {}
+            if flag_centers:
+                flags = flags.reshape((n_centers, -1)).any(1)
+        return flags
+
     def getIndices(self):
         """Returns array of indices for points or pairs, depending on the type
         of the most recent search."""
@@ -252,8 +310,7 @@ class KDTree(object):
                 if self._neighbors is None:
                     return get_KDTree_indices(self._kdtree)
                 else:
-                    return array([(n.index1, n.index2)
-                                  for n in self._neighbors], int)
+                    return self._neighbors[0]
             else:
                 return array(self._pdbkeys)
         return self._none()
@@ -266,7 +323,7 @@ class KDTree(object):
                 if self._neighbors is None:
                     return get_KDTree_radii(self._kdtree)
                 else:
-                    return array([n.radius for n in self._neighbors])
+                    return self._neighbors[1]
             else:
                 _dict = self._pbcdict
                 return array([_dict[i] for i in self._pdbkeys])
@@ -304,3 +361,23 @@ def get_KDTree_radii(kdtree):
             radii = empty(n, 'f')
             kdtree.get_radii(radii)
     return radii
+
+def get_KDTree_neighbors(kdtree, radius):
+    """Returns indices and distances of pairs within *radius* as arrays.
+    Pairs are copied from the C module in bulk when it supports it, rather
+    than creating a neighbor object for each pair."""
+
+    try:
+        n = kdtree.neighbor_find(radius)
+    except AttributeError:
+        neighbors = kdtree.neighbor_search(radius)
+        indices = array([(nb.index1, nb.index2) for nb in neighbors], int)
+        radii = array([nb.radius for nb in neighbors])
+    else:
+        indices = empty((n, 2), int)
+        radii = empty(n, 'f')
+        if n:
+            kdtree.neighbor_get_indices(indices)
+            kdtree.neighbor_get_radii(radii)
+        radii = radii.astype(float)
+    return indices, radii
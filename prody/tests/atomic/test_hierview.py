@@ -2,7 +2,7 @@
 
 from prody.tests import TestCase
 
-from numpy import arange
+from numpy import arange, array
 from numpy.random import shuffle
 
 from prody import *
@@ -45,4 +45,43 @@ class TestTerRecord(TestCase):
 
     def testSelectionResidueIndexing2(self):
 
-        self.assertEqual(len(RTER[20:].getHierView()['A', 866]), 3)
\ No newline at end of file
+        self.assertEqual(len(RTER[20:].getHierView()['A', 866]), 3)
+
+class TestSegments(TestCase):
+
+    def setUp(self):
+
+        self.ag = AG.copy()
+        n_atoms = self.ag.numAtoms()
+        self.segnames = array(['A', 'B', 'A', 'C'])[arange(n_atoms) * 4 //
+                                                     n_atoms]
+        self.ag.setSegnames(self.segnames)
+
+    def testSegments(self):
+
+        hv = self.ag.getHierView()
+        self.assertEqual(hv.numSegments(), 3)
+        for segment in hv.iterSegments():
+            self.assertTrue((self.segnames[segment.getIndices()] ==
+                             segment.getSegname()).all())
+        self.assertEqual(hv['A'].numAtoms(),
+                         (self.segnames == 'A').sum())
+
+    def testChains(self):
+
+        hv = self.ag.getHierView()
+        for chain in hv.iterChains():
+            indices = chain.getIndices()
+            self.assertEqual(len(set(self.segnames[indices])), 1)
+            self.assertEqual(len(set(self.ag.getChids()[indices])), 1)
+        self.assertEqual(sum(chain.numAtoms() for chain in hv),
+                         self.ag.numAtoms())
+
+    def testSelection(self):
+
+        selection = self.ag.select('name CA and not resnum 10 to 20')
+        hv = selection.getHierView()
+        self.assertEqual(sum(residue.numAtoms()
+                             for residue in hv.iterResidues()),
+                         selection.numAtoms())
+        self.assertEqual(hv.numSegments(), 3)
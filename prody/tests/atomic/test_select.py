@@ -538,6 +538,143 @@ for name, macro in MACROS:
 del func
 
 
+class TestCompiledSelection(unittest.TestCase):
+
+    """Test compiled selections and the selection cache."""
+
+    def testSelect(self):
+
+        for selstr in ['protein and name CA', 'within 5 of resnum 10 to 20',
+                       'sqrt(sq(x) + sq(y)) < 20 or not backbone',
+                       'resnum 1:10 and name "C.*"']:
+            compiled = compileSelection(selstr)
+            expected = SELECT.getBoolArray(pdb3mht, selstr)
+            assert_equal(compiled.getBoolArray(pdb3mht), expected)
+            assert_equal(compiled.getBoolArray(pdb3mht.ca),
+                         SELECT.getBoolArray(pdb3mht.ca, selstr))
+            assert_equal(pdb3mht.select(compiled).getIndices(),
+                         expected.nonzero()[0])
+            self.assertEqual(compiled.select(pdb3mht).getSelstr(), selstr)
+
+    def testPickle(self):
+
+        import pickle
+        compiled = compileSelection('protein and name CA')
+        copy = pickle.loads(pickle.dumps(compiled))
+        self.assertIsInstance(copy, CompiledSelection)
+        assert_equal(copy.getIndices(pdb3mht), compiled.getIndices(pdb3mht))
+
+    def testMacros(self):
+
+        selstr = 'cachedmacro and name CA'
+        prody.defSelectionMacro('cachedmacro', 'resname ALA')
+        alanine = SELECT.getIndices(pdb3mht, selstr)
+        prody.defSelectionMacro('cachedmacro', 'resname GLY')
+        glycine = SELECT.getIndices(pdb3mht, selstr)
+        prody.delSelectionMacro('cachedmacro')
+        assert_equal(alanine, SELECT.getIndices(pdb3mht,
+                                                'resname ALA and name CA'))
+        assert_equal(glycine, SELECT.getIndices(pdb3mht,
+                                                'resname GLY and name CA'))
+
+    def testCacheSize(self):
+
+        from prody.atomic import select
+        for i in range(select.SELECTION_CACHE_SIZE + 10):
+            SELECT.getIndices(pdb3mht, 'index {0} and protein'.format(i))
+        self.assertEqual(len(select.SELECTION_CACHE),
+                         select.SELECTION_CACHE_SIZE)
+
+
+class TestSelectMany(unittest.TestCase):
+
+    """Test making multiple selections with shared sub-expressions."""
+
+    def setUp(self):
+
+        self.selstrs = ['protein and chain A and within 4 of resnum 10',
+                        'protein and chain A and within 4 of resnum 20',
+                        'name CA and not within 4 of resnum 10',
+                        'water and same residue as within 4 of resnum 10',
+                        'resname HOH and name CA', 'protein']
+
+    def testList(self):
+
+        for atoms in [pdb3mht, pdb3mht.protein]:
+            torfs = SELECT.getBoolArrays(atoms, self.selstrs)
+            for selstr, torf in zip(self.selstrs, torfs):
+                assert_equal(torf, SELECT.getBoolArray(atoms, selstr))
+
+    def testDict(self):
+
+        selstrs = dict(enumerate(self.selstrs))
+        selections = pdb3mht.selectMany(selstrs)
+        self.assertEqual(set(selections), set(selstrs))
+        for key, selstr in selstrs.items():
+            expected = pdb3mht.select(selstr)
+            if expected is None:
+                self.assertIsNone(selections[key])
+            else:
+                self.assertEqual(selections[key], expected)
+                self.assertEqual(selections[key].getSelstr(),
+                                 expected.getSelstr())
+
+    def testKeywords(self):
+
+        selstrs = ['within 5 of center', 'protein and within 5 of center']
+        center = calcCenter(pdb3mht)
+        selections = pdb3mht.selectMany(selstrs, center=center)
+        for selstr, selection in zip(selstrs, selections):
+            self.assertEqual(selection.getSelstr(),
+                             pdb3mht.select(selstr, center=center).getSelstr())
+
+
+class TestBitArray(unittest.TestCase):
+
+    """Test evaluating selections for multiple frames."""
+
+    def setUp(self):
+
+        self.ag = parseDatafile('multi_model_truncated')
+        self.selstrs = ['within 5 of resnum 1 to 3',
+                        'not within 5 of resnum 1 to 3 and name CA',
+                        'x < 5 and protein', 'name CA C',
+                        'same residue as exwithin 4 of (resnum 5 and noh)']
+
+    def _getExpected(self, atoms, selstr):
+
+        torfs = []
+        for i in range(atoms.numCoordsets()):
+            atoms.setACSIndex(i)
+            torfs.append(SELECT.getBoolArray(atoms, selstr))
+        atoms.setACSIndex(0)
+        return np.array(torfs)
+
+    def testCoordsets(self):
+
+        for atoms in [self.ag, self.ag.select('noh')]:
+            n_atoms = atoms.numAtoms()
+            for selstr in self.selstrs:
+                bits = SELECT.getBitArray(atoms, selstr)
+                self.assertEqual(bits.shape, (3, (n_atoms + 7) // 8))
+                assert_equal(np.unpackbits(bits, axis=1)[:, :n_atoms],
+                             self._getExpected(atoms, selstr))
+
+    def testFrames(self):
+
+        selstr = self.selstrs[-1]
+        expected = SELECT.getBitArray(self.ag, selstr)
+        assert_equal(SELECT.getBitArray(self.ag, selstr,
+                                        self.ag.getCoordsets()), expected)
+        assert_equal(SELECT.getBitArray(self.ag, selstr, [2]), expected[2:])
+        dcd = DCDFile(pathDatafile('dcd'))
+        dcd.next()
+        assert_equal(SELECT.getBitArray(self.ag, selstr, dcd),
+                     SELECT.getBitArray(self.ag, selstr, dcd.getCoordsets()))
+        self.assertEqual(dcd.nextIndex(), 1)
+        dcd.close()
+
+
 def testGetBoolArray():
 
     ca = pdb3mht.ca
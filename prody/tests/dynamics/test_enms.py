@@ -1,5 +1,7 @@
 """This module contains unit tests for :mod:`~prody.dynamics`."""
 
+import os
+
 import numpy as np
 from numpy import arange
 from numpy.testing import *
@@ -7,7 +9,7 @@ import numpy.testing.decorators as dec
 
 from prody import *
 from prody import LOGGER
-from prody.tests import unittest
+from prody.tests import unittest, TEMPDIR
 from prody.tests.datafiles import *
 
 LOGGER.verbosity = 'none'
@@ -181,6 +183,12 @@ class TestGNMResults(testGNMBase):
         assert_equal(slow._getKirchhoff(), gnm._getKirchhoff(),
                      'slow method does not reproduce same Kirchhoff')
 
+    def testBuildKirchhoffSparse(self):
+        sparse = GNM()
+        sparse.buildKirchhoff(ATOMS, sparse=True)
+        assert_equal(sparse._getKirchhoff().toarray(), gnm._getKirchhoff(),
+                     'sparse method does not reproduce same Kirchhoff')
+
     def testCommuteTime(self):
         gnm = GNM()
         gnm.buildKirchhoff(ATOMS)
@@ -288,7 +296,402 @@ class TestANM(TestGNM):
                         err_msg='slow method does not reproduce same Hessian')
         assert_equal(slow._getKirchhoff(), anm._getKirchhoff(),
                      'slow method does not reproduce same Kirchhoff')
-    
+
+    def testBuildHessianKDTree(self):
+        kdtree = ANM()
+        kdtree.buildHessian(ATOMS, kdtree=True)
+        assert_allclose(kdtree._getHessian(), anm._getHessian(),
+                        rtol=0, atol=ATOL,
+                        err_msg='KDTree method does not reproduce same Hessian')
+        assert_equal(kdtree._getKirchhoff(), anm._getKirchhoff(),
+                     'KDTree method does not reproduce same Kirchhoff')
+
+    def testBuildHessianSparse(self):
+        sparse = ANM()
+        sparse.buildHessian(ATOMS, sparse=True)
+        assert_allclose(sparse._getHessian().toarray(), ANM_HESSIAN,
+                        rtol=0, atol=ATOL,
+                        err_msg='failed to get correct sparse Hessian matrix')
+        assert_equal(sparse._getKirchhoff().toarray(), anm._getKirchhoff(),
+                     'sparse method does not reproduce same Kirchhoff')
+
+    def testBuildHessianGamma(self):
+        gamma = GammaVariableCutoff(ATOMS.getNames(), default_radius=6.)
+        func = lambda dist2, i, j: gamma.gamma(dist2, i, j)
+        dense = ANM()
+        dense.buildHessian(ATOMS, gamma=gamma)
+        sparse = ANM()
+        sparse.buildHessian(ATOMS, gamma=func, sparse=True, kdtree=True)
+        assert_allclose(sparse._getHessian().toarray(), dense._getHessian(),
+                        rtol=0, atol=ATOL,
+                        err_msg='gamma function does not reproduce same '
+                                'Hessian')
+
+
+class TestGamma(unittest.TestCase):
+
+    def setUp(self):
+
+        self.atoms = parseDatafile('1ubi', secondary=True).select('calpha')
+        kirchhoff = gnm._getKirchhoff()
+        self.i, self.j = np.nonzero(np.triu(kirchhoff, 1))
+        i2j = COORDS[self.j] - COORDS[self.i]
+        self.dist2 = (i2j ** 2).sum(1)
+
+    def _testGammas(self, gamma):
+
+        expected = [gamma.gamma(dist2, i, j)
+                    for dist2, i, j in zip(self.dist2, self.i, self.j)]
+        assert_equal(gamma.gammas(self.dist2, self.i, self.j), expected,
+                     'gammas does not reproduce gamma for all pairs')
+
+    def testStructureBased(self):
+
+        self._testGammas(GammaStructureBased(self.atoms))
+
+    def testVariableCutoff(self):
+
+        self._testGammas(GammaVariableCutoff(ATOMS.getNames(),
+                                             default_radius=3.))
+
+    def testBuildKirchhoffGamma(self):
+
+        gamma = GammaStructureBased(self.atoms)
+        func = lambda dist2, i, j: gamma.gamma(dist2, i, j)
+        batched = GNM()
+        batched.buildKirchhoff(COORDS, gamma=gamma)
+        called = GNM()
+        called.buildKirchhoff(COORDS, gamma=func, sparse=True)
+        assert_equal(called._getKirchhoff().toarray(),
+                     batched._getKirchhoff(),
+                     'gamma function does not reproduce same Kirchhoff')
+
+
+class TestIterativeSolvers(unittest.TestCase):
+
+    """Test iterative eigensolvers against dense diagonalization."""
+
+    def _testModes(self, enm, n_modes, evalues, evectors):
+
+        assert_allclose(enm.getEigvals(), evalues[:n_modes],
+                        rtol=1e-6, atol=ATOL,
+                        err_msg='failed to get correct eigenvalues')
+        _temp = np.abs((enm.getEigvecs() * evectors[:, :n_modes]).sum(0))
+        assert_allclose(_temp, np.ones(n_modes), rtol=0, atol=1e-4,
+                        err_msg='failed to get correct eigenvectors')
+
+    def testANMLanczos(self):
+
+        for sparse in (False, True):
+            enm = ANM()
+            enm.buildHessian(COORDS, sparse=sparse)
+            info = {}
+            enm.calcModes(10, solver='lanczos', info=info)
+            self._testModes(enm, 10, anm[6:].getEigvals(),
+                            anm[6:].getEigvecs())
+            self.assertTrue(info['converged'])
+            self.assertEqual(info['n_deflated'], 6)
+
+    def testANMLOBPCG(self):
+
+        enm = ANM()
+        enm.buildHessian(COORDS, sparse=True)
+        enm.calcModes(5, solver='lobpcg', tol=1e-8, maxiter=2000)
+        self._testModes(enm, 5, anm[6:].getEigvals(), anm[6:].getEigvecs())
+
+    def testGNMLanczos(self):
+
+        enm = GNM()
+        enm.buildKirchhoff(COORDS, sparse=True)
+        enm.calcModes(10, solver='lanczos')
+        self._testModes(enm, 10, gnm[1:].getEigvals(), gnm[1:].getEigvecs())
+
+    def testZeros(self):
+
+        enm = ANM()
+        enm.buildHessian(COORDS, sparse=True)
+        enm.calcModes(10, zeros=True, solver='lanczos')
+        self.assertEqual(enm.numModes(), 10)
+        assert_allclose(enm.getEigvals()[:6], np.zeros(6), atol=ATOL)
+        assert_allclose(enm.getEigvals()[6:], anm[6:10].getEigvals(),
+                        rtol=1e-6, atol=ATOL)
+
+    def testRigidBodyModes(self):
+
+        from prody.dynamics.gnm import calcRigidBodyModes
+        hessian = anm.getHessian()
+        Z = calcRigidBodyModes(hessian, True, COORDS)
+        self.assertEqual(Z.shape, (len(COORDS) * 3, 6))
+        assert_allclose(np.dot(Z.T, Z), np.eye(6), rtol=0, atol=1e-10)
+        assert_allclose(np.dot(hessian, Z), np.zeros(Z.shape),
+                        rtol=0, atol=ATOL)
+        Z = calcRigidBodyModes(gnm.getKirchhoff())
+        self.assertEqual(Z.shape, (len(COORDS), 1))
+
+
+class TestOperator(unittest.TestCase):
+
+    """Test matrix-free Hessian and Kirchhoff operators."""
+
+    def testHessianProduct(self):
+
+        enm = ANM()
+        enm.buildHessian(COORDS, operator=True)
+        operator = enm.getHessian()
+        vectors = np.random.RandomState(0).rand(len(COORDS) * 3, 3)
+        assert_allclose(operator.dot(vectors), np.dot(ANM_HESSIAN, vectors),
+                        rtol=0, atol=ATOL)
+        assert_allclose(operator.diagonal(), np.diag(ANM_HESSIAN),
+                        rtol=0, atol=ATOL)
+
+    def testKirchhoffProduct(self):
+
+        enm = GNM()
+        enm.buildKirchhoff(COORDS, operator=True)
+        operator = enm.getKirchhoff()
+        vectors = np.random.RandomState(0).rand(len(COORDS), 3)
+        assert_allclose(operator.dot(vectors),
+                        np.dot(GNM_KIRCHHOFF, vectors), rtol=0, atol=ATOL)
+
+    def testCalcModes(self):
+
+        enm = ANM()
+        enm.buildHessian(COORDS, operator=True)
+        enm.calcModes(5)
+        assert_allclose(enm.getEigvals(), anm[6:11].getEigvals(),
+                        rtol=1e-6, atol=ATOL)
+        assert_allclose(calcSqFlucts(enm), calcSqFlucts(anm[6:11]),
+                        rtol=1e-4, atol=ATOL)
+        self.assertRaises(ValueError, enm.calcModes, None)
+
+
+class TestENMCache(unittest.TestCase):
+
+    """Test on-disk caching of ENM results."""
+
+    def setUp(self):
+
+        import tempfile
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        import shutil
+        shutil.rmtree(self.folder)
+
+    def testCalcANM(self):
+
+        anm1, sel = calcANM(ATOMS, cutoff=15., cache=self.folder)
+        self.assertEqual(len(os.listdir(self.folder)), 1)
+        anm2, _ = calcANM(ATOMS, cutoff=15., cache=self.folder)
+        self.assertIsNone(anm2.getHessian())
+        assert_equal(anm2.getEigvals(), anm1.getEigvals())
+        assert_equal(anm2.getEigvecs(), anm1.getEigvecs())
+        self.assertEqual(anm2.getTitle(), anm1.getTitle())
+        calcANM(ATOMS, cutoff=12., cache=self.folder)
+        self.assertEqual(len(os.listdir(self.folder)), 2)
+
+    def testCalcGNM(self):
+
+        gamma = GammaStructureBased(parseDatafile('1ubi', secondary=True)
+                                    .select('calpha'))
+        gnm1, _ = calcGNM(ATOMS, gamma=gamma, cache=self.folder)
+        gnm2, _ = calcGNM(ATOMS, gamma=gamma, cache=self.folder)
+        self.assertEqual(len(os.listdir(self.folder)), 1)
+        assert_equal(gnm2.getEigvals(), gnm1.getEigvals())
+        assert_equal(gnm2.getHinges(), gnm1.getHinges())
+        self.assertIsInstance(gnm2.getGamma(), GammaStructureBased)
+
+    def testEviction(self):
+
+        from prody.dynamics.enmcache import evictCachedModels
+        for cutoff in (10., 12., 14.):
+            calcENM(ATOMS, cutoff=cutoff, n_modes=5, cache=self.folder)
+        files = sorted(os.listdir(self.folder))
+        size = os.path.getsize(os.path.join(self.folder, files[0]))
+        evictCachedModels(self.folder, 2.5 * size / 1024. / 1024.)
+        self.assertEqual(len(os.listdir(self.folder)), 2)
+
+
+class TestCrossCorr(unittest.TestCase):
+
+    """Test blocked calculation of cross-correlations and distance
+    fluctuations."""
+
+    def _getExpected(self, modes, norm=True):
+
+        cov = calcCovariance(modes)
+        if modes.is3d():
+            n_atoms = modes.numAtoms()
+            cov = cov.reshape((n_atoms, 3, n_atoms, 3)).trace(axis1=1, axis2=3)
+        if norm:
+            diag = np.power(cov.diagonal(), 0.5)
+            cov = cov / np.outer(diag, diag)
+        return cov
+
+    def testBlocks(self):
+
+        for modes in (anm[6:26], gnm[1:21], anm[10]):
+            for norm in (True, False):
+                expected = self._getExpected(modes, norm)
+                for n_cpu in (1, 2):
+                    assert_allclose(calcCrossCorr(modes, n_cpu, norm,
+                                                  memory=0.01),
+                                    expected, rtol=0, atol=1e-12)
+
+    def testDistFlucts(self):
+
+        cc = self._getExpected(anm[6:26], False)
+        diag = np.diag(cc).reshape(-1, 1)
+        assert_allclose(calcDistFlucts(anm[6:26], norm=False, memory=0.01),
+                        diag + diag.T - 2 * cc, rtol=0, atol=1e-12)
+
+    def testMemmap(self):
+
+        import tempfile
+        n_atoms = gnm.numAtoms()
+        with tempfile.NamedTemporaryFile() as temp:
+            out = np.memmap(temp.name, float, 'w+', shape=(n_atoms, n_atoms))
+            result = calcCrossCorr(gnm[1:21], n_cpu=2, memory=0.01, out=out)
+            self.assertIs(result, out)
+            assert_allclose(np.asarray(out), self._getExpected(gnm[1:21]),
+                            rtol=0, atol=1e-12)
+        self.assertRaises(ValueError, calcCrossCorr, gnm, out=np.empty(3))
+
+
+class TestMechStiff(unittest.TestCase):
+
+    """Test mechanical stiffness for all pairs and pairs within a cutoff."""
+
+    def setUp(self):
+
+        self.modes = anm[6:]
+        self.stiffness = calcMechStiff(self.modes, COORDS)
+
+    def testStiffness(self):
+
+        eigvals = self.modes.getEigvals()
+        eigvecs = self.modes.getArray().T.reshape((len(eigvals), -1, 3))
+        for i, j in ((0, 1), (3, 40), (75, 12)):
+            r_ij = COORDS[j] - COORDS[i]
+            r_ij /= (r_ij ** 2).sum() ** 0.5
+            d_ij = np.abs(np.dot(eigvecs[:, j] - eigvecs[:, i], r_ij) /
+                          eigvals ** 0.5)
+            assert_allclose(self.stiffness[i, j],
+                            (eigvals * d_ij).sum() / d_ij.sum(), rtol=1e-10)
+            self.assertEqual(self.stiffness[i, j], self.stiffness[j, i])
+
+    def testThreads(self):
+
+        assert_allclose(calcMechStiff(self.modes, COORDS, n_cpu=2),
+                        self.stiffness, rtol=1e-12)
+
+    def testCutoff(self):
+
+        for n_cpu in (1, 2):
+            sparse = calcMechStiff(self.modes, COORDS, cutoff=10., n_cpu=n_cpu)
+            dist = buildDistMatrix(COORDS)
+            within = (dist <= 10.) & (dist > 0)
+            assert_allclose(sparse.toarray()[within], self.stiffness[within],
+                            rtol=1e-12)
+            assert_equal(sparse.toarray()[~within], 0)
+        self.assertEqual(calcStiffnessRange(sparse)[1],
+                         self.stiffness[within].max())
+
+    def testCutoffStatistics(self):
+
+        sparse = calcMechStiff(self.modes, COORDS, cutoff=10.)
+        dense = sparse.toarray()
+        for value in ('minK', 'maxK'):
+            mK, pair = calcStiffnessRangeSel(sparse, value)
+            self.assertEqual((mK, pair), calcStiffnessRangeSel(dense, value))
+            self.assertGreaterEqual(abs(pair[0] - pair[1]), 20)
+        for minAA in (0, 5):
+            for AA in ('all', [0, 30, 40, 70]):
+                count = calcMechStiffStatistic(sparse, [8, 12], minAA, AA)
+                self.assertEqual(count, calcMechStiffStatistic(dense, [8, 12],
+                                                               minAA, AA))
+        self.assertGreater(calcMechStiffStatistic(sparse, [8, 12]), 0)
+
+    def testCutoffVMD(self):
+
+        sparse = calcMechStiff(self.modes, COORDS, cutoff=10.)
+        for stiffness, name in ((sparse, 'sparse'), 
+                                (sparse.toarray(), 'dense')):
+            writeVMDstiffness(stiffness, ATOMS, [10, 20], [5, 10],
+                              filename=os.path.join(TEMPDIR, 'stiff_' + name))
+        with open(os.path.join(TEMPDIR, 'stiff_sparse.txt')) as inp:
+            lines = inp.readlines()
+        with open(os.path.join(TEMPDIR, 'stiff_dense.txt')) as inp:
+            self.assertEqual(lines, inp.readlines())
+        self.assertTrue(lines)
+
+
+class TestHitTime(unittest.TestCase):
+
+    """Test sparse calculation of hitting times."""
+
+    def setUp(self):
+
+        self.gnm = GNM()
+        self.gnm.buildKirchhoff(ATOMS)
+        self.expected = self.gnm.calcHitTime(method='K')
+
+    def testSparse(self):
+
+        assert_allclose(calcHitTimes(self.gnm._getKirchhoff()),
+                        self.expected, rtol=0, atol=1e-8)
+        sparse = GNM()
+        sparse.buildKirchhoff(ATOMS, sparse=True)
+        sparse.calcHitTime()
+        assert_allclose(sparse.getCommuteTime(),
+                        self.expected + self.expected.T, rtol=0, atol=1e-8)
+
+    def testNodes(self):
+
+        nodes = np.array([5, 0, 40])
+        assert_allclose(self.gnm.calcHitTime(nodes=nodes),
+                        self.expected[np.ix_(nodes, nodes)],
+                        rtol=0, atol=1e-8)
+        mask = np.zeros(self.gnm.numAtoms(), bool)
+        mask[nodes] = True
+        assert_allclose(calcHitTimes(self.gnm._getKirchhoff(), mask),
+                        self.expected[np.ix_(mask, mask)], rtol=0, atol=1e-8)
+
+    def testCG(self):
+
+        operator = GNM()
+        operator.buildKirchhoff(ATOMS, operator=True)
+        assert_allclose(operator.calcHitTime(solver='cg'), self.expected,
+                        rtol=1e-6, atol=0)
+
+    def testDisconnected(self):
+
+        # networks of 6 and 3 nodes, and an isolated node
+        random = np.random.RandomState(0)
+        components = ((0, 6), (6, 9), (9, 10))
+        affinity = np.zeros((10, 10))
+        for start, stop in components[:2]:
+            weights = np.triu(random.uniform(0.5, 2., (stop - start,) * 2), 1)
+            affinity[start:stop, start:stop] = weights + weights.T
+        degrees = affinity.sum(1)
+        kirchhoff = np.diag(degrees) - affinity
+
+        # hitting times of random walks from other nodes of the component
+        expected = np.full((10, 10), np.inf)
+        for start, stop in components:
+            for target in range(start, stop):
+                others = [k for k in range(start, stop) if k != target]
+                walk = (affinity[np.ix_(others, others)] /
+                        degrees[others, np.newaxis])
+                expected[target, others] = np.linalg.solve(
+                    np.eye(len(others)) - walk, np.ones(len(others)))
+                expected[target, target] = 0
+        assert_allclose(calcHitTimes(kirchhoff), expected, rtol=0, atol=1e-8)
+        nodes = np.array([7, 0, 9, 3])
+        assert_allclose(calcHitTimes(kirchhoff, nodes),
+                        expected[np.ix_(nodes, nodes)], rtol=0, atol=1e-8)
+
 
 class TestGNMCalcModes(unittest.TestCase):
 
@@ -314,5 +717,107 @@ class TestRTB(unittest.TestCase):
 
         rtb.calcModes()
 
+    def testSparse(self):
+
+        sparse = RTB()
+        sparse.buildHessian(ATOMS2, ATOMS2.getBetas().astype(int),
+                            sparse=True)
+        assert_allclose(RTB_HESSIAN, sparse._getHessian().toarray(),
+                        rtol=0, atol=ATOL,
+                        err_msg='expected sparse Hessian is not produced')
+        assert_allclose(RTB_PROJECT, sparse._getProjection().toarray(),
+                        rtol=0, atol=ATOL,
+                        err_msg='expected sparse projection is not produced')
+        sparse.calcModes(5)
+        dense = RTB()
+        dense.buildHessian(ATOMS2, ATOMS2.getBetas().astype(int))
+        dense.calcModes(5)
+        assert_allclose(dense.getEigvals(), sparse.getEigvals(), rtol=1e-5)
+        overlaps = np.abs((dense.getEigvecs() * sparse.getEigvecs()).sum(0))
+        assert_allclose(overlaps, np.ones(5), rtol=0, atol=1e-6)
+
+    def testSparseLinearBlock(self):
+
+        # the last block of 1ubi CA atoms, residues 75 and 76, is linear
+        ca = parseDatafile('1ubi').ca
+        blocks = ca.getResnums() // 5
+        sparse = RTB()
+        sparse.buildHessian(ca, blocks, sparse=True)
+        dense = RTB()
+        dense.buildHessian(ca, blocks)
+        self.assertEqual(sparse._getProjection().shape[1],
+                         dense._getProjection().shape[1] - 1)
+        sparse.calcModes(5)
+        dense.calcModes(5)
+        self.assertFalse(np.isnan(sparse.getEigvals()).any())
+        assert_allclose(dense.getEigvals(), sparse.getEigvals(), rtol=1e-5)
+        overlaps = np.abs((dense.getEigvecs() * sparse.getEigvecs()).sum(0))
+        assert_allclose(overlaps, np.ones(5), rtol=0, atol=1e-6)
+
+
+class TestExANM(unittest.TestCase):
+
+    """Test explicit membrane ANM against dense calculations."""
+
+    def setUp(self):
+
+        from prody.dynamics import exanm
+        self.module = exanm
+        self.params = dict(R=25., membrane_low=-10., membrane_high=10.)
+        self.atoms = parseDatafile('1ubi').ca
+
+    def testHessian(self):
+
+        model = exANM()
+        model.buildHessian(self.atoms, cutoff=15., **self.params)
+        anm = ANM()
+        anm.buildHessian(model.getCombined(), cutoff=15.)
+        hessian = anm.getHessian()
+        n = self.atoms.numAtoms() * 3
+        ss, so = hessian[:n, :n], hessian[:n, n:]
+        os_, oo = hessian[n:, :n], hessian[n:, n:]
+        self.assertGreater(len(oo), 0)
+        assert_allclose(model.getHessian(),
+                        ss - np.dot(so, np.dot(np.linalg.inv(oo), os_)),
+                        rtol=0, atol=1e-8)
+
+    def testLatticeCache(self):
+
+        lattices = self.module.MEMBRANE_LATTICES
+        lattices.clear()
+        first = exANM()
+        first.buildMembrane(self.atoms.copy(), **self.params)
+        self.assertEqual(len(lattices), 1)
+        cached = list(lattices.values())[0]
+        self.assertFalse(cached.flags.writeable)
+        second = exANM()
+        second.buildMembrane(self.atoms.copy(), **self.params)
+        self.assertEqual(len(lattices), 1)
+        self.assertIs(list(lattices.values())[0], cached)
+
+        membrane = second.getMembrane()._getCoords()
+        assert_equal(membrane, first.getMembrane().getCoords())
+        self.assertFalse(np.shares_memory(membrane, cached))
+        expected = cached.copy()
+        membrane += 1.
+        assert_equal(cached, expected)
+
+    def testClashes(self):
+
+        from scipy.spatial import ConvexHull
+        coords = self.atoms.getCoords()
+        coords -= coords.mean(0)
+        nodes = self.module.buildLattice('FCC', 25., 0., 3.1, -10., 10.)
+        dist = np.sqrt(((nodes[:, np.newaxis] - coords) ** 2).sum(2))
+        near = (dist < 5.).any(1)
+        assert_equal(self.module.checkClashes(nodes, coords, 5.), ~near)
+
+        hull = ConvexHull(coords)
+        eqs = hull.equations
+        inside = (np.dot(nodes, eqs[:, :-1].T) + eqs[:, -1] <= 0).all(1)
+        self.assertTrue(inside.any())
+        assert_equal(self.module.checkClashes(nodes, hull, 5.),
+                     ~(near | inside))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,61 @@
+"""This module contains unit tests for :mod:`~prody.dynamics.entropy`."""
+
+import numpy as np
+from numpy.testing import *
+
+from prody import *
+from prody import LOGGER
+from prody.tests import unittest
+from prody.tests.datafiles import *
+
+LOGGER.verbosity = 'none'
+
+ATOMS = parseDatafile('1ubi_ca')
+GNM_MODEL = GNM()
+GNM_MODEL.buildKirchhoff(ATOMS)
+GNM_MODEL.calcModes(10)
+
+PAIRS = [(0, 1), (1, 0), (3, 40), (40, 3), (72, 73), (75, 20)]
+
+
+class TestEntropyTransfer(unittest.TestCase):
+
+    def testAllPairs(self):
+
+        for tau in (1e-6, 0.5, 5.):
+            matrix = calcAllEntropyTransfer(GNM_MODEL, tau, memory=0.01)
+            for i, j in PAIRS:
+                assert_allclose(matrix[i, j],
+                                calcEntropyTransfer(GNM_MODEL, i, j, tau),
+                                rtol=1e-6, atol=1e-8)
+            assert_equal(np.diag(matrix), np.zeros(GNM_MODEL.numAtoms()))
+
+    def testTaus(self):
+
+        taus = [0.1, 1., 2.]
+        matrices = calcAllEntropyTransfer(GNM_MODEL, taus)
+        self.assertEqual(matrices.shape, (3,) + (GNM_MODEL.numAtoms(),) * 2)
+        for tau, matrix in zip(taus, matrices):
+            assert_allclose(matrix, calcAllEntropyTransfer(GNM_MODEL, tau),
+                            rtol=1e-8, atol=1e-9)
+        net = calcNetEntropyTransfer(matrices)
+        assert_allclose(net[1], matrices[1] - matrices[1].T)
+
+    def testOverall(self):
+
+        taus = np.insert(np.arange(0.1, 5.0 + 1e-6, 0.1), 0, 1e-6)
+        expected = np.trapz(calcAllEntropyTransfer(GNM_MODEL, taus), taus,
+                            axis=0)
+        assert_allclose(calcOverallNetEntropyTransfer(GNM_MODEL, memory=0.1),
+                        expected, rtol=1e-8, atol=1e-9)
+
+    def testANM(self):
+
+        anm = ANM()
+        anm.buildHessian(ATOMS)
+        anm.calcModes(5)
+        self.assertRaises(TypeError, calcAllEntropyTransfer, anm, 1.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+"""This module contains unit tests for :mod:`~prody.dynamics.pca`."""
+
+import os
+
+import numpy as np
+from numpy.testing import *
+
+from prody import *
+from prody import LOGGER
+from prody.tests import unittest, TEMPDIR
+from prody.tests.datafiles import *
+
+LOGGER.verbosity = 'none'
+
+ENSEMBLE = parseDatafile('dcd')
+RANDOM = np.random.RandomState(0)
+COORDSETS = np.concatenate([ENSEMBLE.getCoordsets() +
+                            RANDOM.normal(0, .5, ENSEMBLE.getCoordsets().shape)
+                            for _ in range(10)])
+REFERENCE = COORDSETS[0] + RANDOM.normal(0, 1, COORDSETS[0].shape)
+WEIGHTS = RANDOM.rand(ENSEMBLE.numAtoms())
+
+
+def buildCovarianceByFrame(traj):
+    """Returns covariance built by superposing frames one at a time."""
+
+    coords = []
+    for frame in traj:
+        frame.superpose()
+        coords.append(frame.getCoords().flatten())
+    traj.reset()
+    coords = np.array(coords)
+    return np.cov(coords.T, bias=1)
+
+
+class TestBuildCovariance(unittest.TestCase):
+
+    def setUp(self):
+
+        ensemble = Ensemble()
+        ensemble.setCoords(COORDSETS[0])
+        ensemble.addCoordset(COORDSETS)
+        self.filename = writeDCD(os.path.join(TEMPDIR, 'pca_test.dcd'),
+                                 ensemble)
+
+    def tearDown(self):
+
+        os.remove(self.filename)
+
+    def _getTrajectory(self, weights=False):
+
+        dcd = DCDFile(self.filename, astype=float)
+        dcd.setCoords(REFERENCE)
+        if weights:
+            dcd.setWeights(WEIGHTS)
+        return dcd
+
+    def testBlocks(self):
+
+        expected = buildCovarianceByFrame(self._getTrajectory())
+        for block in (1, 7, None):
+            pca = PCA()
+            pca.buildCovariance(self._getTrajectory(), block=block)
+            assert_allclose(pca.getCovariance(), expected, rtol=0, atol=1e-10,
+                            err_msg='failed to build covariance in blocks')
+
+    def testWeights(self):
+
+        expected = buildCovarianceByFrame(self._getTrajectory(weights=True))
+        pca = PCA()
+        pca.buildCovariance(self._getTrajectory(weights=True), block=4)
+        assert_allclose(pca.getCovariance(), expected, rtol=0, atol=1e-10,
+                        err_msg='failed to build covariance with weights')
+
+    def testFloat32(self):
+
+        expected = buildCovarianceByFrame(self._getTrajectory())
+        pca = PCA()
+        pca.buildCovariance(self._getTrajectory(), block=5, dtype=np.float32)
+        assert_allclose(pca.getCovariance(), expected, rtol=0, atol=1e-4,
+                        err_msg='failed to build covariance in float32')
+
+    def testAligned(self):
+
+        dcd = self._getTrajectory()
+        pca = PCA()
+        pca.buildCovariance(dcd, aligned=True, memory=0.01)
+        expected = np.cov(dcd.getCoordsets().reshape((len(dcd), -1)).T,
+                          bias=1)
+        assert_allclose(pca.getCovariance(), expected, rtol=0, atol=1e-10,
+                        err_msg='failed to build covariance of aligned frames')
+
+
+class TestRandomizedSVD(unittest.TestCase):
+
+    """Test randomized calculation of principal modes against exact methods
+    for an ensemble with a decaying spectrum."""
+
+    def setUp(self):
+
+        random = np.random.RandomState(1)
+        n_atoms, n_csets = 50, 400
+        dof = n_atoms * 3
+        basis = np.linalg.qr(random.normal(size=(dof, dof)))[0]
+        variances = 10 * 0.7 ** np.arange(dof)
+        deviations = random.normal(size=(n_csets, dof)) * np.sqrt(variances)
+        self.coordsets = (np.dot(deviations, basis.T) +
+                          random.normal(size=dof) * 10).reshape((n_csets,
+                                                                 n_atoms, 3))
+        self.exact = PCA()
+        self.exact.performSVD(self.coordsets)
+
+    def _testModes(self, pca, n_modes=5):
+
+        assert_allclose(pca.getEigvals(), self.exact[:n_modes].getEigvals(),
+                        rtol=1e-8, atol=0, err_msg='failed to get eigenvalues')
+        overlaps = np.abs((pca.getEigvecs() *
+                           self.exact[:n_modes].getEigvecs()).sum(0))
+        assert_allclose(overlaps, np.ones(n_modes), rtol=0, atol=1e-6,
+                        err_msg='failed to get eigenvectors')
+
+    def testPerformSVD(self):
+
+        pca = PCA()
+        pca.performSVD(self.coordsets, 5, randomized=True, seed=0)
+        self._testModes(pca)
+        other = PCA()
+        other.performSVD(self.coordsets, 5, randomized=True, seed=0)
+        assert_equal(other.getEigvecs(), pca.getEigvecs())
+
+    def testCalcModes(self):
+
+        pca = PCA()
+        pca.buildCovariance(self.coordsets)
+        pca.calcModes(5, randomized=True, oversampling=5, n_iter=6, seed=0)
+        self._testModes(pca)
+
+    def testTrajectory(self):
+
+        ensemble = Ensemble()
+        ensemble.setCoords(self.coordsets[0])
+        ensemble.addCoordset(self.coordsets)
+        filename = writeDCD(os.path.join(TEMPDIR, 'pca_svd_test.dcd'),
+                            ensemble)
+        try:
+            self.exact.performSVD(DCDFile(filename, astype=float)
+                                  .getCoordsets())
+            dcd = DCDFile(filename)
+            pca = PCA()
+            pca.performSVD(dcd, 5, aligned=True, block=30, seed=0)
+            self._testModes(pca)
+            self.assertEqual(dcd.nextIndex(), 0)
+        finally:
+            os.remove(filename)
+
+
+class TestCalcEDA(unittest.TestCase):
+
+    """Test out-of-core calculation of essential modes."""
+
+    def setUp(self):
+
+        random = np.random.RandomState(2)
+        n_atoms, n_csets = 40, 300
+        dof = n_atoms * 3
+        basis = np.linalg.qr(random.normal(size=(dof, dof)))[0]
+        variances = 10 * 0.5 ** np.arange(dof)
+        deviations = random.normal(size=(n_csets, dof)) * np.sqrt(variances)
+        coordsets = (np.dot(deviations, basis.T) +
+                     random.normal(size=dof) * 10).reshape((n_csets,
+                                                            n_atoms, 3))
+        ensemble = Ensemble()
+        ensemble.setCoords(coordsets[0])
+        ensemble.addCoordset(coordsets)
+        self.filename = writeDCD(os.path.join(TEMPDIR, 'eda_test.dcd'),
+                                 ensemble)
+        self.coordsets = DCDFile(self.filename, astype=float).getCoordsets()
+
+    def tearDown(self):
+
+        os.remove(self.filename)
+
+    def testCovariance(self):
+
+        dcd = DCDFile(self.filename)
+        eda = calcEDA(dcd, 10, aligned=True)
+        pca = PCA()
+        pca.buildCovariance(self.coordsets)
+        pca.calcModes(10)
+        assert_allclose(eda.getEigvals(), pca.getEigvals(), rtol=1e-8)
+        assert_allclose(eda.getCovariance(), pca.getCovariance(), rtol=0,
+                        atol=1e-8)
+        self.assertEqual(calcProjection(dcd, eda[:2]).shape, (len(dcd), 2))
+
+    def testSketch(self):
+
+        eda = calcEDA(DCDFile(self.filename), 5, aligned=True, sketch=20)
+        self.assertIsNone(eda._cov)
+        pca = PCA()
+        pca.buildCovariance(self.coordsets)
+        pca.calcModes(5)
+        assert_allclose(eda.getEigvals(), pca.getEigvals(), rtol=1e-3)
+        overlaps = np.abs((eda.getEigvecs() * pca.getEigvecs()).sum(0))
+        assert_allclose(overlaps, np.ones(5), atol=1e-3)
+        assert_allclose(eda._trace, pca._trace, rtol=1e-8)
+
+    def testMemory(self):
+
+        dcd = DCDFile(self.filename)
+        eda = calcEDA(dcd, 5, memory=0.2)
+        self.assertIsNone(eda._cov)
+        self.assertEqual(eda.numModes(), 5)
+        self.assertRaises(ValueError, calcEDA, dcd, 5, memory=0.001)
+
+    def testPeakMemory(self):
+
+        import tracemalloc
+        import warnings
+        for memory, covariance in ((0.5, True), (0.2, False)):
+            dcd = DCDFile(self.filename)
+            # warnings recorded by the test runner are not counted
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                tracemalloc.start()
+                try:
+                    eda = calcEDA(dcd, 5, memory=memory)
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+            self.assertEqual(eda._cov is not None, covariance)
+            self.assertLessEqual(peak, memory * 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""This module contains unit tests for :mod:`~prody.dynamics.perturb`."""
+
+import numpy as np
+from numpy.testing import *
+
+from prody import *
+from prody import LOGGER
+from prody.tests import unittest
+from prody.tests.datafiles import *
+
+LOGGER.verbosity = 'none'
+
+ATOMS = parseDatafile('1ubi_ca')
+
+
+def calcPRSByCovariance(model):
+    """Returns PRS outputs calculated from the full covariance matrix."""
+
+    cov = model.getCovariance()
+    n_atoms = model.numAtoms()
+    if model.is3d():
+        prs_matrix = (cov ** 2).reshape((n_atoms, 3, n_atoms, 3)).sum(3).sum(1)
+    else:
+        prs_matrix = cov ** 2
+    norm_prs_matrix = prs_matrix / np.diag(prs_matrix).reshape(n_atoms, 1)
+    W = 1 - np.eye(n_atoms)
+    return (norm_prs_matrix, np.average(norm_prs_matrix, weights=W, axis=1),
+            np.average(norm_prs_matrix, weights=W, axis=0))
+
+
+class TestPerturbResponse(unittest.TestCase):
+
+    def _testModel(self, model, **kwargs):
+
+        result = calcPerturbResponse(model, **kwargs)
+        expected = calcPRSByCovariance(model)
+        for res, exp in zip(result, expected):
+            assert_allclose(res, exp, rtol=1e-10, atol=1e-12)
+
+    def testANM(self):
+
+        anm = ANM()
+        anm.buildHessian(ATOMS)
+        anm.calcModes(20)
+        self._testModel(anm[:10], memory=0.05)
+        self._testModel(anm, memory=0.05)
+        # a budget smaller than a row gives blocks of single rows
+        self._testModel(anm, memory=1e-6)
+
+    def testGNM(self):
+
+        gnm = GNM()
+        gnm.buildKirchhoff(ATOMS)
+        gnm.calcModes(20)
+        self._testModel(gnm, memory=0.01)
+
+    def testCovariance(self):
+
+        pca = PCA()
+        ensemble = parseDatafile('dcd')
+        ensemble.superpose()
+        pca.buildCovariance(ensemble)
+        pca.calcModes()
+        self._testModel(pca, memory=0.1)
+
+    def testNoDiagonal(self):
+
+        anm = ANM()
+        anm.buildHessian(ATOMS)
+        anm.calcModes(10)
+        matrix = calcPerturbResponse(anm, no_diag=True)[0]
+        assert_equal(np.diag(matrix), np.zeros(anm.numAtoms()))
+
+
+if __name__ == '__main__':
+    unittest.main()
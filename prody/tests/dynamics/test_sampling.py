@@ -0,0 +1,93 @@
+"""This module contains unit tests for :mod:`~prody.dynamics.sampling`."""
+
+import os
+
+import numpy as np
+from numpy.testing import *
+
+from prody import *
+from prody import LOGGER
+from prody.tests import unittest, TEMPDIR
+from prody.tests.datafiles import *
+
+LOGGER.verbosity = 'none'
+
+ATOMS = parseDatafile('1ubi_ca')
+ANM_MODES = ANM()
+ANM_MODES.buildHessian(ATOMS)
+ANM_MODES.calcModes(10)
+
+
+class TestSampleModes(unittest.TestCase):
+
+    def testConformations(self):
+
+        modes = ANM_MODES[:5]
+        np.random.seed(0)
+        ensemble = sampleModes(modes, ATOMS, n_confs=20, rmsd=1.5)
+        np.random.seed(0)
+        randn = np.random.standard_normal((20, 5))
+        variances = modes.getVariances()
+        scale = (ATOMS.numAtoms() ** 0.5 * 1.5 /
+                 ((randn ** 2 * variances).sum(1) ** 0.5).mean())
+        deformations = np.dot(randn * scale * variances ** 0.5,
+                              modes.getEigvecs().T)
+        expected = ATOMS.getCoords() + deformations.reshape((20, -1, 3))
+        assert_allclose(ensemble.getCoordsets(), expected, rtol=0, atol=1e-10)
+
+    def testFile(self):
+
+        filename = os.path.join(TEMPDIR, 'sample_test')
+        np.random.seed(1)
+        ensemble = sampleModes(ANM_MODES, ATOMS, n_confs=30)
+        np.random.seed(1)
+        filename = sampleModes(ANM_MODES, ATOMS, n_confs=30,
+                               filename=filename, block=7)
+        try:
+            self.assertTrue(filename.endswith('.dcd'))
+            assert_allclose(DCDFile(filename).getCoordsets(),
+                            ensemble.getCoordsets(), rtol=0, atol=1e-4)
+        finally:
+            os.remove(filename)
+
+
+class TestTraverseMode(unittest.TestCase):
+
+    def testConformations(self):
+
+        ensemble = traverseMode(ANM_MODES[0], ATOMS, n_steps=4, rmsd=2.)
+        coords = ensemble.getCoordsets()
+        self.assertEqual(len(coords), 9)
+        assert_allclose(coords[4], ATOMS.getCoords(), rtol=0, atol=1e-12)
+        assert_allclose(calcRMSD(coords[0], ATOMS.getCoords()), 2., rtol=1e-5)
+        steps = np.diff(coords, axis=0)
+        assert_allclose(steps, np.repeat(steps[:1], 8, 0), rtol=0, atol=1e-10)
+
+    def testFile(self):
+
+        ensemble = traverseMode(ANM_MODES[1], ATOMS, n_steps=5)
+        filename = traverseMode(ANM_MODES[1], ATOMS, n_steps=5, block=3,
+                                filename=os.path.join(TEMPDIR,
+                                                      'traverse_test.dcd'))
+        try:
+            assert_allclose(DCDFile(filename).getCoordsets(),
+                            ensemble.getCoordsets(), rtol=0, atol=1e-4)
+        finally:
+            os.remove(filename)
+
+
+class TestDeformAtoms(unittest.TestCase):
+
+    def testScales(self):
+
+        atoms = ATOMS.copy()
+        deformAtoms(atoms, ANM_MODES[2], rmsd=1., scale=[-1, 2])
+        coords = atoms.getCoordsets()
+        self.assertEqual(len(coords), 3)
+        assert_allclose(calcRMSD(coords[0], coords[1:]), [1., 2.], rtol=1e-8)
+        self.assertRaises(ValueError, deformAtoms, atoms, ANM_MODES[2],
+                          scale=[1, 2], replace=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
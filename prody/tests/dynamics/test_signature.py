@@ -1,9 +1,12 @@
 """This module contains unit tests for :mod:`~prody.KDTree` module."""
 
-from numpy.testing import assert_array_equal, assert_equal
+import numpy as np
+from numpy.testing import assert_array_equal, assert_equal, assert_allclose
 from numpy.random import rand, randint
 
-from prody.dynamics import sdarray
+from prody import PDBEnsemble, calcSpectralOverlap, matchModes, pairModes
+from prody.dynamics import sdarray, calcEnsembleENMs
+from prody.dynamics import calcEnsembleSpectralOverlaps
 
 from prody.tests import unittest
 from prody.tests.datafiles import parseDatafile
@@ -43,3 +46,117 @@ class TestSDArray(unittest.TestCase):
 
         s = S[0, 0, 0]
         #assert_array_equal(s, A[0, 0, 0], 'failed at sdarray slicing')
+
+
+class TestCalcEnsembleENMs(unittest.TestCase):
+
+    def setUp(self):
+
+        atoms = parseDatafile('1ubi_ca')
+        random = np.random.RandomState(0)
+        self.ensemble = PDBEnsemble('test')
+        self.ensemble.setAtoms(atoms)
+        self.ensemble.setCoords(atoms.getCoords())
+        for i in range(5):
+            coords = atoms.getCoords() + random.normal(0, .5, (len(atoms), 3))
+            self.ensemble.addCoordset(coords, label='conf%d' % i)
+        self.ensemble.setAtoms(atoms.select('resnum < 50'))
+
+    def testParallel(self):
+
+        for trim in ('reduce', 'slice'):
+            serial = calcEnsembleENMs(self.ensemble, model='anm', trim=trim,
+                                      n_modes=5, match=False)
+            parallel = calcEnsembleENMs(self.ensemble, model='anm', trim=trim,
+                                        n_modes=5, match=False, n_cpu=2)
+            self.assertEqual([modes.getTitle() for modes in parallel.getModeSets()],
+                             [modes.getTitle() for modes in serial.getModeSets()])
+            assert_equal(np.asarray(parallel.getEigvals()),
+                         np.asarray(serial.getEigvals()))
+            assert_equal(np.asarray(parallel.getEigvecs()),
+                         np.asarray(serial.getEigvecs()))
+
+    def testNumberOfCPUs(self):
+
+        self.assertRaises(ValueError, calcEnsembleENMs, self.ensemble, n_cpu=0)
+
+
+class TestCalcEnsembleSpectralOverlaps(unittest.TestCase):
+
+    def setUp(self):
+
+        atoms = parseDatafile('1ubi_ca')
+        random = np.random.RandomState(1)
+        ensemble = PDBEnsemble('test')
+        ensemble.setAtoms(atoms)
+        ensemble.setCoords(atoms.getCoords())
+        for i in range(7):
+            coords = atoms.getCoords() + random.normal(0, .7, (len(atoms), 3))
+            ensemble.addCoordset(coords, label='conf%d' % i)
+        self.enms = calcEnsembleENMs(ensemble, model='anm', n_modes=10,
+                                     match=False)
+
+    def _getExpected(self, weighted=False):
+
+        modesets = self.enms.getModeSets()
+        expected = np.ones((len(modesets), len(modesets)))
+        for i, modes1 in enumerate(modesets):
+            for j, modes2 in enumerate(modesets):
+                if i != j:
+                    expected[i, j] = calcSpectralOverlap(modes1, modes2,
+                                                         weighted=weighted)
+        return expected
+
+    def testBlocks(self):
+
+        expected = self._getExpected()
+        for n_cpu in (1, 2):
+            overlaps = calcEnsembleSpectralOverlaps(self.enms, memory=0.005,
+                                                    n_cpu=n_cpu)
+            assert_allclose(overlaps, expected, rtol=0, atol=1e-12)
+        assert_allclose(calcEnsembleSpectralOverlaps(self.enms, distance=True),
+                        np.arccos(expected), rtol=0, atol=1e-6)
+
+    def testWeighted(self):
+
+        assert_allclose(calcEnsembleSpectralOverlaps(self.enms, weighted=True),
+                        self._getExpected(weighted=True), rtol=0, atol=1e-12)
+
+
+class TestMatchModes(unittest.TestCase):
+
+    def setUp(self):
+
+        atoms = parseDatafile('1ubi_ca')
+        random = np.random.RandomState(2)
+        ensemble = PDBEnsemble('test')
+        ensemble.setAtoms(atoms)
+        ensemble.setCoords(atoms.getCoords())
+        for i in range(6):
+            coords = atoms.getCoords() + random.normal(0, 1., (len(atoms), 3))
+            ensemble.addCoordset(coords, label='conf%d' % i)
+        self.enms = calcEnsembleENMs(ensemble, model='anm', n_modes=10,
+                                     match=False)
+        modesets = self.enms.getModeSets()
+        self.expected = [modesets[0].getIndices()]
+        for modes in modesets[1:]:
+            self.expected.append(pairModes(modesets[0], modes)[1]
+                                 .getIndices())
+
+    def testMatchModes(self):
+
+        modesets = self.enms.getModeSets()
+        for turbo in (False, 2):
+            matched = matchModes(*modesets, turbo=turbo)
+            assert_equal([modes.getIndices() for modes in matched],
+                         self.expected)
+            indices = matchModes(*modesets, turbo=turbo, index=True)
+            assert_equal(indices[1:], self.expected[1:])
+
+    def testPool(self):
+
+        from prody.dynamics.compare import getMatchPool
+        self.enms.match(turbo=2)
+        assert_equal([modes.getIndices() for modes in self.enms.getModeSets()],
+                     self.expected)
+        self.assertIs(getMatchPool(2), getMatchPool(2))
@@ -40,6 +40,28 @@ class TestKDTree(unittest.TestCase):
                             rtol=RTOL, atol=ATOL,
                             err_msg='KDTree all search failed')
 
+    def testManyPairs(self):
+        coords = tile(arange(2000), (3,1)).T.astype(float)
+        kdtree = KDTree(coords)
+        kdtree.search(3.5)
+        indices = kdtree.getIndices()
+        self.assertEqual(indices.shape, (3997, 2),
+                         'KDTree all search failed')
+        assert_allclose(kdtree.getDistances(),
+                        abs(indices[:, 0] - indices[:, 1]) * 3 ** 0.5,
+                        rtol=RTOL, atol=ATOL,
+                        err_msg='KDTree all search failed')
+
+    def testWithin(self):
+        kdtree = self.kdtree
+        centers = array([[0., 0., 0.], [9., 9., 9.], [20., 20., 20.]])
+        torf = kdtree.getWithin(1.75, centers)
+        self.assertEqual(list(torf.nonzero()[0]), [0, 1, 8, 9],
+                         'KDTree within search failed')
+        torf = kdtree.getWithin(1.75, centers, 'centers')
+        self.assertEqual(list(torf), [True, True, False],
+                         'KDTree within search failed')
+
 
 COORDS = array([[-1., -1., 0.],
                 [-1.,  5., 0.],
@@ -73,3 +95,10 @@ class TestKDTreePBC(unittest.TestCase):
         KDTREE_PBC.search(2)
         self.assertEqual(8, KDTREE_PBC.getCount())
 
+    def testWithinPBC(self):
+
+        torf = KDTREE_PBC.getWithin(2, array([[2., 2., 0.]]))
+        self.assertEqual(5, torf.sum())
+        torf = KDTREE_PBC.getWithin(1.5, array([[2., 2., 0.], [0., 0., 1.]]),
+                                    'centers')
+        self.assertEqual([True, False], list(torf))